@@ -2,12 +2,19 @@
 Assessment admin interface configuration.
 """
 
-from django.contrib import admin
+from datetime import timedelta
+
+from django.contrib import admin, messages
+from django.db import IntegrityError, transaction
+from django.template.response import TemplateResponse
+from django.utils import timezone
 from django.utils.html import format_html
-from django.urls import reverse
+from django.urls import path, reverse
 from django.utils.safestring import mark_safe
 
-from .models import Assessment, Feedback, AssessmentRequest
+from .models import Assessment, Feedback, AssessmentRequest, AssessmentBatch
+from .timing import PERCENTILES, REPORT_PATHS, latency_report
+from .wakeup import notify_queue
 
 
 class FeedbackInline(admin.TabularInline):
@@ -59,9 +66,18 @@ class AssessmentAdmin(admin.ModelAdmin):
         ('AI Processing', {
             'fields': (
                 'ai_model_used', 'processing_time_seconds', 
-                'ai_confidence_score', 'started_at', 'completed_at'
+                'ai_confidence_score', 'started_at', 'completed_at',
+                'input_tokens', 'output_tokens',
+                'cache_creation_input_tokens', 'cache_read_input_tokens'
             )
         }),
+        ('Stage Timings (ms)', {
+            'fields': (
+                'queue_wait_ms', 'prompt_build_ms', 'time_to_first_token_ms',
+                'generation_ms', 'parse_ms', 'persist_ms'
+            ),
+            'classes': ('collapse',)
+        }),
         ('Error Handling', {
             'fields': ('error_message', 'retry_count'),
             'classes': ('collapse',)
@@ -70,6 +86,58 @@ class AssessmentAdmin(admin.ModelAdmin):
     
     inlines = [FeedbackInline]
     
+    change_list_template = 'admin/assessment/assessment/change_list.html'
+    
+    def get_urls(self):
+        urls = [
+            path(
+                'latency/',
+                self.admin_site.admin_view(self.latency_view),
+                name='assessment_assessment_latency'
+            ),
+        ]
+        return urls + super().get_urls()
+    
+    def latency_view(self, request):
+        """p50/p95/p99 of each pipeline stage over recent completed assessments."""
+        try:
+            days = max(1, int(request.GET.get('days', 7)))
+        except ValueError:
+            days = 7
+        model = request.GET.get('model', '')
+        path = request.GET.get('path', 'all')
+        if path not in REPORT_PATHS:
+            path = 'all'
+        
+        queryset = Assessment.objects.filter(completed_at__gte=timezone.now() - timedelta(days=days))
+        if model:
+            queryset = queryset.filter(ai_model_used=model)
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Assessment latency',
+            'days': days,
+            'model': model,
+            'path': path,
+            'paths': REPORT_PATHS,
+            'models': (
+                Assessment.objects.exclude(ai_model_used='')
+                .values_list('ai_model_used', flat=True).distinct().order_by('ai_model_used')
+            ),
+            'percentiles': [f'p{pct}' for pct in PERCENTILES],
+            'rows': [
+                {
+                    'field': field,
+                    'count': stats['count'],
+                    'mean': stats['mean'],
+                    'values': [stats[f'p{pct}'] for pct in PERCENTILES],
+                }
+                for field, stats in latency_report(queryset, path=path).items()
+            ],
+        }
+        return TemplateResponse(request, 'admin/assessment/assessment/latency.html', context)
+    
     def submission_link(self, obj):
         """Link to the related submission."""
         url = reverse('admin:practice_submission_change', args=[obj.submission.pk])
@@ -137,12 +205,12 @@ class AssessmentRequestAdmin(admin.ModelAdmin):
     """Admin interface for AssessmentRequest model."""
     
     list_display = (
-        'submission_link', 'status', 'priority', 
+        'submission_link', 'status', 'priority', 'attempts', 'worker_id',
         'processing_started_at', 'processing_completed_at', 'created_at'
     )
     
     list_filter = (
-        'status', 'priority', 'created_at', 
+        'status', 'last_error_class', 'priority', 'created_at', 
         'processing_started_at', 'submission__task__module_type'
     )
     
@@ -160,11 +228,12 @@ class AssessmentRequestAdmin(admin.ModelAdmin):
         ('Processing Status', {
             'fields': (
                 'processing_started_at', 'processing_completed_at',
-                'retry_after', 'assessment'
+                'retry_after', 'assessment', 'worker_id', 'lease_expires_at',
+                'batch'
             )
         }),
         ('Error Details', {
-            'fields': ('error_details',),
+            'fields': ('attempts', 'last_error_class', 'error_details'),
             'classes': ('collapse',)
         })
     )
@@ -178,11 +247,55 @@ class AssessmentRequestAdmin(admin.ModelAdmin):
     actions = ['retry_failed_assessments']
     
     def retry_failed_assessments(self, request, queryset):
-        """Action to retry failed assessment requests."""
-        failed_requests = queryset.filter(status='failed')
-        count = failed_requests.update(status='queued', retry_after=None)
+        """
+        Action to retry failed and dead-lettered assessment requests.
+        
+        A submission may only have one active request, so rows are re-queued
+        one at a time, newest first; a row whose submission already has an
+        active request (queued, processing, or re-queued just before it) is
+        skipped.
+        """
+        count = 0
+        skipped = 0
+        for assessment_request in queryset.filter(status__in=['failed', 'dead_letter']).order_by('-created_at'):
+            try:
+                with transaction.atomic():
+                    AssessmentRequest.objects.filter(pk=assessment_request.pk).update(
+                        status='queued',
+                        retry_after=None,
+                        attempts=0,
+                        updated_at=timezone.now()
+                    )
+                count += 1
+            except IntegrityError:
+                skipped += 1
+        
+        if count:
+            notify_queue()
         self.message_user(
             request,
             f'Successfully queued {count} failed assessments for retry.'
         )
+        if skipped:
+            self.message_user(
+                request,
+                f'Skipped {skipped} requests whose submission already has an active assessment request.',
+                level=messages.WARNING
+            )
     retry_failed_assessments.short_description = 'Retry failed assessments'
+
+
+@admin.register(AssessmentBatch)
+class AssessmentBatchAdmin(admin.ModelAdmin):
+    """Admin interface for AssessmentBatch model."""
+    
+    list_display = (
+        'batch_id', 'status', 'request_count', 'succeeded_count',
+        'errored_count', 'expired_count', 'created_at', 'collected_at'
+    )
+    
+    list_filter = ('status', 'created_at')
+    
+    search_fields = ('batch_id',)
+    
+    readonly_fields = ('created_at', 'updated_at')
@@ -0,0 +1,542 @@
+"""
+Scoring backends: the clients IELTSAssessmentService sends assessments to.
+
+``ASSESSMENT_SCORING_BACKEND`` selects one:
+
+- ``'anthropic'`` (default): the real Anthropic SDK clients.
+- ``'local'``: LocalScoringClient, an offline engine that speaks the same
+  ``messages.create`` / ``messages.stream`` / ``messages.batches`` interface
+  and returns valid assessment JSON, with tunable latency and injected 429s,
+  timeouts and malformed JSON. Use it to load-test the queue, SSE and
+  persistence paths at thousands of essays per minute without API spend.
+- A dotted path to a ScoringBackend subclass.
+
+The local engine's knobs live in ``ASSESSMENT_LOCAL_BACKEND`` (see
+LocalScoringClient.DEFAULTS).
+"""
+
+import os
+import abc
+import json
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+import logging
+import importlib.util
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Iterator, List, Optional
+
+import httpx
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+import anthropic
+from anthropic.lib.streaming import InputJsonEvent, TextEvent
+from anthropic.types import Message, TextBlock, ToolUseBlock, Usage
+from anthropic.types.messages import (
+    MessageBatch, MessageBatchIndividualResponse, MessageBatchRequestCounts,
+    MessageBatchErroredResult, MessageBatchSucceededResult,
+)
+from anthropic.types.shared import ErrorResponse, RateLimitError as RateLimitErrorObject
+
+logger = logging.getLogger(__name__)
+
+SCORING_BACKENDS = {
+    'anthropic': 'assessment.backends.AnthropicBackend',
+    'local': 'assessment.backends.LocalBackend',
+}
+
+
+class ScoringBackend(abc.ABC):
+    """
+    Interface for scoring backends.
+    
+    A backend provides a sync and an async client shaped like the Anthropic
+    SDK's (``messages.create``, ``messages.stream`` and, for batch mode,
+    ``messages.batches``).
+    """
+    
+    # Model name recorded on assessments and used in result cache keys
+    # (None means CLAUDE_MODEL)
+    model: Optional[str] = None
+    
+    # First model of the tiered route (None means CLAUDE_FAST_MODEL)
+    fast_model: Optional[str] = None
+    
+    # Whether calls draw on the shared Anthropic rate limit budget
+    uses_anthropic_quota = True
+    
+    @abc.abstractmethod
+    def client(self):
+        """A new sync client."""
+    
+    @abc.abstractmethod
+    def async_client(self):
+        """A new async client."""
+
+    def streaming_client(self, client):
+        """The client to use for streamed calls (by default the same one)."""
+        return client
+
+
+class AnthropicBackend(ScoringBackend):
+    """
+    The Anthropic API.
+    
+    The SDK clients share one tuned httpx connection pool per client (see
+    ``ANTHROPIC_HTTP_CLIENT``): keep-alive long enough to span the gaps
+    between assessments, HTTP/2 (which needs the ``h2`` package), and
+    separate read timeouts for streamed calls, where the timeout applies
+    between events, and non-streamed calls, where it has to cover the
+    whole generation.
+    """
+    
+    HTTP_DEFAULTS = {
+        'max_connections': 20,
+        'max_keepalive_connections': 10,
+        'keepalive_expiry': 30.0,
+        'connect_timeout': 5.0,
+        'read_timeout': 300.0,
+        'stream_read_timeout': 60.0,
+        'write_timeout': 30.0,
+        'pool_timeout': 30.0,
+        'http2': True,
+    }
+    
+    def __init__(self):
+        self.api_key = getattr(settings, 'ANTHROPIC_API_KEY', os.getenv('ANTHROPIC_API_KEY'))
+        self.http = {**self.HTTP_DEFAULTS, **getattr(settings, 'ANTHROPIC_HTTP_CLIENT', {})}
+        if self.http['http2'] and not self.http2:
+            logger.warning("ANTHROPIC_HTTP2 is on but the h2 package is not installed; using HTTP/1.1")
+    
+    @property
+    def http2(self) -> bool:
+        return bool(self.http['http2']) and importlib.util.find_spec('h2') is not None
+    
+    def timeout(self, streaming: bool = False) -> httpx.Timeout:
+        return httpx.Timeout(
+            connect=self.http['connect_timeout'],
+            read=self.http['stream_read_timeout' if streaming else 'read_timeout'],
+            write=self.http['write_timeout'],
+            pool=self.http['pool_timeout'],
+        )
+    
+    def http_client_options(self) -> Dict:
+        """Keyword arguments for the SDK's default httpx client classes."""
+        return {
+            'limits': httpx.Limits(
+                max_connections=self.http['max_connections'],
+                max_keepalive_connections=self.http['max_keepalive_connections'],
+                keepalive_expiry=self.http['keepalive_expiry'],
+            ),
+            'http2': self.http2,
+        }
+    
+    def client(self):
+        return anthropic.Anthropic(
+            api_key=self.api_key,
+            timeout=self.timeout(),
+            http_client=anthropic.DefaultHttpxClient(**self.http_client_options())
+        )
+    
+    def async_client(self):
+        return anthropic.AsyncAnthropic(
+            api_key=self.api_key,
+            timeout=self.timeout(),
+            http_client=anthropic.DefaultAsyncHttpxClient(**self.http_client_options())
+        )
+    
+    def streaming_client(self, client):
+        # Shares the connection pool of ``client``
+        return client.with_options(timeout=self.timeout(streaming=True))
+
+
+class LocalBackend(ScoringBackend):
+    """The offline LocalScoringClient engine."""
+    
+    model = 'local-scoring-engine'
+    fast_model = 'local-scoring-engine-fast'
+    uses_anthropic_quota = False
+    
+    def __init__(self):
+        self.options = getattr(settings, 'ASSESSMENT_LOCAL_BACKEND', {})
+    
+    def client(self):
+        return LocalScoringClient(self.options)
+    
+    def async_client(self):
+        return AsyncLocalScoringClient(self.options)
+
+
+def get_scoring_backend(name: Optional[str] = None) -> ScoringBackend:
+    """Instantiate the configured (or named) scoring backend."""
+    name = name or getattr(settings, 'ASSESSMENT_SCORING_BACKEND', 'anthropic')
+    return import_string(SCORING_BACKENDS.get(name, name))()
+
+
+class LocalScoringClient:
+    """
+    Offline stand-in for ``anthropic.Anthropic``.
+    
+    Scores are derived from the essay's length and a hash of its text, so
+    the same essay always gets the same bands. Responses, usage blocks and
+    errors are real SDK types, so everything downstream of the client runs
+    unchanged.
+    """
+    
+    DEFAULTS = {
+        'latency': 0.0,              # seconds per response (spread over chunks when streaming)
+        'latency_jitter': 0.0,       # +/- seconds of uniform jitter
+        'stream_chunk_chars': 40,    # characters per streamed text delta
+        'rate_limit_rate': 0.0,      # fraction of calls raising a 429
+        'rate_limit_retry_after': 1,  # retry-after header on injected 429s
+        'timeout_rate': 0.0,         # fraction of calls raising APITimeoutError
+        'malformed_rate': 0.0,       # fraction of responses with invalid JSON
+        'batch_duration': 5.0,       # seconds until a submitted batch ends
+        'batch_dir': None,           # where batches persist (default run/local-batches)
+        'seed': None,                # seed for error injection, for reproducible runs
+    }
+    
+    def __init__(self, options: Optional[Dict] = None):
+        self.options = {**self.DEFAULTS, **(options or {})}
+        self.random = random.Random(self.options['seed'])
+        self.messages = LocalMessages(self)
+    
+    def delay(self) -> float:
+        jitter = self.options['latency_jitter']
+        return max(0.0, self.options['latency'] + self.random.uniform(-jitter, jitter))
+    
+    def maybe_fail(self):
+        """Raise an injected API error, at the configured rates."""
+        roll = self.random.random()
+        request = httpx.Request('POST', 'http://local-scoring-engine/v1/messages')
+        
+        if roll < self.options['rate_limit_rate']:
+            response = httpx.Response(
+                429, request=request,
+                headers={'retry-after': str(self.options['rate_limit_retry_after'])}
+            )
+            raise anthropic.RateLimitError('Injected rate limit', response=response, body=None)
+        
+        if roll < self.options['rate_limit_rate'] + self.options['timeout_rate']:
+            raise anthropic.APITimeoutError(request=request)
+    
+    def build_message(self, params: Dict) -> Message:
+        """
+        Score the essay in ``params`` and wrap the JSON in a Message.
+        
+        When ``params`` defines tools the result is a tool_use block, as the
+        API returns for a forced tool call; otherwise it is JSON text.
+        """
+        assessment = score_essay(params)
+        text = json.dumps(assessment, indent=2)
+        stop_reason = 'end_turn'
+        if self.random.random() < self.options['malformed_rate']:
+            # Cut off mid-object, like a response that hit max_tokens
+            text = text[:len(text) // 2]
+            stop_reason = 'max_tokens'
+        
+        if params.get('tools'):
+            # A tool call cut off at max_tokens arrives with only part of its input
+            if stop_reason == 'max_tokens':
+                assessment = {key: assessment[key] for key in list(assessment)[:len(assessment) // 2]}
+            content = [ToolUseBlock(
+                type='tool_use', id=f'toolu_local_{uuid.uuid4().hex[:24]}',
+                name=params['tools'][0]['name'], input=assessment
+            )]
+            stop_reason = 'tool_use' if stop_reason == 'end_turn' else stop_reason
+        else:
+            content = [TextBlock(type='text', text=text)]
+        
+        input_chars = sum(len(block.get('text', '')) for block in params.get('system', []))
+        input_chars += sum(len(str(message['content'])) for message in params['messages'])
+        input_chars += len(json.dumps(params.get('tools', [])))
+        
+        return Message(
+            id=f'msg_local_{uuid.uuid4().hex[:24]}',
+            type='message',
+            role='assistant',
+            model=params['model'],
+            content=content,
+            stop_reason=stop_reason,
+            stop_sequence=None,
+            usage=Usage(
+                input_tokens=input_chars // 4,
+                output_tokens=len(text) // 4,
+                cache_creation_input_tokens=0,
+                cache_read_input_tokens=0,
+            ),
+        )
+    
+    def chunks(self, text: str) -> List[str]:
+        size = max(1, self.options['stream_chunk_chars'])
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class AsyncLocalScoringClient(LocalScoringClient):
+    """Offline stand-in for ``anthropic.AsyncAnthropic``."""
+    
+    def __init__(self, options: Optional[Dict] = None):
+        super().__init__(options)
+        self.messages = AsyncLocalMessages(self)
+
+
+class LocalMessages:
+    def __init__(self, client: LocalScoringClient):
+        self._client = client
+        self.batches = LocalBatches(client)
+    
+    def create(self, **params) -> Message:
+        self._client.maybe_fail()
+        time.sleep(self._client.delay())
+        return self._client.build_message(params)
+    
+    def stream(self, **params) -> 'LocalMessageStream':
+        self._client.maybe_fail()
+        return LocalMessageStream(self._client, self._client.build_message(params))
+
+
+class AsyncLocalMessages:
+    def __init__(self, client: AsyncLocalScoringClient):
+        self._client = client
+    
+    async def create(self, **params) -> Message:
+        self._client.maybe_fail()
+        await asyncio.sleep(self._client.delay())
+        return self._client.build_message(params)
+    
+    def stream(self, **params) -> 'AsyncLocalMessageStream':
+        self._client.maybe_fail()
+        return AsyncLocalMessageStream(self._client, self._client.build_message(params))
+
+
+class LocalMessageStream:
+    """Context manager shaped like the SDK's MessageStreamManager."""
+    
+    def __init__(self, client: LocalScoringClient, message: Message):
+        self._client = client
+        self._message = message
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+    
+    def __iter__(self):
+        chunks = self._client.chunks(self._output())
+        pause = self._client.delay() / len(chunks)
+        for chunk in chunks:
+            time.sleep(pause)
+            yield self._event(chunk)
+    
+    @property
+    def text_stream(self) -> Iterator[str]:
+        for event in self:
+            if event.type == 'text':
+                yield event.text
+    
+    def _output(self) -> str:
+        block = self._message.content[0]
+        return json.dumps(block.input, indent=2) if block.type == 'tool_use' else block.text
+    
+    def _event(self, chunk: str):
+        if self._message.content[0].type == 'tool_use':
+            return InputJsonEvent(type='input_json', partial_json=chunk, snapshot={})
+        return TextEvent(type='text', text=chunk, snapshot='')
+    
+    def get_final_message(self) -> Message:
+        return self._message
+
+
+class AsyncLocalMessageStream(LocalMessageStream):
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        return False
+    
+    async def __aiter__(self):
+        chunks = self._client.chunks(self._output())
+        pause = self._client.delay() / len(chunks)
+        for chunk in chunks:
+            await asyncio.sleep(pause)
+            yield self._event(chunk)
+    
+    @property
+    async def text_stream(self):
+        async for event in self:
+            if event.type == 'text':
+                yield event.text
+    
+    async def get_final_message(self) -> Message:
+        return self._message
+
+
+class LocalBatches:
+    """
+    Offline Message Batches: results are computed at submission and stored
+    as JSON files, so batch mode can be exercised across restarts.
+    """
+    
+    def __init__(self, client: LocalScoringClient):
+        self._client = client
+        self.directory = str(client.options['batch_dir'] or settings.BASE_DIR / 'run' / 'local-batches')
+    
+    def create(self, requests: List[Dict]) -> MessageBatch:
+        batch_id = f'msgbatch_local_{uuid.uuid4().hex[:24]}'
+        now = datetime.now(dt_timezone.utc)
+        results = []
+        
+        for entry in requests:
+            try:
+                self._client.maybe_fail()
+                result = MessageBatchSucceededResult(
+                    type='succeeded', message=self._client.build_message(entry['params'])
+                )
+            except anthropic.APIError:
+                # Batches report per-request errors in the results instead of raising
+                result = MessageBatchErroredResult(
+                    type='errored',
+                    error=ErrorResponse(
+                        type='error',
+                        error=RateLimitErrorObject(type='rate_limit_error', message='Injected rate limit')
+                    )
+                )
+            results.append({'custom_id': entry['custom_id'], 'result': result.model_dump(mode='json')})
+        
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(batch_id), 'w') as f:
+            json.dump({
+                'created_at': now.isoformat(),
+                'ends_at': (now + timedelta(seconds=self._client.options['batch_duration'])).isoformat(),
+                'results': results,
+            }, f)
+        
+        return self._batch(batch_id)
+    
+    def retrieve(self, batch_id: str) -> MessageBatch:
+        return self._batch(batch_id)
+    
+    def results(self, batch_id: str) -> Iterator[MessageBatchIndividualResponse]:
+        for entry in self._load(batch_id)['results']:
+            yield MessageBatchIndividualResponse.model_validate(entry)
+    
+    def _path(self, batch_id: str) -> str:
+        return os.path.join(self.directory, f'{batch_id}.json')
+    
+    def _load(self, batch_id: str) -> Dict:
+        try:
+            with open(self._path(batch_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            request = httpx.Request('GET', f'http://local-scoring-engine/v1/messages/batches/{batch_id}')
+            raise anthropic.NotFoundError(
+                f'Unknown batch {batch_id}', response=httpx.Response(404, request=request), body=None
+            )
+    
+    def _batch(self, batch_id: str) -> MessageBatch:
+        data = self._load(batch_id)
+        created_at = datetime.fromisoformat(data['created_at'])
+        ends_at = datetime.fromisoformat(data['ends_at'])
+        ended = datetime.now(dt_timezone.utc) >= ends_at
+        types = [entry['result']['type'] for entry in data['results']]
+        
+        return MessageBatch(
+            id=batch_id,
+            type='message_batch',
+            created_at=created_at,
+            expires_at=created_at + timedelta(hours=24),
+            ended_at=ends_at if ended else None,
+            processing_status='ended' if ended else 'in_progress',
+            request_counts=MessageBatchRequestCounts(
+                processing=0 if ended else len(types),
+                succeeded=types.count('succeeded') if ended else 0,
+                errored=types.count('errored') if ended else 0,
+                canceled=0,
+                expired=0,
+            ),
+        )
+
+
+# Feedback text for the local engine, keyed by criterion
+LOCAL_FEEDBACK = {
+    'task_achievement': 'Addresses the task with a relevant position; some ideas would benefit from fuller development.',
+    'coherence_cohesion': 'Paragraphs follow a logical order; linking devices are used, occasionally mechanically.',
+    'lexical_resource': 'Vocabulary is adequate for the task with some less common items and minor errors.',
+    'grammar_accuracy': 'A mix of simple and complex structures with some errors that rarely impede meaning.',
+}
+
+
+def score_essay(params: Dict) -> Dict:
+    """Deterministic assessment JSON for the essay in a Messages API call."""
+    prompt = params['messages'][0]['content']
+    instruction = ''
+    if isinstance(prompt, list):
+        # Per-criterion call: the essay block, then the criterion instruction
+        prompt, instruction = prompt[0]['text'], prompt[-1]['text']
+    essay = prompt.split('STUDENT RESPONSE:', 1)[-1].strip()
+    words = len(essay.split())
+    digest = int(hashlib.sha256(essay.encode('utf-8')).hexdigest()[:8], 16)
+    
+    # Longer essays (up to a point) score higher; the hash spreads the criteria
+    base = 4.0 + min(words, 350) / 100
+    scores = {}
+    for i, criterion in enumerate(LOCAL_FEEDBACK):
+        offset = ((digest >> (i * 4)) % 3 - 1) * 0.5
+        scores[criterion] = min(9.0, max(1.0, round((base + offset) * 2) / 2))
+    overall = round(sum(scores.values()) / 4 * 2) / 2
+    # 0.60-0.99, so the default escalation threshold re-scores about a third
+    confidence = 0.6 + (digest >> 16) % 40 / 100
+    
+    feedback = [{
+        'type': 'overall',
+        'title': 'Overall Assessment',
+        'content': f'A response of {words} words performing at around band {overall}.',
+        'severity': 'info',
+    }]
+    feedback += [
+        {'type': criterion, 'title': criterion.replace('_', ' ').title(), 'content': text, 'severity': 'info'}
+        for criterion, text in LOCAL_FEEDBACK.items()
+    ]
+    feedback.append({
+        'type': 'suggestion',
+        'title': 'Key Improvements',
+        'content': 'Develop each main idea with a specific example and vary sentence openings.',
+        'severity': 'suggestion',
+    })
+    
+    # An inline comment on the first sentence, to exercise highlight positions
+    first_sentence = essay.split('.', 1)[0][:200]
+    if first_sentence:
+        feedback.append({
+            'type': 'inline',
+            'title': 'Opening Sentence',
+            'content': 'The opening sentence states the position clearly.',
+            'severity': 'info',
+            'highlighted_text': first_sentence,
+            'text_start_position': 0,
+            'text_end_position': len(first_sentence),
+        })
+    
+    criterion = next((key for key in LOCAL_FEEDBACK if f'"{key}":' in instruction), None)
+    if criterion:
+        return {
+            criterion: scores[criterion],
+            'confidence': round(confidence, 2),
+            # The inline comment is about the position, so it comes with Task Response
+            'feedback': [
+                item for item in feedback
+                if item['type'] == criterion or (item['type'] == 'inline' and criterion == 'task_achievement')
+            ],
+        }
+    
+    return {
+        'overall_score': overall,
+        **scores,
+        'confidence': round(confidence, 2),
+        'feedback': feedback,
+    }
@@ -0,0 +1,320 @@
+"""
+Anthropic Message Batches mode for bulk assessment.
+
+Overnight backlogs, re-grading after a model change and whole-class uploads
+do not need interactive latency. Batch mode packs queued requests into a
+Message Batch (half the per-token price, and a rate-limit budget separate
+from the interactive Messages API) and fans the results back through the
+same parsing and saving path as a direct call.
+
+Batches always score with the full model (``CLAUDE_MODEL``), skipping the
+fast-model route: an escalation would cost a second batch round of up to
+24 hours. Results are cached under the full model too, so they are shared
+with interactive assessments that go straight to it (premium plans, or
+routing turned off).
+
+Claimed requests keep a lease long enough to outlive the batch (batches
+expire after 24 hours), so the interactive daemon's lease reaper leaves
+them alone while they wait on Anthropic.
+"""
+
+import time
+import logging
+import threading
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import AssessmentBatch, AssessmentRequest
+from .parsing import AssessmentStreamParser, message_output
+from .ratelimit import QUEUE
+from .routing import combine_usage
+from .services import get_worker_id
+from .timing import StageTimer
+
+logger = logging.getLogger(__name__)
+
+# Batch result error types mapped onto the service's retry policy keys
+BATCH_ERROR_CLASSES = {
+    'rate_limit_error': 'rate_limit',
+    'overloaded_error': 'overloaded',
+    'api_error': 'overloaded',
+    'timeout_error': 'timeout',
+    'invalid_request_error': 'client_error',
+    'authentication_error': 'client_error',
+    'permission_error': 'client_error',
+    'billing_error': 'client_error',
+    'not_found_error': 'client_error',
+}
+
+
+class BatchResultError(Exception):
+    """A Message Batch entry that did not succeed."""
+    
+    def __init__(self, message: str, error_class: str):
+        super().__init__(message)
+        self.error_class = error_class
+    
+    @classmethod
+    def from_result(cls, result) -> 'BatchResultError':
+        """Build the error for an errored, canceled or expired batch result."""
+        if result.type == 'errored':
+            error = result.error.error
+            return cls(
+                f"Batch request errored: {error.type}: {error.message}",
+                BATCH_ERROR_CLASSES.get(error.type, 'other')
+            )
+        if result.type == 'expired':
+            return cls("Batch expired before the request was processed", 'timeout')
+        return cls(f"Batch request {result.type}", 'other')
+
+
+def _custom_id(request: AssessmentRequest) -> str:
+    return f"request-{request.id}"
+
+
+def _aware(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and timezone.is_naive(value):
+        return value.replace(tzinfo=dt_timezone.utc)
+    return value
+
+
+class AssessmentBatchProcessor:
+    """
+    Submits queued assessment requests as Message Batches and collects results.
+    
+    Batch ids are persisted as AssessmentBatch rows, so collection resumes
+    across restarts: any run of ``process_assessments --batch`` polls every
+    unfinished batch, whoever submitted it.
+    """
+    
+    def __init__(self, service, batch_size: Optional[int] = None):
+        self.service = service
+        self.batch_size = batch_size or getattr(settings, 'ASSESSMENT_BATCH_SIZE', 500)
+        self.lease_seconds = getattr(settings, 'ASSESSMENT_BATCH_LEASE_SECONDS', 25 * 60 * 60)
+        self.worker_id = get_worker_id()
+        self._stopping = threading.Event()
+    
+    @property
+    def stopping(self) -> bool:
+        return self._stopping.is_set()
+    
+    def stop(self):
+        """Stop submitting and collecting after the current step."""
+        self._stopping.set()
+    
+    def idle(self, timeout: float):
+        """Sleep for ``timeout`` seconds, returning early if the processor is stopped."""
+        self._stopping.wait(timeout)
+    
+    def submit(self, limit: Optional[int] = None) -> Optional[AssessmentBatch]:
+        """
+        Claim up to ``limit`` queued requests and submit them as one batch.
+        
+        Requests that need no Claude call (already assessed, or a result cache
+        hit) are completed straight away instead of being batched.
+        
+        Returns:
+            The persisted AssessmentBatch, or None if nothing was submitted
+        """
+        claimed = self.service.claim_queued_requests(
+            limit or self.batch_size,
+            worker_id=self.worker_id,
+            lease_seconds=self.lease_seconds
+        )
+        if not claimed:
+            return None
+        
+        pending = []
+        for request in claimed:
+            if not self._complete_without_batch(request):
+                pending.append(request)
+        
+        if not pending:
+            return None
+        
+        try:
+            batch = self.service.client.messages.batches.create(requests=[
+                {
+                    'custom_id': _custom_id(request),
+                    'params': self.service._build_message_params(request.submission),
+                }
+                for request in pending
+            ])
+        except Exception as e:
+            logger.error(f"Failed to submit assessment batch of {len(pending)} requests: {e}")
+            for request in pending:
+                self.service.fail_request(request, e)
+            return None
+        
+        # If the process dies before this point the requests stay leased and
+        # are re-queued by the lease reaper; only the orphaned batch is lost.
+        record = AssessmentBatch.objects.create(
+            batch_id=batch.id,
+            status=batch.processing_status,
+            request_count=len(pending),
+            expires_at=_aware(batch.expires_at)
+        )
+        AssessmentRequest.objects.filter(
+            id__in=[request.id for request in pending]
+        ).update(batch=record, updated_at=timezone.now())
+        
+        logger.info(f"Submitted assessment batch {batch.id} with {len(pending)} requests")
+        return record
+    
+    def _complete_without_batch(self, request: AssessmentRequest) -> bool:
+        """
+        Complete a claimed request that needs no Claude call.
+        
+        An already assessed submission is just marked done, and a result
+        cache hit for the full model is saved as it is.
+        
+        Returns:
+            False if the request still has to be batched
+        """
+        submission = request.submission
+        assessment = None
+        
+        try:
+            assessment, already_completed = self.service._begin_assessment(submission)
+            if not already_completed:
+                assessment_data = self.service.result_cache.get(submission, self.service.model)
+                if assessment_data is None:
+                    return False
+                self.service._save_assessment_results(
+                    assessment, assessment_data, time.time(), timer=StageTimer(request.created_at), lease=request
+                )
+            self.service.complete_request(request, assessment)
+        
+        except Exception as e:
+            self.service._record_assessment_failure(submission, assessment, e)
+            self.service.fail_request(request, e)
+        
+        return True
+    
+    def collect(self) -> int:
+        """
+        Poll unfinished batches and save the results of those that have ended.
+        
+        Returns:
+            Number of assessments completed
+        """
+        completed = 0
+        for record in AssessmentBatch.objects.exclude(status='collected'):
+            if self.stopping:
+                break
+            
+            try:
+                batch = self.service.client.messages.batches.retrieve(record.batch_id)
+            except Exception as e:
+                logger.warning(f"Failed to poll assessment batch {record.batch_id}: {e}")
+                continue
+            
+            self._update_counts(record, batch)
+            if batch.processing_status != 'ended':
+                record.save()
+                continue
+            
+            completed += self._collect_results(record)
+        
+        return completed
+    
+    def _update_counts(self, record: AssessmentBatch, batch):
+        counts = batch.request_counts
+        record.status = batch.processing_status
+        record.succeeded_count = counts.succeeded
+        record.errored_count = counts.errored
+        record.canceled_count = counts.canceled
+        record.expired_count = counts.expired
+        record.ended_at = _aware(batch.ended_at)
+    
+    def _collect_results(self, record: AssessmentBatch) -> int:
+        """Fan an ended batch's results back into Assessment and Feedback rows."""
+        requests: Dict[str, AssessmentRequest] = {
+            _custom_id(request): request
+            for request in record.requests.filter(status='processing').select_related(
+                'submission', 'submission__task'
+            )
+        }
+        completed = 0
+        
+        for entry in self.service.client.messages.batches.results(record.batch_id):
+            request = requests.pop(entry.custom_id, None)
+            if request is None:
+                # Already handled by an earlier, interrupted collection
+                continue
+            if self._apply_result(request, entry.result):
+                completed += 1
+        
+        for request in requests.values():
+            self.service.fail_request(
+                request, BatchResultError("Batch returned no result for the request", 'other')
+            )
+        
+        record.status = 'collected'
+        record.collected_at = timezone.now()
+        record.save()
+        
+        logger.info(
+            f"Collected assessment batch {record.batch_id}: {completed} of "
+            f"{record.request_count} assessments completed"
+        )
+        return completed
+    
+    def _apply_result(self, request: AssessmentRequest, result) -> bool:
+        submission = request.submission
+        assessment = None
+        
+        try:
+            if result.type != 'succeeded':
+                raise BatchResultError.from_result(result)
+            
+            assessment, already_completed = self.service._begin_assessment(submission)
+            if not already_completed:
+                message = result.message
+                timer = StageTimer()
+                if request.processing_started_at:
+                    # Queue wait until the batch was submitted, then the batch turnaround
+                    timer.add('queue_wait', (request.processing_started_at - request.created_at).total_seconds())
+                    timer.add('generation', (timezone.now() - request.processing_started_at).total_seconds())
+                with timer.stage('parse'):
+                    parser = AssessmentStreamParser()
+                    parser.feed(message_output(message))
+                    # A truncated result only costs a re-request of its missing sections
+                    assessment_data, salvage_usage = self.service._finish_response(
+                        submission, parser, self.service.model, QUEUE
+                    )
+                assessment_data['route'] = f'{self.service.model} (batch)'
+                self.service.result_cache.set(submission, self.service.model, assessment_data)
+                # Processing time runs from submission to the batch, as that is
+                # what the student waited
+                self.service._save_assessment_results(
+                    assessment, assessment_data,
+                    request.processing_started_at.timestamp() if request.processing_started_at else time.time(),
+                    combine_usage(message.usage, salvage_usage),
+                    timer,
+                    lease=request
+                )
+            
+            self.service.complete_request(request, assessment)
+            return True
+        
+        except Exception as e:
+            self.service._record_assessment_failure(submission, assessment, e)
+            self.service.fail_request(request, e)
+            return False
+    
+    def run_once(self, limit: Optional[int] = None) -> Dict[str, int]:
+        """Collect ended batches, then submit one new batch from the queue."""
+        self.service.reap_expired_leases()
+        self.service.requeue_due_retries()
+        
+        completed = self.collect()
+        submitted = 0
+        if not self.stopping:
+            record = self.submit(limit)
+            submitted = record.request_count if record else 0
+        
+        return {'completed': completed, 'submitted': submitted}
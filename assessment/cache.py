@@ -0,0 +1,99 @@
+"""
+Content-hash cache of parsed assessment results.
+
+Identical essays for the same task (resubmitted drafts, pasted model answers,
+test accounts) are scored once; later submissions reuse the parsed scores and
+feedback without calling Claude.
+"""
+
+import hashlib
+import logging
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .schema import clean_feedback_items
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_content(content: str) -> str:
+    """Collapse whitespace so formatting-only edits hit the same cache entry."""
+    return ' '.join(content.split())
+
+
+class AssessmentResultCache:
+    """
+    Stores parsed assessment data keyed on (task code, prompt version, model, content).
+    
+    Backed by the ``ASSESSMENT_CACHE_ALIAS`` Django cache; expiry and eviction
+    come from that cache's TIMEOUT and MAX_ENTRIES. The cache must be shared
+    between processes (the settings use a FileBasedCache), or a result
+    scored by one worker is only reused by that worker.
+    
+    Essays that differ only in whitespace share an entry, so a hit's
+    highlight offsets are re-checked against the essay being assessed.
+    """
+    
+    KEY_PREFIX = 'assessment-result'
+    HITS_KEY = 'assessment-result-cache:hits'
+    MISSES_KEY = 'assessment-result-cache:misses'
+    
+    def __init__(self, prompt_version: str):
+        self.prompt_version = prompt_version
+        self.alias = getattr(settings, 'ASSESSMENT_CACHE_ALIAS', 'default')
+        self.enabled = getattr(settings, 'ASSESSMENT_CACHE_ENABLED', True)
+    
+    @property
+    def cache(self):
+        return caches[self.alias]
+    
+    def make_key(self, submission, model: str) -> str:
+        digest = hashlib.sha256('\x00'.join([
+            submission.task.task_code,
+            self.prompt_version,
+            model,
+            normalize_content(submission.content),
+        ]).encode('utf-8')).hexdigest()
+        return f'{self.KEY_PREFIX}:{digest}'
+    
+    def get(self, submission, model: str) -> Optional[Dict]:
+        """Return cached assessment data for this essay, or None."""
+        if not self.enabled:
+            return None
+        
+        data = self.cache.get(self.make_key(submission, model))
+        self._increment(self.HITS_KEY if data is not None else self.MISSES_KEY)
+        
+        if data is None:
+            return None
+        
+        logger.info(f"Assessment cache hit for submission {submission.id}")
+        # The cached offsets are into the essay first scored, which may differ in whitespace
+        return {
+            **data,
+            'feedback': clean_feedback_items([dict(item) for item in data['feedback']], submission.content),
+        }
+    
+    def set(self, submission, model: str, data: Dict):
+        if self.enabled:
+            self.cache.set(self.make_key(submission, model), data)
+    
+    def stats(self) -> Dict[str, int]:
+        counts = self.cache.get_many([self.HITS_KEY, self.MISSES_KEY])
+        hits = counts.get(self.HITS_KEY, 0)
+        misses = counts.get(self.MISSES_KEY, 0)
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else 0.0,
+        }
+    
+    def _increment(self, key: str):
+        try:
+            self.cache.add(key, 0, timeout=None)
+            self.cache.incr(key)
+        except ValueError:
+            # Evicted between add() and incr(); a lost count is harmless
+            pass
@@ -0,0 +1,203 @@
+"""
+Counters shared by every process on the host.
+
+The metrics and parse statistics must add up across all gunicorn workers,
+ASGI workers and queue daemons, which a per-process cache (LocMemCache)
+cannot do. Like the rate limiter's buckets, the counters live in a small
+JSON file guarded by ``fcntl.flock``.
+
+Recording a count never touches the file: increments are summed in memory
+and a background thread adds them to the file every
+``ASSESSMENT_METRICS_FLUSH_SECONDS`` (and at scrape time and exit), so the
+request path takes only a process-local lock. A process that is killed
+loses at most one interval of increments.
+
+Gauges (e.g. open streams) are not summed into the file, where a worker
+killed mid-stream would leave its +1 behind forever. Each process writes
+its current value under a key scoped to its PID, overwriting whatever a
+previous process with the same PID left there, and readers add up the
+values of the PIDs that are still alive.
+"""
+
+import os
+import json
+import time
+import fcntl
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SharedCounters:
+    """Named integer counters in a flock-guarded JSON file, buffered per process."""
+
+    GAUGE_SEPARATOR = '@'
+    
+    # One buffer per file in each process, so ParseStats and the metrics
+    # registry share a flusher
+    _instances: Dict[str, 'SharedCounters'] = {}
+    _instances_lock = threading.Lock()
+    
+    def __init__(self, path: str, flush_interval: float = 5):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending: Dict[str, int] = {}
+        self._gauges: Dict[str, int] = {}
+        self._gauges_dirty = False
+        self._pid = None
+        atexit.register(self.flush)
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    @classmethod
+    def from_settings(cls) -> 'SharedCounters':
+        path = str(getattr(
+            settings, 'ASSESSMENT_METRICS_FILE',
+            settings.BASE_DIR / 'run' / 'assessment-metrics.json'
+        ))
+        with cls._instances_lock:
+            if path not in cls._instances:
+                cls._instances[path] = cls(path, getattr(settings, 'ASSESSMENT_METRICS_FLUSH_SECONDS', 5))
+            return cls._instances[path]
+
+    def incr(self, key: str, delta: int = 1):
+        self.incr_many({key: delta})
+
+    def incr_many(self, deltas: Dict[str, int]):
+        """Add each delta to its counter; reaches the file on the next flush."""
+        with self._lock:
+            self._start()
+            for key, delta in deltas.items():
+                self._pending[key] = self._pending.get(key, 0) + delta
+    
+    def adjust_gauge(self, key: str, delta: int):
+        """Move this process's value of the gauge ``key`` by ``delta``."""
+        with self._lock:
+            self._start()
+            self._gauges[key] = self._gauges.get(key, 0) + delta
+            self._gauges_dirty = True
+    
+    def flush(self):
+        """Add the buffered increments to the file and publish this process's gauges."""
+        with self._lock:
+            if not (self._pending or self._gauges_dirty):
+                return
+            pending, self._pending = self._pending, {}
+            gauges = dict(self._gauges)
+            self._gauges_dirty = False
+        
+        try:
+            with self._state() as state:
+                for key, delta in pending.items():
+                    state[key] = state.get(key, 0) + delta
+                # Drop the gauges of dead processes and any this PID's
+                # previous owner left, then write this process's own
+                for key in [key for key in state if self.GAUGE_SEPARATOR in key]:
+                    pid = key.rsplit(self.GAUGE_SEPARATOR, 1)[1]
+                    if not pid.isdigit() or int(pid) == self._pid or not _pid_alive(int(pid)):
+                        del state[key]
+                for key, value in gauges.items():
+                    state[f'{key}{self.GAUGE_SEPARATOR}{self._pid}'] = value
+        except OSError as e:
+            logger.warning(f"Could not write counters to {self.path}: {e}")
+            with self._lock:
+                for key, delta in pending.items():
+                    self._pending[key] = self._pending.get(key, 0) + delta
+                self._gauges_dirty = True
+
+    def values(self) -> Dict[str, int]:
+        """
+        All counters, after flushing this process's buffer; read under a
+        shared lock, so never a partial write.
+        """
+        self.flush()
+        if not os.path.exists(self.path):
+            return {}
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            return self._load(self._read(fd))
+        finally:
+            os.close(fd)
+
+    def gauge(self, key: str, values: Dict[str, int] = None) -> int:
+        """The gauge ``key`` summed over the live processes."""
+        values = self.values() if values is None else values
+        prefix = f'{key}{self.GAUGE_SEPARATOR}'
+        return sum(
+            value for name, value in values.items()
+            if name.startswith(prefix) and name[len(prefix):].isdigit() and _pid_alive(int(name[len(prefix):]))
+        )
+    
+    def _start(self):
+        """
+        Start the flusher the first time this process records anything.
+        
+        Called with ``self._lock`` held. The first flush clears any gauge a
+        dead process with the same PID left behind.
+        """
+        if self._pid is not None:
+            return
+        self._pid = os.getpid()
+        self._gauges_dirty = True
+        threading.Thread(target=self._flush_loop, name='counters-flush', daemon=True).start()
+    
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+    
+    def _after_fork(self):
+        """
+        A forked worker inherits neither the flusher nor its parent's
+        buffer: increments recorded before the fork are the parent's to
+        flush, and the worker's gauges start at zero.
+        """
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._gauges = dict.fromkeys(self._gauges, 0)
+        self._gauges_dirty = False
+        self._pid = None
+    
+    @contextmanager
+    def _state(self):
+        """Lock the counters file and yield its counters for editing."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o664)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            state = self._load(self._read(fd))
+            yield state
+            data = json.dumps(state).encode('utf-8')
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _read(fd: int) -> bytes:
+        return os.read(fd, max(os.fstat(fd).st_size, 1))
+
+    def _load(self, raw: bytes) -> Dict[str, int]:
+        try:
+            return json.loads(raw) if raw else {}
+        except ValueError:
+            logger.warning(f"Resetting corrupt counters in {self.path}")
+            return {}
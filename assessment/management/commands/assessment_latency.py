@@ -0,0 +1,77 @@
+"""
+Django management command to report assessment pipeline latency percentiles.
+"""
+
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from assessment.models import Assessment
+from assessment.timing import PERCENTILES, REPORT_PATHS, latency_report
+
+
+class Command(BaseCommand):
+    help = 'Report p50/p95/p99 per-stage latency and token usage of recent assessments'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=7,
+            help='Only include assessments completed in the last N days'
+        )
+        
+        parser.add_argument(
+            '--model',
+            type=str,
+            default=None,
+            help='Only include assessments with this ai_model_used (route) value'
+        )
+        
+        parser.add_argument(
+            '--path',
+            choices=REPORT_PATHS,
+            default='all',
+            help='Only include streamed or queued assessments (time to first token is only recorded when streaming)'
+        )
+        
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=10000,
+            help='Use at most this many of the most recent assessments'
+        )
+        
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print the report as JSON'
+        )
+    
+    def handle(self, *args, **options):
+        queryset = Assessment.objects.filter(
+            completed_at__gte=timezone.now() - timedelta(days=options['days'])
+        )
+        if options['model']:
+            queryset = queryset.filter(ai_model_used=options['model'])
+        
+        report = latency_report(queryset, limit=options['limit'], path=options['path'])
+        
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        
+        if not report:
+            self.stdout.write('No completed assessments with timings in this period')
+            return
+        
+        labels = [f'p{pct}' for pct in PERCENTILES]
+        self.stdout.write(
+            f"{'stage / tokens':<28} {'count':>7} {'mean':>9} " + ' '.join(f'{label:>9}' for label in labels)
+        )
+        for field, stats in report.items():
+            self.stdout.write(
+                f"{field:<28} {stats['count']:>7} {stats['mean']:>9} "
+                + ' '.join(f'{stats[label]:>9}' for label in labels)
+            )
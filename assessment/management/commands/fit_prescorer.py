@@ -0,0 +1,133 @@
+"""
+Django management command to refit the prescorer's band model against Claude.
+"""
+
+import os
+import json
+import random
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from assessment.models import Assessment
+from assessment.prescorer import CRITERIA, DEFAULT_MODEL, PreScorer
+
+
+class Command(BaseCommand):
+    help = 'Refit the local prescorer band model on completed Claude assessments'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-samples',
+            type=int,
+            default=200,
+            help='Refuse to fit on fewer completed assessments than this'
+        )
+        
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=5000,
+            help='Use at most this many of the most recent completed assessments'
+        )
+        
+        parser.add_argument(
+            '--ridge',
+            type=float,
+            default=1.0,
+            help='L2 penalty on the weights; raise it if the fit is unstable'
+        )
+        
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=None,
+            help='Where to write the model (default ASSESSMENT_PRESCORER_MODEL)'
+        )
+        
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report the fit without writing the model'
+        )
+    
+    def handle(self, *args, **options):
+        output = options['output'] or getattr(settings, 'ASSESSMENT_PRESCORER_MODEL', None)
+        if not output and not options['dry_run']:
+            raise CommandError('Set ASSESSMENT_PRESCORER_MODEL or pass --output')
+        
+        assessments = (
+            Assessment.objects
+            .filter(
+                status='completed',
+                task_achievement_score__isnull=False,
+                coherence_cohesion_score__isnull=False,
+                lexical_resource_score__isnull=False,
+                grammar_accuracy_score__isnull=False,
+            )
+            .select_related('submission__task')
+            .order_by('-completed_at')[:options['limit']]
+        )
+        
+        scorer = PreScorer(model=DEFAULT_MODEL)
+        samples = [
+            {
+                'features': scorer.extract_features(assessment.submission.content, assessment.submission.task),
+                'scores': assessment.criterion_scores,
+            }
+            for assessment in assessments
+        ]
+        
+        if len(samples) < options['min_samples']:
+            raise CommandError(
+                f'Only {len(samples)} completed assessments; need at least {options["min_samples"]}'
+            )
+        
+        # Hold out a fifth of the essays to compare the default and refitted models
+        random.Random(0).shuffle(samples)
+        holdout_size = len(samples) // 5
+        holdout, training = samples[:holdout_size], samples[holdout_size:]
+        
+        try:
+            weights = scorer.fit(training, ridge=options['ridge'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        
+        self.stdout.write(f'Fitted on {len(training)} assessments, evaluated on {len(holdout)}')
+        self.stdout.write('Mean absolute error (bands):')
+        default_errors = self._errors(scorer, holdout)
+        fitted_errors = self._errors(PreScorer(model=weights), holdout)
+        for criterion in CRITERIA + ['overall_score']:
+            self.stdout.write(
+                f'  {criterion:<20} default {default_errors[criterion]:.2f}  fitted {fitted_errors[criterion]:.2f}'
+            )
+        
+        if options['dry_run']:
+            return
+        
+        # Refit on every sample for the model that ships
+        weights = scorer.fit(samples, ridge=options['ridge'])
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as model_file:
+            json.dump({
+                'fitted_at': timezone.now().isoformat(),
+                'samples': len(samples),
+                'ridge': options['ridge'],
+                'weights': weights,
+            }, model_file, indent=2)
+        
+        self.stdout.write(self.style.SUCCESS(f'Wrote prescorer model to {output}'))
+    
+    def _errors(self, scorer, samples):
+        """Mean absolute band error per criterion over samples."""
+        if not samples:
+            return {criterion: 0.0 for criterion in CRITERIA + ['overall_score']}
+        
+        totals = dict.fromkeys(CRITERIA + ['overall_score'], 0.0)
+        for sample in samples:
+            bands = scorer.predict(sample['features'])
+            actual = dict(sample['scores'])
+            actual['overall_score'] = round(sum(float(actual[c]) for c in CRITERIA) / 4 * 2) / 2
+            for criterion in totals:
+                totals[criterion] += abs(bands[criterion] - float(actual[criterion]))
+        return {criterion: total / len(samples) for criterion, total in totals.items()}
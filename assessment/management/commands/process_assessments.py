@@ -2,20 +2,42 @@
 Django management command to process assessment queue.
 """
 
+import signal
+import time
+
 from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
 from django.utils import timezone
+from assessment.batches import AssessmentBatchProcessor
+from assessment.metrics import metrics
 from assessment.services import assessment_service
+from assessment.wakeup import QueueListener
+from assessment.workers import AssessmentWorkerPool
+
+# Shortest wait between queue polls; idle waits double from here up to --interval
+MIN_POLL_INTERVAL = 1
+
+# Shortest time between rewrites of the --metrics-file textfile
+METRICS_FILE_INTERVAL = 15
+
+# Longest wait between batch polls after consecutive failed polls
+MAX_BATCH_ERROR_BACKOFF = 300
 
 
 class Command(BaseCommand):
     help = 'Process queued assessment requests using Claude AI'
     
+    _listener = None
+    _metrics_file = None
+    _metrics_written_at = 0.0
+    
     def add_arguments(self, parser):
         parser.add_argument(
             '--max-requests',
             type=int,
-            default=5,
-            help='Maximum number of requests to process in this run'
+            default=None,
+            help='Maximum number of requests to process in this run (default 5); '
+                 'in batch mode, the maximum batch size (default ASSESSMENT_BATCH_SIZE)'
         )
         
         parser.add_argument(
@@ -28,51 +50,72 @@ class Command(BaseCommand):
             '--interval',
             type=int,
             default=60,
-            help='Interval in seconds between processing cycles (daemon mode only)'
+            help='Maximum seconds between queue polls when idle (daemon mode only); '
+                 'new requests wake the daemon immediately'
+        )
+        
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of assessments to run concurrently'
+        )
+        
+        parser.add_argument(
+            '--batch',
+            action='store_true',
+            help='Submit queued requests as Anthropic Message Batches and collect '
+                 'finished batches, instead of calling Claude per request'
+        )
+    
+        parser.add_argument(
+            '--metrics-file',
+            type=str,
+            default=None,
+            help='Write Prometheus metrics to this file for the node exporter textfile '
+                 'collector. Counters are host-wide, the same as '
+                 "the web app's /metrics; the file adds per-worker rates"
         )
     
     def handle(self, *args, **options):
         max_requests = options['max_requests']
         daemon_mode = options['daemon']
         interval = options['interval']
+        workers = options['workers']
+        self._metrics_file = options['metrics_file']
+        
+        if workers < 1:
+            raise CommandError('--workers must be at least 1')
+        
+        if options['batch']:
+            self._handle_batch(max_requests, daemon_mode, interval)
+            return
+        
+        max_requests = max_requests or 5
+        pool = AssessmentWorkerPool(assessment_service, concurrency=workers)
+        self._install_signal_handlers(pool)
         
         if daemon_mode:
             self.stdout.write(
                 self.style.SUCCESS(
                     f'Starting assessment processor in daemon mode '
-                    f'(max_requests={max_requests}, interval={interval}s)'
+                    f'(workers={workers}, interval={interval}s)'
                 )
             )
             
-            import time
             try:
-                while True:
-                    processed = assessment_service.process_assessment_queue(max_requests)
-                    
-                    if processed > 0:
-                        self.stdout.write(
-                            self.style.SUCCESS(
-                                f'[{timezone.now()}] Processed {processed} assessments'
-                            )
-                        )
-                    else:
-                        self.stdout.write(
-                            self.style.WARNING(
-                                f'[{timezone.now()}] No assessments to process'
-                            )
-                        )
-                    
-                    time.sleep(interval)
-                    
+                self._run_daemon(pool, interval)
             except KeyboardInterrupt:
                 self.stdout.write(
                     self.style.SUCCESS('Assessment processor stopped by user')
                 )
+            finally:
+                self._shutdown(pool)
         else:
             self.stdout.write('Processing assessment queue...')
             
             try:
-                processed = assessment_service.process_assessment_queue(max_requests)
+                processed = pool.run_once(max_requests)
                 
                 if processed > 0:
                     self.stdout.write(
@@ -84,6 +127,180 @@ class Command(BaseCommand):
                     self.stdout.write(
                         self.style.WARNING('No assessments found in queue')
                     )
-                    
+            
             except Exception as e:
-                raise CommandError(f'Assessment processing failed: {e}')
\ No newline at end of file
+                raise CommandError(f'Assessment processing failed: {e}')
+            finally:
+                self._shutdown(pool)
+    
+    def _run_daemon(self, pool, interval):
+        """
+        Keep every worker busy and sleep only while the queue is empty.
+        
+        The daemon blocks on a QueueListener, so a new request or a finished
+        worker wakes it immediately. Timeouts back off from MIN_POLL_INTERVAL
+        up to ``interval`` as a safety net for missed notifications.
+        """
+        listener = QueueListener()
+        listener.start()
+        pool.on_done = listener.poke
+        self._listener = listener
+        
+        wait_seconds = MIN_POLL_INTERVAL
+        idle_reported = False
+        
+        try:
+            while not pool.stopping:
+                assessment_service.reap_expired_leases()
+                assessment_service.requeue_due_retries()
+                
+                processed = pool.reap(timeout=0)
+                if processed > 0:
+                    self.stdout.write(
+                        self.style.SUCCESS(
+                            f'[{timezone.now()}] Processed {processed} assessments '
+                            f'({pool.in_flight} in flight)'
+                        )
+                    )
+                
+                claimed = pool.fill()
+                if claimed or pool.in_flight:
+                    idle_reported = False
+                elif not idle_reported:
+                    self.stdout.write(
+                        self.style.WARNING(
+                            f'[{timezone.now()}] No assessments to process'
+                        )
+                    )
+                    idle_reported = True
+                
+                self._write_metrics(pool)
+                
+                if listener.wait(wait_seconds):
+                    wait_seconds = MIN_POLL_INTERVAL
+                else:
+                    wait_seconds = min(wait_seconds * 2, interval)
+        finally:
+            pool.on_done = None
+            self._listener = None
+            listener.close()
+    
+    def _handle_batch(self, batch_size, daemon_mode, interval):
+        """
+        Batch mode: collect ended Message Batches, then submit a new one.
+        
+        Without --daemon this is a single pass meant for cron; batch ids are
+        stored in the database, so each run resumes polling where the last
+        one left off.
+        """
+        processor = AssessmentBatchProcessor(assessment_service, batch_size=batch_size)
+        
+        def handle_sigterm(signum, frame):
+            self.stdout.write(self.style.WARNING(f'Received signal {signum}, stopping...'))
+            processor.stop()
+        
+        signal.signal(signal.SIGTERM, handle_sigterm)
+        
+        if daemon_mode:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Starting batch assessment processor in daemon mode '
+                    f'(batch size={processor.batch_size}, interval={interval}s)'
+                )
+            )
+        
+        error_backoff = interval
+        try:
+            while not processor.stopping:
+                try:
+                    result = processor.run_once()
+                except Exception as e:
+                    if not daemon_mode:
+                        raise CommandError(f'Batch assessment processing failed: {e}')
+                    # A transient API or database error: poll again later
+                    self.stderr.write(f'[{timezone.now()}] Batch poll failed, retrying in {error_backoff}s: {e}')
+                    close_old_connections()
+                    processor.idle(error_backoff)
+                    error_backoff = min(error_backoff * 2, max(interval, MAX_BATCH_ERROR_BACKOFF))
+                    continue
+                
+                error_backoff = interval
+                self._report_batch(result)
+                
+                self._write_metrics()
+                if not daemon_mode:
+                    break
+                processor.idle(interval)
+        except KeyboardInterrupt:
+            self.stdout.write(
+                self.style.SUCCESS('Batch assessment processor stopped by user')
+            )
+    
+    def _report_batch(self, result):
+        if result['completed'] or result['submitted']:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"[{timezone.now()}] Completed {result['completed']} batched assessments, "
+                    f"submitted {result['submitted']} requests in a new batch"
+                )
+            )
+        else:
+            self.stdout.write(
+                self.style.WARNING(f'[{timezone.now()}] No batch results or queued requests')
+            )
+    
+    def _install_signal_handlers(self, pool):
+        """Finish in-flight assessments on SIGTERM instead of dying mid-request."""
+        def handle_sigterm(signum, frame):
+            self.stdout.write(
+                self.style.WARNING(
+                    f'Received signal {signum}, waiting for {pool.in_flight} '
+                    f'in-flight assessments to finish...'
+                )
+            )
+            pool.stop()
+            if self._listener is not None:
+                self._listener.poke()
+        
+        signal.signal(signal.SIGTERM, handle_sigterm)
+    
+    def _shutdown(self, pool):
+        pool.shutdown()
+        self._write_metrics(pool, force=True)
+        self._report_throughput(pool)
+    
+    def _write_metrics(self, pool=None, force=False):
+        """Rewrite the --metrics-file textfile, at most every METRICS_FILE_INTERVAL seconds."""
+        if not self._metrics_file:
+            return
+        if not force and time.monotonic() - self._metrics_written_at < METRICS_FILE_INTERVAL:
+            return
+        
+        try:
+            metrics.write_textfile(self._metrics_file, pool.throughput_report() if pool else None)
+        except Exception as e:
+            self.stderr.write(f'Failed to write metrics file {self._metrics_file}: {e}')
+        self._metrics_written_at = time.monotonic()
+    
+    def _report_throughput(self, pool):
+        for worker, stats in pool.throughput_report().items():
+            self.stdout.write(
+                f"{worker}: {stats['processed']} completed, {stats['failed']} failed, "
+                f"{stats['busy_seconds']}s busy, {stats['per_minute']}/min"
+            )
+        
+        # Queueing delay in front of the shared Anthropic rate limiter, all processes on this host
+        limiter = assessment_service.rate_limiter.stats()
+        for lane, metrics in limiter.get('lanes', {}).items():
+            self.stdout.write(
+                f"rate limit {lane} lane: {metrics['granted']} granted, {metrics['delayed']} delayed, "
+                f"avg wait {metrics['avg_wait']}s, max wait {metrics['wait_max']}s, "
+                f"{metrics['timeouts']} timed out"
+            )
+        
+        # Responses that parsed incompletely, by output mode (tool use vs JSON text)
+        for mode, metrics in assessment_service.parse_stats.stats().items():
+            self.stdout.write(
+                f"parsing {mode} output: {metrics['responses']} responses, {metrics['salvaged']} salvaged, "
+                f"{metrics['failed']} failed ({metrics['failure_rate']:.2%} failure rate)"
+            )
@@ -0,0 +1,245 @@
+"""
+Prometheus metrics for the assessment pipeline.
+
+``metrics.render()`` produces the Prometheus text exposition format served
+at ``/metrics`` (and written to a textfile by ``process_assessments
+--metrics-file`` for the node exporter's textfile collector). It publishes:
+
+- ``ielts_assessment_requests{status}``: AssessmentRequest rows per
+  non-terminal status
+- ``ielts_assessment_oldest_queued_age_seconds``: age of the oldest queued
+  request
+- ``ielts_assessments_per_minute``: completed assessments per minute over
+  the last ``ASSESSMENT_METRICS_RATE_WINDOW`` seconds
+- ``ielts_assessments_completed_total``, ``ielts_claude_errors_total{error_class}``,
+  ``ielts_claude_tokens_total{type}`` and ``ielts_claude_responses_total{mode,outcome}``
+- ``ielts_sse_connections``: streaming assessments currently open
+- ``ielts_http_request_duration_seconds{view}``: per-view latency histogram
+
+Scrapes stay cheap: the database figures come from three indexed queries
+whose results are cached for ``ASSESSMENT_METRICS_CACHE_SECONDS``, and
+everything else is a counter in the host-wide ``ASSESSMENT_METRICS_FILE``
+(see ``counters.py``), so a scrape of any web process reports the totals
+of every web process and queue daemon on the host, up to
+``ASSESSMENT_METRICS_FLUSH_SECONDS`` behind. Recording a request only
+updates an in-memory buffer; no request waits on the file.
+"""
+
+import os
+import tempfile
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .counters import SharedCounters
+from .models import Assessment, AssessmentRequest
+from .parsing import ParseStats
+
+# Request statuses with a bounded number of rows; completed and cancelled
+# requests are covered by ielts_assessments_completed_total instead
+ACTIVE_REQUEST_STATUSES = ('queued', 'processing', 'failed', 'dead_letter')
+
+TOKEN_TYPES = ('input', 'output', 'cache_creation_input', 'cache_read_input')
+
+# Upper bounds in seconds of the request latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+class MetricsRegistry:
+    """
+    Counters, gauges and histograms kept in the host-wide counters file;
+    see the module docstring.
+    
+    The label values seen for each metric (view names, error classes) are
+    read back from the counter keys when rendering.
+    """
+    
+    KEY_PREFIX = 'assessment-metrics'
+    
+    def __init__(self):
+        self.alias = getattr(settings, 'ASSESSMENT_CACHE_ALIAS', 'default')
+        self.counters = SharedCounters.from_settings()
+        self.parse_stats = ParseStats()
+    
+    @property
+    def cache(self):
+        return caches[self.alias]
+    
+    def _key(self, name: str, *labels) -> str:
+        return ':'.join((self.KEY_PREFIX, name) + tuple(str(label) for label in labels))
+    
+    def assessment_completed(self, usage=None):
+        """Count a saved assessment and the tokens of its Claude calls."""
+        deltas = {self._key('completed'): 1}
+        for token_type in TOKEN_TYPES:
+            tokens = getattr(usage, f'{token_type}_tokens', None) if usage is not None else None
+            if tokens:
+                deltas[self._key('tokens', token_type)] = tokens
+        self.counters.incr_many(deltas)
+    
+    def claude_error(self, error_class: str):
+        self.counters.incr(self._key('errors', error_class))
+    
+    def sse_opened(self):
+        self.counters.adjust_gauge(self._key('sse'), 1)
+    
+    def sse_closed(self):
+        self.counters.adjust_gauge(self._key('sse'), -1)
+    
+    def observe_request(self, view: str, seconds: float):
+        """
+        Add a request to the latency histogram of ``view``.
+        
+        Each request increments only the bucket it falls in; the buckets are
+        made cumulative when rendering.
+        """
+        bucket = next((str(bound) for bound in LATENCY_BUCKETS if seconds <= bound), '+Inf')
+        self.counters.incr_many({
+            self._key('latency', view, bucket): 1,
+            self._key('latency', view, 'sum_ms'): int(round(seconds * 1000)),
+        })
+    
+    def _labels(self, values: Dict[str, int], name: str) -> List[str]:
+        """Label values of ``name`` among the counter keys (view names may contain ':')."""
+        prefix = self._key(name) + ':'
+        labels = set()
+        for key in values:
+            if key.startswith(prefix):
+                label = key[len(prefix):]
+                labels.add(label.rsplit(':', 1)[0] if name == 'latency' else label)
+        return sorted(labels)
+    
+    def queue_snapshot(self) -> Dict:
+        """
+        Request counts by status, oldest queued request and completion rate.
+        
+        Cached for ASSESSMENT_METRICS_CACHE_SECONDS so frequent scrapes do
+        not each run the queries.
+        """
+        key = self._key('snapshot')
+        snapshot = self.cache.get(key)
+        if snapshot is not None:
+            return snapshot
+        
+        now = timezone.now()
+        counts = dict.fromkeys(ACTIVE_REQUEST_STATUSES, 0)
+        counts.update(
+            AssessmentRequest.objects.filter(status__in=ACTIVE_REQUEST_STATUSES)
+            .values_list('status')
+            .annotate(count=Count('id'))
+            .order_by()
+        )
+        oldest = AssessmentRequest.objects.filter(status='queued').aggregate(oldest=Min('created_at'))['oldest']
+        window = getattr(settings, 'ASSESSMENT_METRICS_RATE_WINDOW', 300)
+        completed = Assessment.objects.filter(
+            status='completed', completed_at__gte=now - timedelta(seconds=window)
+        ).count()
+        
+        snapshot = {
+            'requests': counts,
+            'oldest_queued_age': (now - oldest).total_seconds() if oldest else 0.0,
+            'per_minute': completed * 60 / window,
+        }
+        self.cache.set(key, snapshot, timeout=getattr(settings, 'ASSESSMENT_METRICS_CACHE_SECONDS', 15))
+        return snapshot
+    
+    def render(self, workers: Optional[Dict[str, Dict]] = None) -> str:
+        """
+        The metrics in the Prometheus text exposition format.
+        
+        Args:
+            workers: Optional AssessmentWorkerPool.throughput_report() to
+                publish per-worker rates (queue daemon textfile only)
+        """
+        lines = []
+        
+        def family(name: str, kind: str, help_text: str, samples: Iterable):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for suffix, labels, value in samples:
+                lines.append(f'{name}{suffix}{_format_labels(labels)} {value}')
+        
+        snapshot = self.queue_snapshot()
+        family('ielts_assessment_requests', 'gauge', 'Assessment requests by status',
+               [('', {'status': status}, count) for status, count in snapshot['requests'].items()])
+        family('ielts_assessment_oldest_queued_age_seconds', 'gauge', 'Age of the oldest queued assessment request',
+               [('', {}, round(snapshot['oldest_queued_age'], 3))])
+        family('ielts_assessments_per_minute', 'gauge', 'Assessments completed per minute, all processes',
+               [('', {}, round(snapshot['per_minute'], 3))])
+        
+        values = self.counters.values()
+        error_classes = self._labels(values, 'errors')
+        views = self._labels(values, 'latency')
+        
+        family('ielts_assessments_completed_total', 'counter', 'Assessments completed, all processes',
+               [('', {}, values.get(self._key('completed'), 0))])
+        family('ielts_claude_errors_total', 'counter', 'Failed assessments by error class',
+               [('', {'error_class': error_class}, values.get(self._key('errors', error_class), 0))
+                for error_class in error_classes])
+        family('ielts_claude_tokens_total', 'counter', 'Claude tokens used by completed assessments',
+               [('', {'type': token_type}, values.get(self._key('tokens', token_type), 0))
+                for token_type in TOKEN_TYPES])
+        
+        parse_stats = self.parse_stats.stats()
+        family('ielts_claude_responses_total', 'counter', 'Claude responses parsed, by output mode and outcome',
+               [('', {'mode': mode, 'outcome': outcome}, counts[outcome])
+                for mode, counts in parse_stats.items() for outcome in ParseStats.OUTCOMES])
+        
+        family('ielts_sse_connections', 'gauge', 'Streaming assessment connections open',
+               [('', {}, max(0, self.counters.gauge(self._key('sse'), values)))])
+        
+        samples = []
+        for view in views:
+            cumulative = 0
+            for bound in LATENCY_BUCKETS:
+                cumulative += values.get(self._key('latency', view, str(bound)), 0)
+                samples.append(('_bucket', {'view': view, 'le': bound}, cumulative))
+            cumulative += values.get(self._key('latency', view, '+Inf'), 0)
+            samples.append(('_bucket', {'view': view, 'le': '+Inf'}, cumulative))
+            samples.append(('_sum', {'view': view}, values.get(self._key('latency', view, 'sum_ms'), 0) / 1000))
+            samples.append(('_count', {'view': view}, cumulative))
+        family('ielts_http_request_duration_seconds', 'histogram', 'Request latency by view', samples)
+        
+        if workers:
+            family('ielts_worker_assessments_per_minute', 'gauge', 'Assessments per minute per queue worker thread',
+                   [('', {'worker': name}, stats['per_minute']) for name, stats in workers.items()])
+            family('ielts_worker_busy_seconds', 'gauge', 'Seconds each queue worker thread spent assessing',
+                   [('', {'worker': name}, stats['busy_seconds']) for name, stats in workers.items()])
+        
+        return '\n'.join(lines) + '\n'
+    
+    def write_textfile(self, path: str, workers: Optional[Dict[str, Dict]] = None):
+        """
+        Write the metrics to ``path`` for the node exporter textfile collector.
+        
+        The file is replaced atomically so the collector never reads a
+        partial file.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        handle, tmp_path = tempfile.mkstemp(dir=directory, prefix='.metrics-', suffix='.prom')
+        try:
+            with os.fdopen(handle, 'w') as f:
+                f.write(self.render(workers))
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessment', '0001_initial'),
+        ('practice', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assessmentrequest',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, help_text="When the worker's claim lapses and the request can be re-queued", null=True),
+        ),
+        migrations.AddField(
+            model_name='assessmentrequest',
+            name='worker_id',
+            field=models.CharField(blank=True, help_text='Worker that claimed this request', max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='assessmentrequest',
+            index=models.Index(fields=['status', 'lease_expires_at'], name='assessment__status_9c624a_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessment', '0002_assessmentrequest_lease'),
+        ('practice', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assessmentrequest',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0, help_text='Number of times a worker has claimed this request'),
+        ),
+        migrations.AddField(
+            model_name='assessmentrequest',
+            name='last_error_class',
+            field=models.CharField(blank=True, help_text='Classification of the last failure (rate_limit, overloaded, timeout, ...)', max_length=30),
+        ),
+        migrations.AlterField(
+            model_name='assessmentrequest',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed'), ('dead_letter', 'Dead Letter'), ('cancelled', 'Cancelled')], default='queued', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='assessmentrequest',
+            index=models.Index(fields=['status', 'retry_after'], name='assessment__status_2b6123_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessment', '0003_assessmentrequest_retry_policy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assessment',
+            name='cache_creation_input_tokens',
+            field=models.PositiveIntegerField(blank=True, help_text='Input tokens written to the prompt cache', null=True),
+        ),
+        migrations.AddField(
+            model_name='assessment',
+            name='cache_read_input_tokens',
+            field=models.PositiveIntegerField(blank=True, help_text='Input tokens read from the prompt cache', null=True),
+        ),
+    ]
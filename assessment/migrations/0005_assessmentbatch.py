@@ -0,0 +1,42 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessment', '0004_assessment_prompt_cache_tokens'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssessmentBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('batch_id', models.CharField(help_text='Anthropic Message Batch id', max_length=100, unique=True)),
+                ('status', models.CharField(choices=[('in_progress', 'In Progress'), ('canceling', 'Canceling'), ('ended', 'Ended'), ('collected', 'Results Collected')], default='in_progress', max_length=20)),
+                ('request_count', models.PositiveIntegerField(default=0)),
+                ('succeeded_count', models.PositiveIntegerField(default=0)),
+                ('errored_count', models.PositiveIntegerField(default=0)),
+                ('canceled_count', models.PositiveIntegerField(default=0)),
+                ('expired_count', models.PositiveIntegerField(default=0)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('ended_at', models.DateTimeField(blank=True, null=True)),
+                ('collected_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'assessment_batch',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status'], name='assessment__status_ef2b2e_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='assessmentrequest',
+            name='batch',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='requests', to='assessment.assessmentbatch'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessment', '0005_assessmentbatch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assessment',
+            name='generation_ms',
+            field=models.PositiveIntegerField(blank=True, help_text='Time spent in Claude calls after the first token', null=True),
+        ),
+        migrations.AddField(
+            model_name='assessment',
+            name='input_tokens',
+            field=models.PositiveIntegerField(blank=True, help_text='Uncached input tokens across all Claude calls', null=True),
+        ),
+        migrations.AddField(
+            model_name='assessment',
+            name='output_tokens',
+            field=models.PositiveIntegerField(blank=True, help_text='Output tokens across all Claude calls', null=True),
+        ),
+        migrations.AddField(
+            model_name='assessment',
+            name='parse_ms',
+            field=models.PositiveIntegerField(blank=True, help_text='Time spent parsing the response, including salvage re-requests', null=True),
+        ),
+        migrations.AddField(
+            model_name='assessment',
+            name='persist_ms',
+            field=models.PositiveIntegerField(blank=True, help_text='Time spent saving scores and feedback', null=True),
+        ),
+        migrations.AddField(
+            model_name='assessment',
+            name='prompt_build_ms',
+            field=models.PositiveIntegerField(blank=True, help_text='Time spent building the Claude request', null=True),
+        ),
+        migrations.AddField(
+            model_name='assessment',
+            name='queue_wait_ms',
+            field=models.PositiveIntegerField(blank=True, help_text='Time from the assessment request to the start of scoring', null=True),
+        ),
+        migrations.AddField(
+            model_name='assessment',
+            name='time_to_first_token_ms',
+            field=models.PositiveIntegerField(blank=True, help_text='Time until Claude streamed the first token (streaming only)', null=True),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:06
+
+from django.db import migrations, models
+
+
+def cancel_duplicate_active_requests(apps, schema_editor):
+    """Keep one active request per submission so the unique constraint can be created."""
+    AssessmentRequest = apps.get_model('assessment', 'AssessmentRequest')
+    active = AssessmentRequest.objects.filter(status__in=['queued', 'processing', 'failed'])
+    
+    seen = set()
+    duplicates = []
+    # A request a worker is processing wins over queued and failed ones
+    ordering = models.Case(models.When(status='processing', then=0), default=1)
+    for request_id, submission_id in active.order_by('submission_id', ordering, 'created_at').values_list(
+        'id', 'submission_id'
+    ):
+        if submission_id in seen:
+            duplicates.append(request_id)
+        seen.add(submission_id)
+    
+    AssessmentRequest.objects.filter(id__in=duplicates).update(
+        status='cancelled',
+        error_details='Duplicate of another active request for the submission'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessment', '0006_assessment_stage_timings'),
+        ('practice', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(cancel_duplicate_active_requests, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='assessmentrequest',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['queued', 'processing', 'failed'])), fields=('submission',), name='unique_active_assessment_request'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessment', '0007_assessmentrequest_unique_active'),
+        ('practice', '0002_submission_user_submitted_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assessment',
+            index=models.Index(condition=models.Q(('status', 'completed')), fields=['submission', '-completed_at'], name='assessment_completed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assessmentrequest',
+            index=models.Index(condition=models.Q(('status', 'queued')), fields=['-priority', 'created_at'], name='assessment_request_queued_idx'),
+        ),
+    ]
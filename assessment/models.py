@@ -108,6 +108,68 @@ class Assessment(BaseModel):
         help_text="AI confidence in the assessment (0.00-1.00)"
     )
     
+    # Anthropic prompt caching (static rubric system block)
+    cache_creation_input_tokens = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Input tokens written to the prompt cache"
+    )
+    
+    cache_read_input_tokens = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Input tokens read from the prompt cache"
+    )
+    
+    input_tokens = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Uncached input tokens across all Claude calls"
+    )
+    
+    output_tokens = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Output tokens across all Claude calls"
+    )
+    
+    # Per-stage latency in milliseconds (see assessment/timing.py)
+    queue_wait_ms = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Time from the assessment request to the start of scoring"
+    )
+    
+    prompt_build_ms = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Time spent building the Claude request"
+    )
+    
+    time_to_first_token_ms = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Time until Claude streamed the first token (streaming only)"
+    )
+    
+    generation_ms = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Time spent in Claude calls after the first token"
+    )
+    
+    parse_ms = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Time spent parsing the response, including salvage re-requests"
+    )
+    
+    persist_ms = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Time spent saving scores and feedback"
+    )
+    
     # Error handling
     error_message = models.TextField(
         blank=True,
@@ -157,6 +219,12 @@ class Assessment(BaseModel):
             models.Index(fields=['status']),
             models.Index(fields=['overall_band_score']),
             models.Index(fields=['created_at']),
+            # History, progress and latency reports: completed assessments, newest first
+            models.Index(
+                fields=['submission', '-completed_at'],
+                condition=models.Q(status='completed'),
+                name='assessment_completed_idx',
+            ),
         ]
 
 
@@ -267,9 +335,14 @@ class AssessmentRequest(BaseModel):
         ('processing', 'Processing'),
         ('completed', 'Completed'),
         ('failed', 'Failed'),
+        ('dead_letter', 'Dead Letter'),
         ('cancelled', 'Cancelled'),
     ]
     
+    # A submission has at most one request in these statuses (failed
+    # requests are waiting for their retry)
+    ACTIVE_STATUSES = ('queued', 'processing', 'failed')
+    
     # Request details
     submission = models.ForeignKey(
         Submission,
@@ -303,6 +376,39 @@ class AssessmentRequest(BaseModel):
         help_text="When to retry if failed"
     )
     
+    attempts = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of times a worker has claimed this request"
+    )
+    
+    last_error_class = models.CharField(
+        max_length=30,
+        blank=True,
+        help_text="Classification of the last failure (rate_limit, overloaded, timeout, ...)"
+    )
+    
+    # Queue lease (which worker owns a processing request, and until when)
+    worker_id = models.CharField(
+        max_length=100,
+        blank=True,
+        help_text="Worker that claimed this request"
+    )
+    
+    lease_expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the worker's claim lapses and the request can be re-queued"
+    )
+    
+    # Message Batch this request was submitted in (batch mode only)
+    batch = models.ForeignKey(
+        'AssessmentBatch',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='requests'
+    )
+    
     # Result reference
     assessment = models.ForeignKey(
         Assessment,
@@ -322,4 +428,68 @@ class AssessmentRequest(BaseModel):
             models.Index(fields=['status']),
             models.Index(fields=['priority', 'created_at']),
             models.Index(fields=['processing_started_at']),
+            models.Index(fields=['status', 'lease_expires_at']),
+            models.Index(fields=['status', 'retry_after']),
+            # The claim query: queued requests, highest priority then oldest first
+            models.Index(
+                fields=['-priority', 'created_at'],
+                condition=models.Q(status='queued'),
+                name='assessment_request_queued_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['submission'],
+                condition=models.Q(status__in=['queued', 'processing', 'failed']),
+                name='unique_active_assessment_request',
+            ),
+        ]
+
+
+class AssessmentBatch(BaseModel):
+    """
+    An Anthropic Message Batch carrying queued assessment requests.
+    
+    The batch id is persisted so that results can be collected by a later
+    run of ``process_assessments --batch`` after a restart.
+    """
+    STATUS_CHOICES = [
+        ('in_progress', 'In Progress'),
+        ('canceling', 'Canceling'),
+        ('ended', 'Ended'),
+        ('collected', 'Results Collected'),
+    ]
+    
+    batch_id = models.CharField(
+        max_length=100,
+        unique=True,
+        help_text="Anthropic Message Batch id"
+    )
+    
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='in_progress'
+    )
+    
+    # Request counts as last reported by the Batches API
+    request_count = models.PositiveIntegerField(default=0)
+    succeeded_count = models.PositiveIntegerField(default=0)
+    errored_count = models.PositiveIntegerField(default=0)
+    canceled_count = models.PositiveIntegerField(default=0)
+    expired_count = models.PositiveIntegerField(default=0)
+    
+    # Timestamps
+    expires_at = models.DateTimeField(null=True, blank=True)
+    ended_at = models.DateTimeField(null=True, blank=True)
+    collected_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Assessment Batch {self.batch_id} - {self.status}"
+    
+    class Meta:
+        db_table = 'assessment_batch'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status']),
         ]
@@ -0,0 +1,328 @@
+"""
+Incremental parser for Claude's assessment JSON.
+
+AssessmentStreamParser consumes the response as it streams in (or all at
+once) with a small JSON state machine, instead of waiting for the full text
+and slicing it between the first ``{`` and the last ``}``. Each band score
+and feedback item is emitted as soon as it is complete, so the UI can render
+it straight away.
+
+Because it knows which sections did arrive, a truncated or damaged response
+is not a total loss: ``missing_sections()`` names what is left, and the
+service re-requests only those sections (see
+IELTSAssessmentService._salvage_params) and merges them in with
+``merge()``. Prose or code fences around the JSON and stray text after it
+are ignored.
+
+The same parser reads tool-use output: ``message_output()`` and
+``stream_deltas()`` turn a ``record_assessment`` tool call (see schema.py)
+into the JSON text of its input, so either output mode feeds the parser.
+"""
+
+import json
+import logging
+from decimal import Decimal
+from typing import AsyncIterator, Dict, Iterator, List
+
+from .counters import SharedCounters
+
+logger = logging.getLogger(__name__)
+
+CRITERIA = ('task_achievement', 'coherence_cohesion', 'lexical_resource', 'grammar_accuracy')
+
+# Feedback item types the prompt asks for, in order
+FEEDBACK_TYPES = ('overall', 'task_achievement', 'coherence_cohesion', 'lexical_resource',
+                  'grammar_accuracy', 'suggestion')
+
+
+class IncompleteResponseError(ValueError):
+    """Claude's response is missing required sections."""
+    
+    def __init__(self, message: str, missing: List[str]):
+        super().__init__(message)
+        self.missing = missing
+
+
+def message_output(message) -> str:
+    """
+    The assessment JSON text of a Messages API response.
+    
+    Returns the tool call's input when Claude answered with a tool_use
+    block, otherwise the concatenated text blocks.
+    """
+    for block in message.content:
+        if block.type == 'tool_use':
+            return json.dumps(block.input)
+    return ''.join(block.text for block in message.content if block.type == 'text')
+
+
+def stream_deltas(stream) -> Iterator[str]:
+    """Text and tool-input JSON deltas of a MessageStream, in arrival order."""
+    for event in stream:
+        if event.type == 'text':
+            yield event.text
+        elif event.type == 'input_json':
+            yield event.partial_json
+
+
+async def astream_deltas(stream) -> AsyncIterator[str]:
+    """Async version of stream_deltas."""
+    async for event in stream:
+        if event.type == 'text':
+            yield event.text
+        elif event.type == 'input_json':
+            yield event.partial_json
+
+
+class AssessmentStreamParser:
+    """
+    Parses the assessment JSON object incrementally; see the module docstring.
+    
+    Events returned by ``feed()``: ``{'type': 'score', 'criterion': ...,
+    'score': ...}`` for each band score and ``{'type': 'feedback',
+    'feedback_type': ..., 'title': ..., 'item': {...}}`` for each feedback
+    item. Every event carries ``sections_done`` and ``sections_total``.
+    """
+    
+    SCORE_KEYS = CRITERIA + ('overall_score',)
+    # Five band scores plus the six feedback items the prompt asks for
+    SECTIONS_TOTAL = len(SCORE_KEYS) + len(FEEDBACK_TYPES)
+    
+    def __init__(self):
+        self.text = ''
+        self.scores = {}
+        self.confidence = None
+        self.feedback = []
+        self.feedback_closed = False
+        self.complete = False
+        self.malformed_sections = 0
+        self._position = 0
+        self._stack = []          # open containers: [kind, key in top-level object]
+        self._in_string = False
+        self._escaped = False
+        self._string_start = None
+        self._key = None          # current top-level key
+        self._expect = 'key'      # top-level state: 'key', 'colon', 'value', 'comma'
+        self._value_start = None
+        self._item_start = None
+    
+    @property
+    def sections_done(self) -> int:
+        return min(len(self.scores) + len(self.feedback), self.SECTIONS_TOTAL)
+    
+    def feed(self, chunk: str) -> List[Dict]:
+        """Consume a text delta and return events for the sections it completed."""
+        events = []
+        self.text += chunk
+        text = self.text
+        
+        while self._position < len(text) and not self.complete:
+            index = self._position
+            char = text[index]
+            self._position += 1
+            
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1 and self._expect == 'key':
+                        self._key = self._load(text[self._string_start:index + 1])
+                        self._expect = 'colon'
+                continue
+            
+            if not self._stack:
+                # Skip any prose or code fence before the object
+                if char == '{':
+                    self._stack.append(['object', None])
+                    self._expect = 'key'
+                continue
+            
+            depth = len(self._stack)
+            if char == '"':
+                self._in_string = True
+                self._string_start = index
+            elif char in '{[':
+                self._stack.append(['object' if char == '{' else 'array', self._key])
+                if char == '{' and depth == 2 and self._stack[1][1] == 'feedback':
+                    self._item_start = index
+            elif char in '}]':
+                if depth == 1 and self._expect == 'value':
+                    events.extend(self._top_level_value(text[self._value_start:index]))
+                self._stack.pop()
+                if depth == 3 and char == '}' and self._item_start is not None:
+                    events.extend(self._feedback_item(text[self._item_start:index + 1]))
+                    self._item_start = None
+                elif depth == 2:
+                    if self._key == 'feedback' and char == ']':
+                        self.feedback_closed = True
+                    self._expect = 'comma'
+                elif depth == 1:
+                    self.complete = True
+            elif depth == 1:
+                if char == ':' and self._expect == 'colon':
+                    self._expect = 'value'
+                    self._value_start = index + 1
+                elif char == ',':
+                    if self._expect == 'value':
+                        events.extend(self._top_level_value(text[self._value_start:index]))
+                    self._expect = 'key'
+        
+        return events
+    
+    def missing_sections(self) -> List[str]:
+        """Score keys and feedback types still missing from the response."""
+        missing = [key for key in CRITERIA if key not in self.scores]
+        if 'overall_score' not in self.scores and missing:
+            missing.append('overall_score')
+        if not self.feedback_closed:
+            present = {item.get('type') for item in self.feedback}
+            missing += [f'feedback:{t}' for t in FEEDBACK_TYPES if t not in present]
+        return missing
+    
+    def result(self) -> Dict:
+        """
+        Assessment data in the format _save_assessment_results expects.
+        
+        Raises:
+            IncompleteResponseError: if scores or feedback are missing
+        """
+        missing = self.missing_sections()
+        if missing:
+            raise IncompleteResponseError(
+                f"Response is missing {', '.join(missing)}" if self.sections_done else "No JSON found in response",
+                missing
+            )
+        
+        scores = dict(self.scores)
+        if 'overall_score' not in scores:
+            # The four criteria arrived; the overall band is their rounded mean
+            scores['overall_score'] = round(sum(scores[key] for key in CRITERIA) / 4 * 2) / 2
+        
+        return {
+            **{key: Decimal(str(value)) for key, value in scores.items()},
+            'confidence': Decimal(str(self.confidence if self.confidence is not None else 0.85)),
+            'feedback': self.feedback,
+        }
+    
+    def merge(self, response_text: str) -> List[str]:
+        """
+        Fill missing sections from a salvage response.
+        
+        Only sections that are still missing are taken; anything Claude
+        repeats is ignored.
+        
+        Returns:
+            The sections that were filled in
+        """
+        missing = self.missing_sections()
+        salvage = AssessmentStreamParser()
+        salvage.feed(response_text)
+        
+        filled = []
+        for key, value in salvage.scores.items():
+            if key in missing:
+                self.scores[key] = value
+                filled.append(key)
+        if self.confidence is None:
+            self.confidence = salvage.confidence
+        
+        wanted = {section.split(':', 1)[1] for section in missing if section.startswith('feedback:')}
+        for item in salvage.feedback:
+            if item.get('type') in wanted:
+                self.feedback.append(item)
+                wanted.discard(item.get('type'))
+                filled.append(f"feedback:{item.get('type')}")
+        if not wanted:
+            self.feedback_closed = True
+        
+        return filled
+    
+    def _top_level_value(self, value_text: str) -> List[Dict]:
+        """Handle a completed scalar value of the top-level object."""
+        self._expect = 'comma'
+        key = self._key
+        if key not in self.SCORE_KEYS and key != 'confidence':
+            return []
+        
+        try:
+            value = float(self._load(value_text.strip()))
+        except (TypeError, ValueError):
+            self.malformed_sections += 1
+            logger.warning(f"Ignoring malformed {key} value in Claude response: {value_text.strip()[:40]!r}")
+            return []
+        
+        if key == 'confidence':
+            self.confidence = value
+            return []
+        if key in self.scores:
+            return []
+        self.scores[key] = value
+        return [self._event({'type': 'score', 'criterion': key, 'score': value})]
+    
+    def _feedback_item(self, item_text: str) -> List[Dict]:
+        try:
+            item = json.loads(item_text)
+            if not isinstance(item, dict) or not item.get('type') or 'content' not in item:
+                raise ValueError("not a feedback item")
+        except ValueError:
+            self.malformed_sections += 1
+            logger.warning(f"Ignoring malformed feedback item in Claude response: {item_text[:80]!r}")
+            return []
+        
+        item.setdefault('title', item['type'].replace('_', ' ').title())
+        self.feedback.append(item)
+        return [self._event({
+            'type': 'feedback',
+            'feedback_type': item['type'],
+            'title': item['title'],
+            'item': item,
+        })]
+    
+    def _load(self, fragment: str):
+        try:
+            return json.loads(fragment)
+        except ValueError:
+            return None
+    
+    def _event(self, event: Dict) -> Dict:
+        event['sections_done'] = self.sections_done
+        event['sections_total'] = self.SECTIONS_TOTAL
+        return event
+
+
+class ParseStats:
+    """
+    Counts parsed responses, salvaged responses and parse failures per
+    output mode ('tool' for tool-use structured output, 'text' for JSON in
+    prose), in the host-wide counters file, so the failure rate can be
+    compared before and after switching modes.
+    """
+    
+    KEY_PREFIX = 'assessment-parse'
+    OUTCOMES = ('responses', 'salvaged', 'failed')
+    MODES = ('text', 'tool')
+    
+    def __init__(self):
+        self.counters = SharedCounters.from_settings()
+    
+    def record(self, mode: str, outcome: str):
+        self.counters.incr(f'{self.KEY_PREFIX}:{mode}:{outcome}')
+    
+    def stats(self) -> Dict[str, Dict]:
+        counts = self.counters.values()
+        report = {}
+        for mode in self.MODES:
+            mode_counts = {
+                outcome: counts.get(f'{self.KEY_PREFIX}:{mode}:{outcome}', 0) for outcome in self.OUTCOMES
+            }
+            responses = mode_counts['responses']
+            if not responses:
+                continue
+            # A salvaged response still parsed incompletely the first time
+            mode_counts['incomplete_rate'] = round((mode_counts['salvaged'] + mode_counts['failed']) / responses, 4)
+            mode_counts['failure_rate'] = round(mode_counts['failed'] / responses, 4)
+            report[mode] = mode_counts
+        return report
@@ -0,0 +1,345 @@
+"""
+Local pre-scorer: provisional IELTS band estimates in a few milliseconds.
+
+Extracts surface features from a submission (length against the task's word
+limits, lexical diversity, sentence length distribution, linking devices,
+paragraphing, spelling against the bundled wordlist in data/wordlist.txt)
+and maps them to per-criterion bands with a small linear model. Runs on the
+CPU with no network calls, so views can show the estimate while Claude is
+still assessing.
+
+The bands are a rough guide, not an assessment: surface features say
+nothing about whether the essay answers the question. The default weights
+are hand-set; ``python manage.py fit_prescorer`` refits them against
+completed Claude assessments and writes ``ASSESSMENT_PRESCORER_MODEL``.
+"""
+
+import re
+import json
+import math
+import time
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+WORDLIST_PATH = Path(__file__).resolve().parent / 'data' / 'wordlist.txt'
+
+CRITERIA = ['task_achievement', 'coherence_cohesion', 'lexical_resource', 'grammar_accuracy']
+
+# Cohesive devices counted for linking density and variety
+LINKING_DEVICES = [
+    'however', 'moreover', 'furthermore', 'in addition', 'additionally', 'therefore',
+    'thus', 'hence', 'consequently', 'as a result', 'nevertheless', 'nonetheless',
+    'on the other hand', 'in contrast', 'by contrast', 'conversely', 'similarly',
+    'likewise', 'for example', 'for instance', 'such as', 'in particular',
+    'firstly', 'secondly', 'thirdly', 'finally', 'lastly', 'in conclusion',
+    'to conclude', 'to sum up', 'overall', 'in summary', 'although', 'even though',
+    'whereas', 'while', 'whilst', 'despite', 'in spite of', 'because', 'since',
+    'due to', 'owing to', 'as well as', 'besides', 'meanwhile', 'subsequently',
+    'afterwards', 'then', 'also', 'instead', 'otherwise', 'accordingly',
+    'in other words', 'that is to say', 'in fact', 'indeed', 'admittedly',
+    'on the contrary', 'what is more', 'not only', 'first of all',
+]
+
+# Clause-introducing words, a rough proxy for complex sentence structures
+SUBORDINATORS = {
+    'although', 'though', 'because', 'since', 'unless', 'whereas', 'while', 'whilst',
+    'if', 'when', 'whenever', 'where', 'wherever', 'which', 'who', 'whom', 'whose',
+    'that', 'until', 'before', 'after', 'once', 'whether',
+}
+
+WORD_RE = re.compile(r"[A-Za-z]+(?:['’][A-Za-z]+)*")
+SENTENCE_RE = re.compile(r'[^.!?]+[.!?]*')
+PARAGRAPH_RE = re.compile(r'\n\s*\n')
+LINKING_RE = re.compile(
+    r'\b(' + '|'.join(sorted((re.escape(d) for d in LINKING_DEVICES), key=len, reverse=True)) + r')\b'
+)
+
+# Hand-set weights over the terms built by design_vector(); refit with
+# ``manage.py fit_prescorer`` once there are enough completed assessments
+DEFAULT_MODEL = {
+    'task_achievement': {
+        'intercept': 2.0, 'length': 3.0, 'over_length': -0.5, 'paragraphing': 1.0,
+        'lexical_diversity': 1.5, 'sentence_length': 0.5, 'spelling': -4.0,
+    },
+    'coherence_cohesion': {
+        'intercept': 1.8, 'length': 1.5, 'paragraphing': 1.5, 'linking_density': 1.0,
+        'linking_variety': 1.5, 'sentence_length': 0.8, 'spelling': -3.0,
+    },
+    'lexical_resource': {
+        'intercept': 1.0, 'length': 1.5, 'lexical_diversity': 4.0, 'long_words': 3.0,
+        'spelling': -8.0,
+    },
+    'grammar_accuracy': {
+        'intercept': 2.7, 'length': 1.5, 'sentence_length': 1.2, 'sentence_variety': 0.8,
+        'subordination': 1.5, 'spelling': -4.0, 'capitalisation': -1.0,
+    },
+}
+
+
+def round_band(value: float) -> float:
+    """Clip to the 1-9 band scale and round to the nearest half band."""
+    return min(9.0, max(1.0, round(value * 2) / 2))
+
+
+class PreScorer:
+    """Feature extractor plus linear band model; see the module docstring."""
+    
+    def __init__(self, wordlist_path: Path = WORDLIST_PATH, model: Optional[Dict] = None):
+        self.wordlist_path = wordlist_path
+        self._wordlist = None
+        self._model = model
+    
+    @property
+    def wordlist(self) -> frozenset:
+        if self._wordlist is None:
+            words = set()
+            with open(self.wordlist_path, encoding='utf-8') as wordlist:
+                for line in wordlist:
+                    if not line.startswith('#'):
+                        words.update(line.lower().split())
+            self._wordlist = frozenset(words)
+        return self._wordlist
+    
+    @property
+    def model(self) -> Dict:
+        if self._model is None:
+            self._model = DEFAULT_MODEL
+            path = getattr(settings, 'ASSESSMENT_PRESCORER_MODEL', None)
+            if path and Path(path).exists():
+                try:
+                    with open(path, encoding='utf-8') as model_file:
+                        self._model = json.load(model_file)['weights']
+                except (OSError, ValueError, KeyError) as e:
+                    logger.error(f"Ignoring unreadable prescorer model {path}: {e}")
+        return self._model
+    
+    def is_known(self, word: str) -> bool:
+        """Whether a lowercase word, or the word a possessive is formed from, is in the wordlist."""
+        word = word.replace('’', "'")
+        if word in self.wordlist:
+            return True
+        # government's, society's
+        return word.endswith("'s") and word[:-2] in self.wordlist
+    
+    def extract_features(self, content: str, task=None) -> Dict:
+        """
+        Compute surface features of an essay.
+        
+        Args:
+            content: The essay text
+            task: PracticeTask, for the word limits and expected paragraphing
+        
+        Returns:
+            Dict of named features (counts, rates and ratios)
+        """
+        words = WORD_RE.findall(content)
+        lowered = [word.lower() for word in words]
+        word_count = len(words)
+        
+        sentences = [s for s in (s.strip() for s in SENTENCE_RE.findall(content)) if WORD_RE.search(s)]
+        sentence_lengths = [len(WORD_RE.findall(s)) for s in sentences] or [0]
+        mean_length = sum(sentence_lengths) / len(sentence_lengths)
+        length_std = math.sqrt(sum((n - mean_length) ** 2 for n in sentence_lengths) / len(sentence_lengths))
+        
+        paragraphs = [p for p in PARAGRAPH_RE.split(content.strip()) if WORD_RE.search(p)]
+        if len(paragraphs) == 1:
+            # Single line breaks are how most students separate paragraphs
+            paragraphs = [p for p in content.strip().splitlines() if WORD_RE.search(p)]
+        
+        linking = LINKING_RE.findall(' '.join(lowered))
+        
+        # Capitalised words (names, places) and short tokens are not spell-checked
+        checked = [
+            word for word, original in zip(lowered, words)
+            if len(word) > 2 and not (original[0].isupper() and original[1:].islower() and not self.is_known(word))
+        ]
+        misspelled = [word for word in checked if not self.is_known(word)]
+        
+        word_limit_min = getattr(task, 'word_limit_min', None) or 250
+        word_limit_max = getattr(task, 'word_limit_max', None) or word_limit_min * 2
+        
+        return {
+            'word_count': word_count,
+            'word_limit_min': word_limit_min,
+            'word_limit_max': word_limit_max,
+            'task_number': getattr(task, 'task_number', 2),
+            'type_token_ratio': self._moving_average_ttr(lowered),
+            'mean_word_length': sum(len(w) for w in words) / word_count if word_count else 0.0,
+            'long_word_ratio': sum(len(w) >= 7 for w in words) / word_count if word_count else 0.0,
+            'sentence_count': len(sentences),
+            'mean_sentence_length': mean_length,
+            'sentence_length_std': length_std,
+            'long_sentence_share': sum(n > 35 for n in sentence_lengths) / len(sentence_lengths),
+            'short_sentence_share': sum(n < 6 for n in sentence_lengths) / len(sentence_lengths),
+            'lowercase_sentence_share': (
+                sum(s[0].islower() for s in sentences) / len(sentences) if sentences else 0.0
+            ),
+            'subordinators_per_sentence': (
+                sum(word in SUBORDINATORS for word in lowered) / len(sentences) if sentences else 0.0
+            ),
+            'linking_devices': len(linking),
+            'linking_per_100_words': 100 * len(linking) / word_count if word_count else 0.0,
+            'distinct_linking_devices': len(set(linking)),
+            'paragraph_count': len(paragraphs),
+            'spelling_error_rate': len(misspelled) / len(checked) if checked else 0.0,
+            'misspelled': sorted(set(misspelled))[:20],
+        }
+    
+    def _moving_average_ttr(self, words: List[str], window: int = 50) -> float:
+        """Type-token ratio averaged over a sliding window, so it does not fall with essay length."""
+        if not words:
+            return 0.0
+        if len(words) <= window:
+            return len(set(words)) / len(words)
+        
+        counts = {}
+        for word in words[:window]:
+            counts[word] = counts.get(word, 0) + 1
+        total = len(counts)
+        for i in range(window, len(words)):
+            outgoing, incoming = words[i - window], words[i]
+            counts[outgoing] -= 1
+            if not counts[outgoing]:
+                del counts[outgoing]
+            counts[incoming] = counts.get(incoming, 0) + 1
+            total += len(counts)
+        return total / (len(words) - window + 1) / window
+    
+    def design_vector(self, features: Dict) -> Dict[str, float]:
+        """Scale features into the roughly 0-1 terms the band model is linear in."""
+        expected_paragraphs = (3, 5) if features['task_number'] == 1 else (4, 6)
+        paragraphs = features['paragraph_count']
+        if expected_paragraphs[0] <= paragraphs <= expected_paragraphs[1]:
+            paragraphing = 1.0
+        elif paragraphs >= 2:
+            paragraphing = 0.5
+        else:
+            paragraphing = 0.0
+        
+        mean_length = features['mean_sentence_length']
+        return {
+            'length': min(1.0, features['word_count'] / features['word_limit_min']),
+            'over_length': min(1.0, max(0.0, features['word_count'] / features['word_limit_max'] - 1)),
+            'paragraphing': paragraphing,
+            # A handful of words always has a high type-token ratio
+            'lexical_diversity': features['type_token_ratio'] * min(1.0, features['word_count'] / 50),
+            'long_words': features['long_word_ratio'],
+            # Peaks at 15-25 words per sentence; fragments and run-ons score lower
+            'sentence_length': max(0.0, 1 - abs(min(max(mean_length, 15), 25) - mean_length) / 15),
+            'sentence_variety': min(1.0, features['sentence_length_std'] / mean_length) if mean_length else 0.0,
+            'linking_density': min(1.0, features['linking_per_100_words'] / 4),
+            'linking_variety': min(1.0, features['distinct_linking_devices'] / 8),
+            'subordination': min(1.0, features['subordinators_per_sentence'] / 1.5),
+            'spelling': features['spelling_error_rate'],
+            'capitalisation': features['lowercase_sentence_share'],
+        }
+    
+    def predict(self, features: Dict) -> Dict[str, float]:
+        """Provisional per-criterion and overall bands for extracted features."""
+        terms = self.design_vector(features)
+        bands = {}
+        for criterion in CRITERIA:
+            weights = self.model[criterion]
+            value = weights.get('intercept', 0.0) + sum(
+                weight * terms[term] for term, weight in weights.items() if term != 'intercept'
+            )
+            bands[criterion] = round_band(value)
+        bands['overall_score'] = round_band(sum(bands[c] for c in CRITERIA) / len(CRITERIA))
+        return bands
+    
+    def prescore(self, submission) -> Dict:
+        """
+        Estimate bands for a submission.
+        
+        Args:
+            submission: Submission with its task loaded
+        
+        Returns:
+            Dict with provisional ``bands``, the extracted ``features`` and
+            ``elapsed_ms``
+        """
+        start = time.perf_counter()
+        features = self.extract_features(submission.content, submission.task)
+        bands = self.predict(features)
+        return {
+            'bands': bands,
+            'features': features,
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 2),
+        }
+    
+    def prompt_summary(self, features: Dict) -> str:
+        """Measured features as prompt lines, so Claude need not count them itself."""
+        return (
+            f"- Sentences: {features['sentence_count']} "
+            f"(mean {features['mean_sentence_length']:.1f} words, std {features['sentence_length_std']:.1f})\n"
+            f"- Paragraphs: {features['paragraph_count']}\n"
+            f"- Type-token ratio (50-word window): {features['type_token_ratio']:.2f}\n"
+            f"- Linking devices: {features['linking_devices']} "
+            f"({features['distinct_linking_devices']} distinct)\n"
+            f"- Words not in dictionary: {features['spelling_error_rate']:.1%}"
+            + (f" (e.g. {', '.join(features['misspelled'][:8])})" if features['misspelled'] else '')
+        )
+    
+    def fit(self, samples: List[Dict], ridge: float = 1.0) -> Dict:
+        """
+        Least-squares refit of the band model.
+        
+        Args:
+            samples: Dicts with the ``features`` of an essay and the
+                ``scores`` Claude gave it, keyed by criterion
+            ridge: L2 penalty pulling weights towards zero (not the intercept)
+        
+        Returns:
+            Weights in the DEFAULT_MODEL format
+        """
+        rows = [self.design_vector(sample['features']) for sample in samples]
+        terms = sorted(rows[0])
+        model = {}
+        for criterion in CRITERIA:
+            pairs = [
+                ([1.0] + [row[term] for term in terms], float(sample['scores'][criterion]))
+                for row, sample in zip(rows, samples)
+                if sample['scores'].get(criterion) is not None
+            ]
+            size = len(terms) + 1
+            # Normal equations (X'X + ridge*I) w = X'y
+            normal = [[0.0] * size for _ in range(size)]
+            target = [0.0] * size
+            for x, y in pairs:
+                for i in range(size):
+                    target[i] += x[i] * y
+                    for j in range(size):
+                        normal[i][j] += x[i] * x[j]
+            for i in range(1, size):
+                normal[i][i] += ridge
+            weights = solve_linear(normal, target)
+            model[criterion] = {'intercept': round(weights[0], 4)}
+            model[criterion].update({term: round(w, 4) for term, w in zip(terms, weights[1:])})
+        return model
+
+
+def solve_linear(matrix: List[List[float]], vector: List[float]) -> List[float]:
+    """Solve a small dense linear system by Gaussian elimination with partial pivoting."""
+    size = len(vector)
+    rows = [list(row) + [value] for row, value in zip(matrix, vector)]
+    for col in range(size):
+        pivot = max(range(col, size), key=lambda r: abs(rows[r][col]))
+        if abs(rows[pivot][col]) < 1e-12:
+            raise ValueError("Singular system; add more samples or increase the ridge penalty")
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        for r in range(col + 1, size):
+            factor = rows[r][col] / rows[col][col]
+            for c in range(col, size + 1):
+                rows[r][c] -= factor * rows[col][c]
+    solution = [0.0] * size
+    for r in range(size - 1, -1, -1):
+        solution[r] = (rows[r][size] - sum(rows[r][c] * solution[c] for c in range(r + 1, size))) / rows[r][r]
+    return solution
+
+
+prescorer = PreScorer()
@@ -0,0 +1,383 @@
+"""
+Process-shared token-bucket limiter for Anthropic API calls.
+
+The web app and the queue daemon draw on one Anthropic quota. Every Claude
+call made by IELTSAssessmentService first reserves capacity here, from
+three buckets mirroring Anthropic's own limits: requests per minute (RPM),
+input tokens per minute (ITPM) and output tokens per minute (OTPM).
+
+Bucket state lives in a small JSON file guarded by ``fcntl.flock``, so every
+gunicorn worker, ASGI worker and queue daemon on a host shares it. Give each
+host its share of the org limits if the app runs on more than one.
+
+Output tokens are reserved at an estimate rather than at ``max_tokens``,
+which would let only a couple of calls into a small OTPM bucket at once:
+the recent mean output of calls with the same ``max_tokens`` (shared by
+every process in the state file) plus a margin, or ``max_tokens`` until
+such a call has completed. Once the response's usage is known the
+reservation is settled against it: the unused part is refunded and an
+underestimate is charged after the fact. Prompt-cache reads are refunded
+too, as they do not count towards ITPM.
+
+The limiter is off by default. Enable it with
+``ANTHROPIC_RATE_LIMIT_ENABLED`` and set the bucket sizes to the limits of
+the account's usage tier (Anthropic console, Limits page).
+
+Two priority lanes share the buckets. The interactive lane (quick and
+streaming assessments a student is watching) may use all of the capacity;
+the queue lane must leave ``reserve`` of every bucket untouched and yields
+entirely while an interactive caller is waiting.
+
+The async methods run the locked file access in a thread, so a contended
+lock never blocks an ASGI worker's event loop.
+"""
+
+import os
+import json
+import math
+import time
+import fcntl
+import asyncio
+import logging
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 'interactive'
+QUEUE = 'queue'
+LANES = (INTERACTIVE, QUEUE)
+
+# Longest single sleep while waiting, so waiters notice refunds and lane changes
+MAX_POLL_INTERVAL = 0.5
+
+# Pause after a 429 that carries no retry-after header
+DEFAULT_PAUSE_SECONDS = 10
+
+# How long a waiting interactive caller holds back the queue lane without re-checking
+INTERACTIVE_HOLD_SECONDS = 2 * MAX_POLL_INTERVAL
+
+# Output reservations: the moving mean of recent calls' output tokens, with
+# each new call weighted OUTPUT_ESTIMATE_WEIGHT, times OUTPUT_ESTIMATE_MARGIN
+OUTPUT_ESTIMATE_WEIGHT = 0.2
+OUTPUT_ESTIMATE_MARGIN = 1.25
+
+
+class RateLimitTimeout(Exception):
+    """Capacity did not free up within the caller's maximum wait."""
+    
+    # Picked up by classify_error, so queued requests back off like on a 429
+    error_class = 'rate_limit'
+
+
+def estimate_input_tokens(params: Dict) -> int:
+    """Rough input token count of a Messages API call (about 4 characters per token)."""
+    chars = 0
+    for block in params.get('system', []):
+        chars += len(block.get('text', ''))
+    for message in params.get('messages', []):
+        content = message.get('content', '')
+        chars += len(content) if isinstance(content, str) else len(json.dumps(content))
+    return chars // 4 + 1
+
+
+class Reservation:
+    """Capacity held for one API call until its usage is known."""
+    
+    def __init__(self, lane: str, input_tokens: int, output_tokens: int, waited: float,
+                 max_tokens: Optional[int] = None):
+        self.lane = lane
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.max_tokens = max_tokens or output_tokens
+        self.waited = waited
+        self.usage = None
+
+
+class TokenBucketLimiter:
+    """
+    Shared RPM/ITPM/OTPM token buckets with interactive and queue lanes.
+    
+    A limit of 0 disables that bucket; with all three at 0 (or
+    ``enabled=False``) acquiring is free.
+    """
+    
+    def __init__(self, path: str, rpm: int, itpm: int, otpm: int,
+                 reserve: float = 0.2, enabled: bool = True):
+        self.path = path
+        self.limits = {'rpm': rpm, 'itpm': itpm, 'otpm': otpm}
+        self.reserve = reserve
+        self.enabled = enabled and any(self.limits.values())
+    
+    @classmethod
+    def from_settings(cls) -> 'TokenBucketLimiter':
+        return cls(
+            path=str(getattr(
+                settings, 'ANTHROPIC_RATE_LIMIT_FILE',
+                settings.BASE_DIR / 'run' / 'anthropic-ratelimit.json'
+            )),
+            rpm=getattr(settings, 'ANTHROPIC_RPM_LIMIT', 50),
+            itpm=getattr(settings, 'ANTHROPIC_ITPM_LIMIT', 30000),
+            otpm=getattr(settings, 'ANTHROPIC_OTPM_LIMIT', 8000),
+            reserve=getattr(settings, 'ANTHROPIC_RATE_LIMIT_QUEUE_RESERVE', 0.2),
+            enabled=getattr(settings, 'ANTHROPIC_RATE_LIMIT_ENABLED', False),
+        )
+    
+    def acquire(self, input_tokens: int, max_tokens: int, lane: str = INTERACTIVE,
+                timeout: Optional[float] = None) -> Reservation:
+        """
+        Block until the call fits in every bucket, then reserve it.
+        
+        Args:
+            input_tokens: Estimated input tokens
+            max_tokens: The call's max_tokens; the output reservation is
+                estimated from earlier calls with the same max_tokens
+            lane: INTERACTIVE or QUEUE
+            timeout: Maximum seconds to wait (None waits indefinitely)
+        
+        Raises:
+            RateLimitTimeout: If capacity did not free up within ``timeout``
+        """
+        start = time.monotonic()
+        waited = 0.0
+        while True:
+            wait, output_tokens = self._try_acquire(input_tokens, max_tokens, lane, waited)
+            if wait is None:
+                return Reservation(lane, input_tokens, output_tokens, waited, max_tokens)
+            if timeout is not None and waited + wait > timeout:
+                self._timed_out(lane, waited)
+            time.sleep(min(wait, MAX_POLL_INTERVAL))
+            waited = time.monotonic() - start
+    
+    async def aacquire(self, input_tokens: int, max_tokens: int, lane: str = INTERACTIVE,
+                       timeout: Optional[float] = None) -> Reservation:
+        """Async version of acquire; waits on the event loop instead of blocking it."""
+        start = time.monotonic()
+        waited = 0.0
+        while True:
+            wait, output_tokens = await asyncio.to_thread(self._try_acquire, input_tokens, max_tokens, lane, waited)
+            if wait is None:
+                return Reservation(lane, input_tokens, output_tokens, waited, max_tokens)
+            if timeout is not None and waited + wait > timeout:
+                await asyncio.to_thread(self._timed_out, lane, waited)
+            await asyncio.sleep(min(wait, MAX_POLL_INTERVAL))
+            waited = time.monotonic() - start
+    
+    def settle(self, reservation: Reservation):
+        """
+        Settle the reservation against what the call used.
+        
+        The unused part is refunded and usage beyond the reservation charged.
+        With ``reservation.usage`` unset (the call failed) the whole output
+        reservation is refunded; input and the request itself stay spent.
+        """
+        if not self.enabled:
+            return
+        
+        usage = reservation.usage
+        refund = {'otpm': reservation.output_tokens}
+        used_output = None
+        if usage is not None:
+            used_output = getattr(usage, 'output_tokens', 0) or 0
+            refund['otpm'] -= used_output
+            used_input = (getattr(usage, 'input_tokens', 0) or 0) + \
+                (getattr(usage, 'cache_creation_input_tokens', 0) or 0)
+            refund['itpm'] = reservation.input_tokens - used_input
+        
+        with self._state() as state:
+            for name, amount in refund.items():
+                if self.limits[name] and amount:
+                    # A negative refund charges an underestimate after the fact
+                    level = state['buckets'][name] + amount
+                    state['buckets'][name] = min(self.limits[name], level)
+            
+            if used_output is not None:
+                estimates = state['output_estimates']
+                key = str(reservation.max_tokens)
+                mean = estimates.get(key)
+                estimates[key] = round(
+                    used_output if mean is None else mean + OUTPUT_ESTIMATE_WEIGHT * (used_output - mean), 1
+                )
+    
+    def pause(self, seconds: float):
+        """Hold every lane back for ``seconds``, e.g. after a 429 from Anthropic."""
+        if not self.enabled or seconds <= 0:
+            return
+        with self._state() as state:
+            state['paused_until'] = max(state.get('paused_until', 0), time.time() + seconds)
+        logger.warning(f"Anthropic rate limited; pausing all assessment calls for {seconds:.0f}s")
+    
+    @contextmanager
+    def limit(self, params: Dict, lane: str = INTERACTIVE, timeout: Optional[float] = None):
+        """
+        Reserve capacity around one Messages API call.
+        
+        Set ``reservation.usage`` from the response inside the block so the
+        unused reservation is refunded::
+            
+            with limiter.limit(params, lane) as reservation:
+                response = client.messages.create(**params)
+                reservation.usage = response.usage
+        """
+        import anthropic
+        
+        reservation = self.acquire(estimate_input_tokens(params), params['max_tokens'], lane, timeout)
+        try:
+            yield reservation
+        except anthropic.RateLimitError as e:
+            self.pause(self._retry_after(e))
+            raise
+        finally:
+            self.settle(reservation)
+    
+    @asynccontextmanager
+    async def alimit(self, params: Dict, lane: str = INTERACTIVE, timeout: Optional[float] = None):
+        """Async version of limit."""
+        import anthropic
+        
+        reservation = await self.aacquire(estimate_input_tokens(params), params['max_tokens'], lane, timeout)
+        try:
+            yield reservation
+        except anthropic.RateLimitError as e:
+            await asyncio.to_thread(self.pause, self._retry_after(e))
+            raise
+        finally:
+            await asyncio.to_thread(self.settle, reservation)
+    
+    def stats(self) -> Dict:
+        """Current bucket levels and per-lane queueing delay counters."""
+        if not self.enabled:
+            return {'enabled': False}
+        with self._state() as state:
+            return {
+                'enabled': True,
+                'output_estimates': dict(state['output_estimates']),
+                'buckets': {
+                    name: {'available': int(level), 'limit': self.limits[name]}
+                    for name, level in state['buckets'].items()
+                    if self.limits[name]
+                },
+                'lanes': {
+                    lane: dict(metrics, avg_wait=round(metrics['wait_total'] / metrics['granted'], 3)
+                               if metrics['granted'] else 0.0)
+                    for lane, metrics in state['lanes'].items()
+                },
+            }
+    
+    def _try_acquire(self, input_tokens: int, max_tokens: int, lane: str,
+                     waited: float) -> Tuple[Optional[float], int]:
+        """
+        Reserve the call if it fits now.
+        
+        Returns (None, output tokens reserved) once reserved, otherwise
+        (seconds until it might fit, 0). ``waited`` is how long the caller
+        has waited so far, recorded in the lane's queueing delay metrics
+        when the reservation is granted.
+        """
+        if not self.enabled:
+            return None, 0
+        
+        with self._state() as state:
+            now = time.time()
+            if state.get('paused_until', 0) > now:
+                return state['paused_until'] - now, 0
+            
+            if lane != INTERACTIVE and state.get('interactive_waiting_until', 0) > now:
+                return MAX_POLL_INTERVAL, 0
+            
+            mean = state['output_estimates'].get(str(max_tokens))
+            output_tokens = max_tokens if mean is None else min(max_tokens, math.ceil(mean * OUTPUT_ESTIMATE_MARGIN))
+            cost = {'rpm': 1, 'itpm': input_tokens, 'otpm': output_tokens}
+            
+            wait = 0.0
+            for name, limit in self.limits.items():
+                if not limit:
+                    continue
+                # A single call larger than the bucket waits for a full bucket
+                needed = min(cost[name], limit)
+                if lane != INTERACTIVE:
+                    needed = min(needed + self.reserve * limit, limit)
+                deficit = needed - state['buckets'][name]
+                if deficit > 0:
+                    wait = max(wait, deficit * 60 / limit)
+            
+            if wait > 0:
+                if lane == INTERACTIVE:
+                    state['interactive_waiting_until'] = now + INTERACTIVE_HOLD_SECONDS
+                return wait, 0
+            
+            for name, limit in self.limits.items():
+                if limit:
+                    state['buckets'][name] -= min(cost[name], limit)
+            
+            metrics = state['lanes'][lane]
+            metrics['granted'] += 1
+            if waited > 0:
+                metrics['delayed'] += 1
+                metrics['wait_total'] = round(metrics['wait_total'] + waited, 3)
+                metrics['wait_max'] = round(max(metrics['wait_max'], waited), 3)
+        
+        if waited >= 1:
+            logger.info(f"Waited {waited:.1f}s for Anthropic rate limit capacity ({lane})")
+        return None, output_tokens
+    
+    def _timed_out(self, lane: str, waited: float):
+        with self._state() as state:
+            state['lanes'][lane]['timeouts'] += 1
+        logger.warning(f"Gave up waiting for Anthropic rate limit capacity after {waited:.1f}s ({lane})")
+        raise RateLimitTimeout(f"No Anthropic rate limit capacity after {waited:.1f}s ({lane})")
+    
+    @staticmethod
+    def _retry_after(error: Exception) -> float:
+        response = getattr(error, 'response', None)
+        try:
+            return float(response.headers['retry-after'])
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return DEFAULT_PAUSE_SECONDS
+    
+    @contextmanager
+    def _state(self):
+        """Lock the shared state file, refill the buckets and yield the state for editing."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o664)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            raw = os.read(fd, 1 << 16)
+            state = self._load(raw)
+            self._refill(state)
+            yield state
+            data = json.dumps(state).encode('utf-8')
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+    
+    def _load(self, raw: bytes) -> Dict:
+        try:
+            state = json.loads(raw) if raw else {}
+        except ValueError:
+            logger.warning(f"Resetting corrupt rate limit state in {self.path}")
+            state = {}
+        
+        now = time.time()
+        state.setdefault('updated_at', now)
+        buckets = state.setdefault('buckets', {})
+        for name, limit in self.limits.items():
+            buckets.setdefault(name, float(limit))
+        state.setdefault('output_estimates', {})
+        lanes = state.setdefault('lanes', {})
+        for lane in LANES:
+            lanes.setdefault(lane, {'granted': 0, 'delayed': 0, 'timeouts': 0,
+                                    'wait_total': 0.0, 'wait_max': 0.0})
+        return state
+    
+    def _refill(self, state: Dict):
+        now = time.time()
+        elapsed = max(0.0, now - state['updated_at'])
+        for name, limit in self.limits.items():
+            if limit:
+                state['buckets'][name] = min(float(limit), state['buckets'][name] + elapsed * limit / 60)
+        state['updated_at'] = now
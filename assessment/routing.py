@@ -0,0 +1,156 @@
+"""
+Tiered model routing for assessments.
+
+Most essays are scored by a fast, cheap model (``CLAUDE_FAST_MODEL``). The
+result is escalated to the full model (``CLAUDE_MODEL``) when the fast model
+is unsure of its own grading (confidence under
+``ASSESSMENT_ESCALATION_CONFIDENCE``) or its criterion bands disagree by more
+than ``ASSESSMENT_ESCALATION_SPREAD``. Users on a plan listed in
+``ASSESSMENT_PREMIUM_PLAN_TYPES`` go straight to the full model.
+
+The route taken is recorded in ``Assessment.ai_model_used``, e.g.
+``claude-3-5-haiku-20241022`` (fast result kept),
+``claude-3-5-haiku-20241022 -> claude-3-5-sonnet-20241022 (low confidence)``
+or ``claude-3-5-sonnet-20241022 (premium)``.
+"""
+
+import logging
+from decimal import Decimal
+from typing import Dict, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CRITERIA = ['task_achievement', 'coherence_cohesion', 'lexical_resource', 'grammar_accuracy']
+
+
+def combine_usage(total, usage):
+    """Sum the usage blocks of an escalated assessment's two calls."""
+    if total is None or usage is None:
+        return usage if total is None else total
+    from anthropic.types import Usage
+    
+    return Usage(
+        input_tokens=total.input_tokens + usage.input_tokens,
+        output_tokens=total.output_tokens + usage.output_tokens,
+        cache_creation_input_tokens=(total.cache_creation_input_tokens or 0) + (usage.cache_creation_input_tokens or 0),
+        cache_read_input_tokens=(total.cache_read_input_tokens or 0) + (usage.cache_read_input_tokens or 0),
+    )
+
+
+class Route:
+    """The models one assessment is sent to, and why."""
+    
+    def __init__(self, model: str, max_tokens: int, escalate_to: Optional[str] = None,
+                 escalate_max_tokens: Optional[int] = None, router=None, reason: str = ''):
+        self.model = model
+        self.max_tokens = max_tokens
+        self.escalate_to = escalate_to
+        self.escalate_max_tokens = escalate_max_tokens
+        self.router = router
+        self.reason = reason
+        self.first_model = model
+    
+    @property
+    def cache_model(self) -> str:
+        """Result cache key component: results are only reused along the same route."""
+        if self.escalate_to:
+            return f'{self.first_model}>{self.escalate_to}'
+        return self.first_model
+    
+    @property
+    def label(self) -> str:
+        """Route description stored in Assessment.ai_model_used."""
+        if self.model != self.first_model:
+            label = f'{self.first_model} -> {self.model} ({self.reason})'
+        elif self.reason:
+            label = f'{self.model} ({self.reason})'
+        else:
+            label = self.model
+        return label[:100]
+    
+    def escalate(self, assessment_data: Dict) -> bool:
+        """
+        Switch to the full model if the fast model's result needs a second opinion.
+        
+        Returns:
+            True if the caller should score again with ``self.model``
+        """
+        if not self.escalate_to or self.model == self.escalate_to:
+            return False
+        
+        reason = self.router.escalation_reason(assessment_data)
+        if reason is None:
+            return False
+        
+        logger.info(f"Escalating assessment from {self.model} to {self.escalate_to}: {reason}")
+        self.model = self.escalate_to
+        self.max_tokens = self.escalate_max_tokens
+        self.reason = reason
+        return True
+
+
+class ModelRouter:
+    """Chooses the Route for a submission; see the module docstring."""
+    
+    def __init__(self, model: str, max_tokens: int, fast_model: Optional[str], fast_max_tokens: int,
+                 confidence_threshold: float = 0.75, max_spread: float = 1.0, premium_plan_types=()):
+        self.model = model
+        self.max_tokens = max_tokens
+        self.fast_model = fast_model
+        self.fast_max_tokens = fast_max_tokens
+        self.confidence_threshold = Decimal(str(confidence_threshold))
+        self.max_spread = Decimal(str(max_spread))
+        self.premium_plan_types = set(premium_plan_types)
+    
+    @classmethod
+    def from_settings(cls, backend, model: str, max_tokens: int) -> 'ModelRouter':
+        fast_model = None
+        if getattr(settings, 'ASSESSMENT_ROUTING_ENABLED', True):
+            fast_model = backend.fast_model or getattr(settings, 'CLAUDE_FAST_MODEL', None)
+        return cls(
+            model=model,
+            max_tokens=max_tokens,
+            fast_model=fast_model if fast_model != model else None,
+            fast_max_tokens=getattr(settings, 'CLAUDE_FAST_MAX_TOKENS', max_tokens),
+            confidence_threshold=getattr(settings, 'ASSESSMENT_ESCALATION_CONFIDENCE', 0.75),
+            max_spread=getattr(settings, 'ASSESSMENT_ESCALATION_SPREAD', 1.0),
+            premium_plan_types=getattr(settings, 'ASSESSMENT_PREMIUM_PLAN_TYPES', ['premium', 'pro']),
+        )
+    
+    @property
+    def enabled(self) -> bool:
+        return bool(self.fast_model)
+    
+    def route(self, submission) -> Route:
+        """Pick the first model for a submission (queries the user's subscription)."""
+        if not self.enabled:
+            return Route(self.model, self.max_tokens)
+        if self.is_premium(submission.user):
+            return Route(self.model, self.max_tokens, reason='premium')
+        return Route(
+            self.fast_model, self.fast_max_tokens,
+            escalate_to=self.model, escalate_max_tokens=self.max_tokens, router=self
+        )
+    
+    def is_premium(self, user) -> bool:
+        """Whether the user's active subscription plan calls for the full model."""
+        # Raises RelatedObjectDoesNotExist (an AttributeError) without a subscription
+        subscription = getattr(user, 'subscription', None)
+        return (
+            subscription is not None
+            and subscription.is_active
+            and subscription.plan.plan_type in self.premium_plan_types
+        )
+    
+    def escalation_reason(self, assessment_data: Dict) -> Optional[str]:
+        """Why a fast-model result should be re-scored by the full model, or None."""
+        confidence = assessment_data.get('confidence')
+        if confidence is None or Decimal(str(confidence)) < self.confidence_threshold:
+            return 'low confidence'
+        
+        scores = [Decimal(str(assessment_data[criterion])) for criterion in CRITERIA]
+        if max(scores) - min(scores) > self.max_spread:
+            return 'criteria disagree'
+        return None
@@ -0,0 +1,221 @@
+"""
+Tool-use schema for structured assessment output.
+
+With ``ASSESSMENT_STRUCTURED_OUTPUT`` on, the assessment call defines a
+``record_assessment`` tool whose input schema mirrors the Assessment scores
+and the Feedback model (types, severities, highlighted text and its character
+positions), and forces Claude to call it. The API then returns the
+assessment as the tool call's JSON input instead of JSON embedded in prose.
+The API does not hold that input to the schema's bounds and enums, so
+``validate_tool_input()`` checks the parsed result before it is saved.
+
+``record_criterion_assessment`` is the single-criterion variant used when an
+essay is split into one call per criterion (ASSESSMENT_CRITERION_SPLIT).
+"""
+
+from decimal import Decimal
+from typing import Dict, List
+
+from .models import Feedback
+
+ASSESSMENT_TOOL_NAME = 'record_assessment'
+CRITERION_TOOL_NAME = 'record_criterion_assessment'
+
+BAND_SCORE = {'type': 'number', 'minimum': 1, 'maximum': 9, 'multipleOf': 0.5}
+
+
+def feedback_item_schema() -> Dict:
+    """JSON schema of one feedback item, generated from the Feedback model."""
+    title_length = Feedback._meta.get_field('title').max_length
+    return {
+        'type': 'object',
+        'properties': {
+            'type': {
+                'type': 'string',
+                'enum': [value for value, _ in Feedback.FEEDBACK_TYPE_CHOICES],
+                'description': "Criterion the comment is about; 'inline' for a comment on a specific passage",
+            },
+            'severity': {'type': 'string', 'enum': [value for value, _ in Feedback.SEVERITY_CHOICES]},
+            'title': {'type': 'string', 'maxLength': title_length},
+            'content': {'type': 'string', 'description': 'Detailed feedback explanation'},
+            'suggestion': {'type': 'string', 'description': 'How to improve, if applicable'},
+            'highlighted_text': {
+                'type': 'string',
+                'description': 'Exact passage from the student response the comment refers to',
+            },
+            'text_start_position': {
+                'type': 'integer', 'minimum': 0,
+                'description': 'Character offset in the student response where highlighted_text starts',
+            },
+            'text_end_position': {
+                'type': 'integer', 'minimum': 0,
+                'description': 'Character offset in the student response where highlighted_text ends',
+            },
+            'confidence': {'type': 'number', 'minimum': 0, 'maximum': 1},
+        },
+        'required': ['type', 'severity', 'title', 'content'],
+    }
+
+
+def build_assessment_tool() -> Dict:
+    """The record_assessment tool definition."""
+    return {
+        'name': ASSESSMENT_TOOL_NAME,
+        'description': 'Record the IELTS band scores and feedback for the student response.',
+        'input_schema': {
+            'type': 'object',
+            'properties': {
+                'overall_score': BAND_SCORE,
+                'task_achievement': BAND_SCORE,
+                'coherence_cohesion': BAND_SCORE,
+                'lexical_resource': BAND_SCORE,
+                'grammar_accuracy': BAND_SCORE,
+                'confidence': {
+                    'type': 'number', 'minimum': 0, 'maximum': 1,
+                    'description': 'How confident you are in these band scores',
+                },
+                'feedback': {'type': 'array', 'items': feedback_item_schema(), 'minItems': 1},
+            },
+            'required': [
+                'overall_score', 'task_achievement', 'coherence_cohesion', 'lexical_resource',
+                'grammar_accuracy', 'confidence', 'feedback',
+            ],
+        },
+    }
+
+
+def build_criterion_tool() -> Dict:
+    """
+    The record_criterion_assessment tool definition.
+    
+    Every criterion call sends this same definition (the criterion to score
+    is named in the user turn), so the tools and rubric prefix is shared by
+    all four calls in the prompt cache.
+    """
+    return {
+        'name': CRITERION_TOOL_NAME,
+        'description': 'Record the IELTS band score and feedback for the one criterion you were asked to assess.',
+        'input_schema': {
+            'type': 'object',
+            'properties': {
+                'task_achievement': BAND_SCORE,
+                'coherence_cohesion': BAND_SCORE,
+                'lexical_resource': BAND_SCORE,
+                'grammar_accuracy': BAND_SCORE,
+                'confidence': {
+                    'type': 'number', 'minimum': 0, 'maximum': 1,
+                    'description': 'How confident you are in this band score',
+                },
+                'feedback': {'type': 'array', 'items': feedback_item_schema(), 'minItems': 1},
+            },
+            'required': ['confidence', 'feedback'],
+        },
+    }
+
+
+ASSESSMENT_TOOL = build_assessment_tool()
+ASSESSMENT_TOOL_CHOICE = {'type': 'tool', 'name': ASSESSMENT_TOOL_NAME}
+CRITERION_TOOL = build_criterion_tool()
+CRITERION_TOOL_CHOICE = {'type': 'tool', 'name': CRITERION_TOOL_NAME}
+
+
+def clean_feedback_items(items: List[Dict], essay: str) -> List[Dict]:
+    """
+    Make feedback items safe to store as Feedback rows.
+    
+    Unknown types and severities fall back to the defaults, titles are cut
+    to the column length, and highlight positions are checked against the
+    essay: wrong offsets are re-derived from ``highlighted_text`` when it
+    can be found, and dropped otherwise.
+    """
+    types = {value for value, _ in Feedback.FEEDBACK_TYPE_CHOICES}
+    severities = {value for value, _ in Feedback.SEVERITY_CHOICES}
+    title_length = Feedback._meta.get_field('title').max_length
+    
+    for item in items:
+        if item.get('type') not in types:
+            item['type'] = 'inline' if item.get('highlighted_text') else 'overall'
+        if item.get('severity') not in severities:
+            item['severity'] = 'info'
+        item['title'] = str(item.get('title') or '')[:title_length]
+        
+        start, end = item.get('text_start_position'), item.get('text_end_position')
+        highlighted = item.get('highlighted_text') or ''
+        valid = (
+            isinstance(start, int) and isinstance(end, int) and 0 <= start < end <= len(essay)
+            and (not highlighted or essay[start:end] == highlighted)
+        )
+        if not valid:
+            found = essay.find(highlighted) if highlighted else -1
+            if found >= 0:
+                item['text_start_position'], item['text_end_position'] = found, found + len(highlighted)
+            else:
+                item['text_start_position'] = item['text_end_position'] = None
+    return items
+
+
+class ToolInputError(ValueError):
+    """Claude's tool input does not match the tool's input schema."""
+    
+    def __init__(self, message: str, errors: List[str]):
+        super().__init__(message)
+        self.errors = errors
+
+
+JSON_TYPES = {
+    'object': lambda value: isinstance(value, dict),
+    'array': lambda value: isinstance(value, list),
+    'string': lambda value: isinstance(value, str),
+    'integer': lambda value: isinstance(value, int) and not isinstance(value, bool),
+    'number': lambda value: isinstance(value, (int, float, Decimal)) and not isinstance(value, bool),
+}
+
+
+def schema_errors(value, schema: Dict, path: str = 'input') -> List[str]:
+    """
+    Where ``value`` breaks ``schema``.
+    
+    Only the keywords the tools above use are checked: type, enum, minimum,
+    maximum, multipleOf, maxLength, properties, required, items and
+    minItems. Numbers may be Decimals, as in parsed assessment data.
+    """
+    expected = schema.get('type')
+    if expected and not JSON_TYPES[expected](value):
+        return [f"{path}: expected {expected}, got {type(value).__name__}"]
+    
+    errors = []
+    if 'enum' in schema and value not in schema['enum']:
+        errors.append(f"{path}: {value!r} is not one of {', '.join(schema['enum'])}")
+    if 'minimum' in schema and value < schema['minimum']:
+        errors.append(f"{path}: {value} is below {schema['minimum']}")
+    if 'maximum' in schema and value > schema['maximum']:
+        errors.append(f"{path}: {value} is above {schema['maximum']}")
+    if 'multipleOf' in schema and Decimal(str(value)) % Decimal(str(schema['multipleOf'])):
+        errors.append(f"{path}: {value} is not a multiple of {schema['multipleOf']}")
+    if 'maxLength' in schema and len(value) > schema['maxLength']:
+        errors.append(f"{path}: longer than {schema['maxLength']} characters")
+    
+    if expected == 'object':
+        errors += [f"{path}.{key}: missing" for key in schema.get('required', []) if key not in value]
+        for key, property_schema in schema.get('properties', {}).items():
+            if key in value:
+                errors += schema_errors(value[key], property_schema, f"{path}.{key}")
+    elif expected == 'array':
+        if len(value) < schema.get('minItems', 0):
+            errors.append(f"{path}: fewer than {schema['minItems']} items")
+        if 'items' in schema:
+            for index, item in enumerate(value):
+                errors += schema_errors(item, schema['items'], f"{path}[{index}]")
+    return errors
+
+
+def validate_tool_input(tool: Dict, data: Dict):
+    """
+    Check assessment data against ``tool``'s input schema.
+    
+    Raises:
+        ToolInputError: listing every violation
+    """
+    errors = schema_errors(data, tool['input_schema'])
+    if errors:
+        raise ToolInputError(f"{tool['name']} input does not match its schema: {'; '.join(errors)}", errors)
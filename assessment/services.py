@@ -4,43 +4,244 @@ Claude SDK integration for IELTS writing assessment.
 
 import os
 import time
-import json
+import asyncio
+import random
+import socket
 import logging
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 from decimal import Decimal
 from datetime import datetime, timedelta
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.utils import timezone
-from django.db import transaction
-
-import anthropic
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils.functional import SimpleLazyObject
 
+from .cache import AssessmentResultCache
+from .metrics import metrics
+from .parsing import (
+    CRITERIA, AssessmentStreamParser, IncompleteResponseError, ParseStats, astream_deltas, message_output,
+    stream_deltas
+)
+from .prescorer import prescorer
+from .ratelimit import INTERACTIVE, QUEUE, TokenBucketLimiter
+from .routing import ModelRouter, Route, combine_usage
+from .timing import StageTimer
+from .schema import (
+    ASSESSMENT_TOOL, ASSESSMENT_TOOL_CHOICE, CRITERION_TOOL, CRITERION_TOOL_CHOICE, ToolInputError,
+    clean_feedback_items, validate_tool_input
+)
 from .models import Assessment, Feedback, AssessmentRequest
+from .wakeup import notify_queue
 from practice.models import Submission
 
+if TYPE_CHECKING:
+    from anthropic.types import Usage
+
 logger = logging.getLogger(__name__)
 
+# Bump whenever the assessment prompt changes, so cached results are not reused
+PROMPT_VERSION = '2025-06.5'
+
+
+def get_worker_id() -> str:
+    """Identify this queue worker process across hosts."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+# Retry backoff per error class: (base delay, max delay) in seconds.
+# Errors classed as 'client_error' (bad request, auth) are never retried.
+RETRY_POLICIES = {
+    'rate_limit': (60, 30 * 60),
+    'overloaded': (30, 20 * 60),
+    'timeout': (15, 10 * 60),
+    'parse_error': (5, 5 * 60),
+    'other': (60, 60 * 60),
+}
+
+
+def classify_error(error: Exception) -> str:
+    """Map an assessment failure to a retry policy key."""
+    if getattr(error, 'error_class', None):
+        # Already classified, e.g. a Message Batch result error
+        return error.error_class
+    import anthropic
+    
+    if isinstance(error, anthropic.RateLimitError):
+        return 'rate_limit'
+    if isinstance(error, anthropic.APIStatusError):
+        # 529 overloaded and other 5xx are transient on Anthropic's side
+        if error.status_code >= 500:
+            return 'overloaded'
+        return 'client_error'
+    if isinstance(error, anthropic.APIConnectionError):
+        # Includes APITimeoutError
+        return 'timeout'
+    if isinstance(error, ValueError):
+        # AssessmentStreamParser raises IncompleteResponseError (a ValueError)
+        # for output that is malformed even after salvage, and tool input
+        # that breaks its schema raises ToolInputError (also a ValueError)
+        return 'parse_error'
+    return 'other'
+
+
+class PartialAssessmentError(Exception):
+    """
+    Some criteria of a per-criterion assessment failed; the others were saved.
+    
+    The request is retried on the schedule of the first failure's error
+    class, and the retry only scores the criteria listed in ``failed``.
+    """
+    
+    def __init__(self, message: str, failed: Dict[str, Exception]):
+        super().__init__(message)
+        self.failed = failed
+        first_error = next(iter(failed.values()))
+        self.error_class = classify_error(first_error)
+        self.response = getattr(first_error, 'response', None)
+
+
+class LeaseLost(Exception):
+    """The worker's lease on an assessment request expired or was reaped before results were saved."""
+
+
+def compute_retry_delay(error_class: str, attempts: int, error: Optional[Exception] = None) -> float:
+    """
+    Exponential backoff with jitter for the given error class and attempt number.
+    
+    Half of the delay is fixed and half is random, so a burst of 429s does not
+    come back as a synchronized burst. A ``retry-after`` header sent with the
+    error is used as a floor.
+    """
+    base, cap = RETRY_POLICIES.get(error_class, RETRY_POLICIES['other'])
+    delay = min(cap, base * 2 ** max(0, attempts - 1))
+    delay = delay / 2 + random.uniform(0, delay / 2)
+    
+    response = getattr(error, 'response', None)
+    if response is not None:
+        try:
+            delay = max(delay, float(response.headers.get('retry-after', 0)))
+        except (TypeError, ValueError):
+            pass
+    
+    return delay
+
 
 class IELTSAssessmentService:
     """
     Service for AI-powered IELTS writing assessment using Claude.
     """
     
+    # Assessment columns written when results are saved
+    RESULT_FIELDS = [
+        'overall_band_score', 'task_achievement_score', 'coherence_cohesion_score',
+        'lexical_resource_score', 'grammar_accuracy_score', 'ai_confidence_score',
+        'processing_time_seconds', 'cache_creation_input_tokens', 'cache_read_input_tokens',
+        'input_tokens', 'output_tokens', 'queue_wait_ms', 'prompt_build_ms', 'time_to_first_token_ms',
+        'generation_ms', 'parse_ms', 'persist_ms', 'ai_model_used', 'status', 'completed_at', 'updated_at',
+    ]
+    
     def __init__(self):
-        """Initialize the Claude client."""
-        self.client = anthropic.Anthropic(
-            api_key=getattr(settings, 'ANTHROPIC_API_KEY', os.getenv('ANTHROPIC_API_KEY'))
-        )
-        self.model = getattr(settings, 'CLAUDE_MODEL', 'claude-3-5-sonnet-20241022')
+        """Initialize the service; the scoring clients are built on first use."""
+        # Imported here: the SDK is only loaded once the service is first used
+        from .backends import get_scoring_backend
+        
+        self.backend = get_scoring_backend()
+        self._clients = {}
+        self._clients_pid = None
+        self.model = self.backend.model or getattr(settings, 'CLAUDE_MODEL', 'claude-3-5-sonnet-20241022')
         self.max_tokens = getattr(settings, 'CLAUDE_MAX_TOKENS', 4000)
+        self.salvage_enabled = getattr(settings, 'ASSESSMENT_SALVAGE_ENABLED', True)
+        self.router = ModelRouter.from_settings(self.backend, self.model, self.max_tokens)
+        self.lease_seconds = getattr(settings, 'ASSESSMENT_LEASE_SECONDS', 600)
+        self.max_attempts = getattr(settings, 'ASSESSMENT_MAX_ATTEMPTS', 5)
+        self.prescorer_in_prompt = getattr(settings, 'ASSESSMENT_PRESCORER_IN_PROMPT', False)
+        self.structured_output = getattr(settings, 'ASSESSMENT_STRUCTURED_OUTPUT', True)
+        self.criterion_split = getattr(settings, 'ASSESSMENT_CRITERION_SPLIT', False)
+        self.criterion_split_min_words = getattr(settings, 'ASSESSMENT_CRITERION_SPLIT_MIN_WORDS', 300)
+        self.criterion_max_tokens = getattr(settings, 'CLAUDE_CRITERION_MAX_TOKENS', 1200)
+        self.parse_stats = ParseStats()
+        # Results from differently built prompts are cached apart
+        prompt_version = PROMPT_VERSION
+        if self.prescorer_in_prompt:
+            prompt_version += '+metrics'
+        if self.structured_output:
+            prompt_version += '+tools'
+        self.result_cache = AssessmentResultCache(prompt_version)
+        self.rate_limiter = TokenBucketLimiter.from_settings()
+        if not self.backend.uses_anthropic_quota:
+            self.rate_limiter.enabled = False
+        self.rate_limit_max_wait = getattr(settings, 'ANTHROPIC_RATE_LIMIT_MAX_WAIT', 30)
+        self.rate_limit_queue_max_wait = getattr(settings, 'ANTHROPIC_RATE_LIMIT_QUEUE_MAX_WAIT', 120)
+    
+    def _process_clients(self) -> Dict:
+        """
+        The scoring clients of this process.
+        
+        The service is created at import time, which under gunicorn
+        ``--preload`` happens before the workers fork. Clients (and their
+        connection pools) are therefore built lazily, per process id, so a
+        forked worker never reuses sockets opened by its parent.
+        """
+        pid = os.getpid()
+        if self._clients_pid != pid:
+            self._clients = {}
+            self._clients_pid = pid
+        return self._clients
+    
+    def _process_client(self, name: str, build):
+        clients = self._process_clients()
+        if name not in clients:
+            clients[name] = build()
+        return clients[name]
+    
+    @property
+    def client(self):
+        """Sync scoring client (Claude unless ASSESSMENT_SCORING_BACKEND says otherwise)."""
+        return self._process_client('client', self.backend.client)
+    
+    @client.setter
+    def client(self, value):
+        clients = self._process_clients()
+        clients['client'] = value
+        clients.pop('stream_client', None)
     
-    def assess_submission(self, submission: Submission) -> Assessment:
+    @property
+    def stream_client(self):
+        """The sync client with the streaming timeouts, sharing its connection pool."""
+        return self._process_client('stream_client', lambda: self.backend.streaming_client(self.client))
+    
+    @property
+    def async_client(self):
+        return self._process_client('async_client', self.backend.async_client)
+    
+    @async_client.setter
+    def async_client(self, value):
+        clients = self._process_clients()
+        clients['async_client'] = value
+        clients.pop('async_stream_client', None)
+    
+    @property
+    def async_stream_client(self):
+        return self._process_client(
+            'async_stream_client', lambda: self.backend.streaming_client(self.async_client)
+        )
+    
+    def assess_submission(self, submission: Submission, lane: str = INTERACTIVE,
+                          queued_at: Optional[datetime] = None,
+                          lease: Optional[AssessmentRequest] = None) -> Assessment:
         """
         Assess a writing submission and return the assessment result.
         
         Args:
             submission: The submission to assess
+            lane: Rate limiter priority lane (INTERACTIVE or QUEUE)
+            queued_at: When the assessment was requested, for the queue wait timing
+            lease: Claimed request whose lease must still be held when results are saved
             
         Returns:
             Assessment object with scores and feedback
@@ -49,86 +250,416 @@ class IELTSAssessmentService:
             Exception: If assessment fails
         """
         start_time = time.time()
+        timer = StageTimer(queued_at)
+        assessment = None
         
         try:
-            # Create or get existing assessment
-            assessment, created = Assessment.objects.get_or_create(
-                submission=submission,
-                defaults={
-                    'status': 'processing',
-                    'started_at': timezone.now(),
-                    'ai_model_used': self.model
-                }
-            )
+            assessment, already_completed = self._begin_assessment(submission)
+            if already_completed:
+                return assessment
             
-            if not created and assessment.status == 'completed':
-                logger.info(f"Assessment already completed for submission {submission.id}")
+            if self._split_by_criterion(submission, assessment):
+                self._assess_by_criterion(submission, assessment, lane, start_time, timer, lease)
                 return assessment
             
-            # Update status to processing
-            assessment.status = 'processing'
-            assessment.started_at = timezone.now()
-            assessment.save()
+            # Identical essays for the same task are only scored once
+            route = self.router.route(submission)
+            assessment_data = self.result_cache.get(submission, route.cache_model)
+            usage = None
             
-            # Generate assessment prompt
-            prompt = self._generate_assessment_prompt(submission)
+            if assessment_data is None:
+                # Call Claude API: the fast model first, then the full model
+                # if the route escalates
+                escalated = True
+                while escalated:
+                    with timer.stage('prompt_build'):
+                        params = self._build_message_params(submission, route.model, route.max_tokens)
+                    with self.rate_limiter.limit(params, lane, self._max_wait(lane)) as reservation:
+                        with timer.generation():
+                            response = self.client.messages.create(**params)
+                        reservation.usage = response.usage
+                    
+                    usage = combine_usage(usage, response.usage)
+                    
+                    # Parse the response, re-requesting any sections that are missing
+                    with timer.stage('parse'):
+                        parser = AssessmentStreamParser()
+                        parser.feed(message_output(response))
+                        assessment_data, salvage_usage = self._finish_response(
+                            submission, parser, route.model, lane
+                        )
+                    usage = combine_usage(usage, salvage_usage)
+                    escalated = route.escalate(assessment_data)
+                
+                assessment_data['route'] = route.label
+                self.result_cache.set(submission, route.cache_model, assessment_data)
             
-            # Call Claude API
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=self.max_tokens,
-                temperature=0.3,  # Lower temperature for more consistent scoring
-                messages=[{
-                    "role": "user",
-                    "content": prompt
-                }]
-            )
+            self._save_assessment_results(assessment, assessment_data, start_time, usage, timer, lease)
+            return assessment
+            
+        except Exception as e:
+            self._record_assessment_failure(submission, assessment, e)
+            raise e
+    
+    def stream_submission(self, submission: Submission) -> Iterator[Dict]:
+        """
+        Assess a submission while streaming Claude's response.
+        
+        Yields progress events as the JSON response arrives:
+        ``{'type': 'score', 'criterion': ..., 'score': ...}`` when a band score
+        is complete, ``{'type': 'feedback', 'feedback_type': ..., 'title': ...}``
+        when a feedback item is complete, and finally
+        ``{'type': 'assessment', 'assessment': Assessment}`` once results are saved.
+        Every event carries ``sections_done`` and ``sections_total``.
+        
+        Raises:
+            Exception: If assessment fails
+        """
+        start_time = time.time()
+        timer = StageTimer()
+        assessment = None
+        
+        try:
+            assessment, already_completed = self._begin_assessment(submission)
+            if not already_completed and self._split_by_criterion(submission, assessment):
+                # Per-criterion calls are not streamed; their results arrive together
+                self._assess_by_criterion(submission, assessment, INTERACTIVE, start_time, timer)
+                already_completed = True
+            if not already_completed:
+                route = self.router.route(submission)
+                assessment_data = self.result_cache.get(submission, route.cache_model)
+                usage = None
+                
+                if assessment_data is None:
+                    # Sections already shown from the fast model are not
+                    # replayed when the route escalates
+                    sections_sent = 0
+                    escalated = True
+                    while escalated:
+                        progress = AssessmentStreamParser()
+                        
+                        with timer.stage('prompt_build'):
+                            params = self._build_message_params(submission, route.model, route.max_tokens)
+                        
+                        with self.rate_limiter.limit(params, INTERACTIVE, self.rate_limit_max_wait) as reservation:
+                            with timer.generation(), self.stream_client.messages.stream(**params) as stream:
+                                for text in stream_deltas(stream):
+                                    timer.first_token()
+                                    for event in progress.feed(text):
+                                        if event['sections_done'] > sections_sent:
+                                            sections_sent = event['sections_done']
+                                            yield event
+                                reservation.usage = stream.get_final_message().usage
+                        
+                        usage = combine_usage(usage, reservation.usage)
+                        # The stream was parsed as it arrived; this finishes it off
+                        with timer.stage('parse'):
+                            assessment_data, salvage_usage = self._finish_response(
+                                submission, progress, route.model, INTERACTIVE
+                            )
+                        usage = combine_usage(usage, salvage_usage)
+                        escalated = route.escalate(assessment_data)
+                    
+                    assessment_data['route'] = route.label
+                    self.result_cache.set(submission, route.cache_model, assessment_data)
+                
+                self._save_assessment_results(assessment, assessment_data, start_time, usage, timer)
             
-            # Parse the response
-            assessment_data = self._parse_claude_response(response.content[0].text)
+            yield {
+                'type': 'assessment',
+                'assessment': assessment,
+                'sections_done': AssessmentStreamParser.SECTIONS_TOTAL,
+                'sections_total': AssessmentStreamParser.SECTIONS_TOTAL,
+            }
             
-            # Update assessment with results
-            processing_time = int(time.time() - start_time)
+        except Exception as e:
+            self._record_assessment_failure(submission, assessment, e)
+            raise e
+    
+    async def aassess_submission(self, submission: Submission) -> Assessment:
+        """
+        Async version of assess_submission for ASGI views.
+        
+        The Claude call is awaited on the event loop; DB work runs in a thread
+        via sync_to_async. ``submission`` should be fetched with its task
+        (``select_related('task')``).
+        """
+        start_time = time.time()
+        timer = StageTimer()
+        assessment = None
+        
+        try:
+            assessment, already_completed = await sync_to_async(self._begin_assessment)(submission)
+            if already_completed:
+                return assessment
             
-            with transaction.atomic():
-                # Update assessment scores
-                assessment.overall_band_score = assessment_data['overall_score']
-                assessment.task_achievement_score = assessment_data['task_achievement']
-                assessment.coherence_cohesion_score = assessment_data['coherence_cohesion']
-                assessment.lexical_resource_score = assessment_data['lexical_resource']
-                assessment.grammar_accuracy_score = assessment_data['grammar_accuracy']
-                assessment.ai_confidence_score = assessment_data.get('confidence', 0.85)
-                assessment.processing_time_seconds = processing_time
-                assessment.status = 'completed'
-                assessment.completed_at = timezone.now()
-                assessment.save()
-                
-                # Create feedback items
-                self._create_feedback_items(assessment, assessment_data['feedback'])
+            if self._split_by_criterion(submission, assessment):
+                await self._aassess_by_criterion(submission, assessment, INTERACTIVE, start_time, timer)
+                return assessment
+            
+            route = await sync_to_async(self.router.route)(submission)
+            assessment_data = await sync_to_async(self.result_cache.get)(submission, route.cache_model)
+            usage = None
+            
+            if assessment_data is None:
+                escalated = True
+                while escalated:
+                    with timer.stage('prompt_build'):
+                        params = self._build_message_params(submission, route.model, route.max_tokens)
+                    async with self.rate_limiter.alimit(params, INTERACTIVE, self.rate_limit_max_wait) as reservation:
+                        with timer.generation():
+                            response = await self.async_client.messages.create(**params)
+                        reservation.usage = response.usage
+                    usage = combine_usage(usage, response.usage)
+                    with timer.stage('parse'):
+                        parser = AssessmentStreamParser()
+                        parser.feed(message_output(response))
+                        assessment_data, salvage_usage = await self._afinish_response(
+                            submission, parser, route.model, INTERACTIVE
+                        )
+                    usage = combine_usage(usage, salvage_usage)
+                    escalated = route.escalate(assessment_data)
                 
-                # Update submission status
-                submission.status = 'assessed'
-                submission.save()
+                assessment_data['route'] = route.label
+                await sync_to_async(self.result_cache.set)(submission, route.cache_model, assessment_data)
             
-            logger.info(f"Assessment completed for submission {submission.id} in {processing_time}s")
+            await sync_to_async(self._save_assessment_results)(assessment, assessment_data, start_time, usage, timer)
             return assessment
             
         except Exception as e:
-            logger.error(f"Assessment failed for submission {submission.id}: {str(e)}")
+            await sync_to_async(self._record_assessment_failure)(submission, assessment, e)
+            raise e
+    
+    async def astream_submission(self, submission: Submission) -> AsyncIterator[Dict]:
+        """
+        Async version of stream_submission for ASGI views; yields the same events.
+        
+        ``submission`` should be fetched with its task (``select_related('task')``).
+        """
+        start_time = time.time()
+        timer = StageTimer()
+        assessment = None
+        
+        try:
+            assessment, already_completed = await sync_to_async(self._begin_assessment)(submission)
+            if not already_completed and self._split_by_criterion(submission, assessment):
+                await self._aassess_by_criterion(submission, assessment, INTERACTIVE, start_time, timer)
+                already_completed = True
+            if not already_completed:
+                route = await sync_to_async(self.router.route)(submission)
+                assessment_data = await sync_to_async(self.result_cache.get)(submission, route.cache_model)
+                usage = None
+                
+                if assessment_data is None:
+                    sections_sent = 0
+                    escalated = True
+                    while escalated:
+                        progress = AssessmentStreamParser()
+                        
+                        with timer.stage('prompt_build'):
+                            params = self._build_message_params(submission, route.model, route.max_tokens)
+                        
+                        async with self.rate_limiter.alimit(params, INTERACTIVE, self.rate_limit_max_wait) as reservation:
+                            with timer.generation():
+                                async with self.async_stream_client.messages.stream(**params) as stream:
+                                    async for text in astream_deltas(stream):
+                                        timer.first_token()
+                                        for event in progress.feed(text):
+                                            if event['sections_done'] > sections_sent:
+                                                sections_sent = event['sections_done']
+                                                yield event
+                                    reservation.usage = (await stream.get_final_message()).usage
+                        
+                        usage = combine_usage(usage, reservation.usage)
+                        with timer.stage('parse'):
+                            assessment_data, salvage_usage = await self._afinish_response(
+                                submission, progress, route.model, INTERACTIVE
+                            )
+                        usage = combine_usage(usage, salvage_usage)
+                        escalated = route.escalate(assessment_data)
+                    
+                    assessment_data['route'] = route.label
+                    await sync_to_async(self.result_cache.set)(submission, route.cache_model, assessment_data)
+                
+                await sync_to_async(self._save_assessment_results)(
+                    assessment, assessment_data, start_time, usage, timer
+                )
             
-            # Update assessment with error
-            if 'assessment' in locals():
-                assessment.status = 'failed'
-                assessment.error_message = str(e)
-                assessment.retry_count += 1
-                assessment.save()
+            yield {
+                'type': 'assessment',
+                'assessment': assessment,
+                'sections_done': AssessmentStreamParser.SECTIONS_TOTAL,
+                'sections_total': AssessmentStreamParser.SECTIONS_TOTAL,
+            }
             
+        except Exception as e:
+            await sync_to_async(self._record_assessment_failure)(submission, assessment, e)
             raise e
     
-    def _generate_assessment_prompt(self, submission: Submission) -> str:
-        """Generate the prompt for Claude to assess the writing."""
+    def _max_wait(self, lane: str) -> float:
+        """
+        Longest rate-limit wait for a lane.
         
-        task = submission.task
+        Queued work waits longer, but well inside its lease; on timeout the
+        request fails with RateLimitTimeout and is retried with backoff.
+        """
+        if lane == INTERACTIVE:
+            return self.rate_limit_max_wait
+        return min(self.rate_limit_queue_max_wait, self.lease_seconds / 2)
+    
+    def _begin_assessment(self, submission: Submission) -> Tuple[Assessment, bool]:
+        """
+        Create or fetch the Assessment row and mark it as processing.
+        
+        Returns:
+            (assessment, already_completed)
+        """
+        # Create or get existing assessment
+        assessment, created = Assessment.objects.get_or_create(
+            submission=submission,
+            defaults={
+                'status': 'processing',
+                'started_at': timezone.now(),
+                'ai_model_used': self.model
+            }
+        )
+        
+        if created:
+            return assessment, False
+        
+        if assessment.status == 'completed':
+            logger.info(f"Assessment already completed for submission {submission.id}")
+            return assessment, True
+        
+        # Update status to processing
+        assessment.status = 'processing'
+        assessment.started_at = timezone.now()
+        assessment.save(update_fields=['status', 'started_at', 'updated_at'])
+        
+        return assessment, False
+    
+    @property
+    def output_mode(self) -> str:
+        """'tool' when Claude returns the assessment through the record_assessment tool, else 'text'."""
+        return 'tool' if self.structured_output else 'text'
+    
+    def _build_message_params(self, submission: Submission, model: Optional[str] = None,
+                              max_tokens: Optional[int] = None, structured: Optional[bool] = None) -> Dict:
+        """
+        Keyword arguments for a Claude Messages API call assessing ``submission`` (by default with the full model).
+        
+        With structured output (ASSESSMENT_STRUCTURED_OUTPUT, unless
+        ``structured`` overrides it) Claude is made to call the
+        record_assessment tool, and its input is checked against the tool's
+        schema before it is saved (see _parsed_result).
+        """
+        if structured is None:
+            structured = self.structured_output
+        params = {
+            'model': model or self.model,
+            'max_tokens': max_tokens or self.max_tokens,
+            'temperature': 0.3,  # Lower temperature for more consistent scoring
+            # The rubric is identical for every essay of a task type, so it is
+            # marked for Anthropic prompt caching; only the user turn varies
+            'system': [{
+                "type": "text",
+                "text": self._generate_rubric_prompt(submission.task, structured),
+                "cache_control": {"type": "ephemeral"}
+            }],
+            'messages': [{
+                "role": "user",
+                "content": self._generate_assessment_prompt(submission)
+            }]
+        }
+        if structured:
+            params['tools'] = [ASSESSMENT_TOOL]
+            params['tool_choice'] = ASSESSMENT_TOOL_CHOICE
+        return params
+    
+    def _save_assessment_results(self, assessment: Assessment, assessment_data: Dict, start_time: float,
+                                 usage=None, timer: Optional[StageTimer] = None,
+                                 lease: Optional[AssessmentRequest] = None):
+        """
+        Store parsed scores and feedback and mark the submission as assessed.
+        
+        ``usage`` is the Claude response's usage block (None on a cache hit);
+        its token counts are recorded on the assessment, as are the stage
+        timings collected by ``timer``. With a ``lease``, nothing is written
+        unless the worker still holds it (see _check_lease).
+        
+        Everything is prepared in memory first, so the transaction (and, on
+        SQLite, the database write lock) only spans three statements: one
+        bulk INSERT of feedback, one UPDATE of the submission and one UPDATE
+        of the assessment. The assessment is written last so it carries the
+        persist time, which covers everything but that final UPDATE.
+        """
+        persist_started = time.monotonic()
+        submission = assessment.submission
+        processing_time = int(time.time() - start_time)
+        
+        if usage is not None:
+            assessment.input_tokens = getattr(usage, 'input_tokens', None)
+            assessment.output_tokens = getattr(usage, 'output_tokens', None)
+            assessment.cache_creation_input_tokens = getattr(usage, 'cache_creation_input_tokens', None) or 0
+            assessment.cache_read_input_tokens = getattr(usage, 'cache_read_input_tokens', None) or 0
+        
+        for field, value in (timer or StageTimer()).as_fields().items():
+            setattr(assessment, field, value)
+        
+        # Update assessment scores
+        assessment.overall_band_score = assessment_data['overall_score']
+        assessment.task_achievement_score = assessment_data['task_achievement']
+        assessment.coherence_cohesion_score = assessment_data['coherence_cohesion']
+        assessment.lexical_resource_score = assessment_data['lexical_resource']
+        assessment.grammar_accuracy_score = assessment_data['grammar_accuracy']
+        assessment.ai_confidence_score = assessment_data.get('confidence', 0.85)
+        assessment.ai_model_used = assessment_data.get('route', self.model)
+        assessment.processing_time_seconds = processing_time
+        assessment.status = 'completed'
+        assessment.completed_at = timezone.now()
+        
+        feedback_items = self._build_feedback_items(assessment, assessment_data['feedback'])
+        submission.status = 'assessed'
+        
+        with transaction.atomic():
+            self._check_lease(lease)
+            Feedback.objects.bulk_create(feedback_items)
+            submission.save(update_fields=['status', 'updated_at'])
+            assessment.persist_ms = int(round((time.monotonic() - persist_started) * 1000))
+            assessment.save(update_fields=self.RESULT_FIELDS)
+        
+        metrics.assessment_completed(usage)
+        logger.info(f"Assessment completed for submission {submission.id} in {processing_time}s")
+    
+    def _record_assessment_failure(self, submission: Submission, assessment: Optional[Assessment], error: Exception):
+        """Log a failed assessment and store the error on the Assessment row."""
+        if isinstance(error, LeaseLost):
+            # The request, and the assessment, now belong to another worker
+            logger.warning(f"Discarded results for submission {submission.id}: {error}")
+            return
+        
+        logger.error(f"Assessment failed for submission {submission.id}: {str(error)}")
+        metrics.claude_error(classify_error(error))
+        
+        # Update assessment with error
+        if assessment is not None:
+            # Criteria that were scored are kept for the retry
+            assessment.status = 'retry' if isinstance(error, PartialAssessmentError) else 'failed'
+            assessment.error_message = str(error)
+            assessment.retry_count += 1
+            assessment.save(update_fields=['status', 'error_message', 'retry_count', 'updated_at'])
+    
+    def _generate_rubric_prompt(self, task, structured: bool) -> str:
+        """
+        Generate the static part of the prompt: examiner persona, criteria,
+        band scale and output format.
+        
+        It depends only on the module, the task number and the output mode,
+        so it is sent as a cached system block and reused across every essay
+        of that task type. With ``structured`` the output format describes
+        the feedback to record through the tool (whose schema defines the
+        fields) instead of asking for JSON in the reply.
+        """
         task_type = "Task 1" if task.task_number == 1 else "Task 2"
         module_type = task.get_module_type_display()
         
@@ -144,50 +675,19 @@ class IELTSAssessmentService:
             task_criterion = "Task Response"
             task_description = "How well the response addresses the task, presents a clear position, and develops arguments with relevant examples"
         
-        prompt = f"""You are an expert IELTS examiner with extensive experience in assessing {module_type} Writing {task_type}. You will assess this writing response according to the official IELTS Writing assessment criteria.
-
-TASK INFORMATION:
-- Module: {module_type}
-- Task: {task_type}
-- Task Code: {task.task_code}
-- Title: {task.title}
-- Word Limit: {task.word_limit_min}-{task.word_limit_max} words
-- Actual Word Count: {submission.word_count} words
-
-TASK PROMPT:
-{task.prompt}
-
-{f"TASK INSTRUCTIONS: {task.instruction}" if task.instruction else ""}
-
-STUDENT RESPONSE:
-{submission.content}
-
-ASSESSMENT CRITERIA:
-Please assess this response according to the four IELTS Writing criteria:
-
-1. {task_criterion} (25%): {task_description}
-2. Coherence and Cohesion (25%): Logical organization, clear progression, appropriate linking devices, paragraphing
-3. Lexical Resource (25%): Range and accuracy of vocabulary, appropriate word choice, spelling accuracy
-4. Grammatical Range and Accuracy (25%): Range of grammatical structures, accuracy, punctuation
-
-SCORING SCALE:
-Use the IELTS 9-band scale (1.0-9.0, in 0.5 increments):
-- 9.0: Expert user
-- 8.0-8.5: Very good user
-- 7.0-7.5: Good user
-- 6.0-6.5: Competent user
-- 5.0-5.5: Modest user
-- 4.0-4.5: Limited user
-- 3.0-3.5: Extremely limited user
-- 2.0-2.5: Intermittent user
-- 1.0-1.5: Non-user
+        if structured:
+            output_format = f"""REQUIRED OUTPUT:
+Record your assessment by calling the tool provided, with the band scores, your confidence and these feedback items, in this order:
+- overall ("Overall Assessment"): comprehensive overview of the response quality and band score justification
+- task_achievement ("{task_criterion}"): detailed analysis of how well the task requirements were met
+- coherence_cohesion ("Coherence and Cohesion"): analysis of organization, flow, and linking
+- lexical_resource ("Lexical Resource"): assessment of vocabulary range, accuracy, and appropriateness
+- grammar_accuracy ("Grammatical Range and Accuracy"): evaluation of grammatical structures and accuracy
+- suggestion ("Key Areas for Improvement", severity "suggestion"): specific, actionable suggestions for improvement
 
-SPECIAL CONSIDERATIONS:
-- Word count: {"Under minimum" if submission.word_count < task.word_limit_min else "Over maximum" if submission.word_count > task.word_limit_max else "Within range"}
-- Penalties apply for significant under/over length
-- Task type specific requirements must be met
-
-REQUIRED OUTPUT FORMAT:
+Give accurate band scores and detailed, constructive feedback."""
+        else:
+            output_format = f"""REQUIRED OUTPUT FORMAT:
 Please provide your assessment in the following JSON format:
 
 {{
@@ -239,42 +739,518 @@ Please provide your assessment in the following JSON format:
 
 Provide only the JSON response with accurate band scores and detailed, constructive feedback."""
 
-        return prompt
+        return f"""You are an expert IELTS examiner with extensive experience in assessing {module_type} Writing {task_type}. You will assess the writing response in the user's message according to the official IELTS Writing assessment criteria.
+
+ASSESSMENT CRITERIA:
+Please assess the response according to the four IELTS Writing criteria:
+
+1. {task_criterion} (25%): {task_description}
+2. Coherence and Cohesion (25%): Logical organization, clear progression, appropriate linking devices, paragraphing
+3. Lexical Resource (25%): Range and accuracy of vocabulary, appropriate word choice, spelling accuracy
+4. Grammatical Range and Accuracy (25%): Range of grammatical structures, accuracy, punctuation
+
+SCORING SCALE:
+Use the IELTS 9-band scale (1.0-9.0, in 0.5 increments):
+- 9.0: Expert user
+- 8.0-8.5: Very good user
+- 7.0-7.5: Good user
+- 6.0-6.5: Competent user
+- 5.0-5.5: Modest user
+- 4.0-4.5: Limited user
+- 3.0-3.5: Extremely limited user
+- 2.0-2.5: Intermittent user
+- 1.0-1.5: Non-user
+
+BAND DESCRIPTORS (summary):
+{task_criterion}:
+- 8-9: Fully addresses all parts of the task; position or overview is clear and ideas are extended and well supported
+- 7: Covers the requirements; clear position or overview, main ideas extended though some may lack focus
+- 6: Addresses the task but some parts more fully than others; relevant ideas, some insufficiently developed
+- 5: Only partially addresses the task; limited development, may be repetitive or include irrelevant detail
+- 4 and below: Responds minimally or tangentially; ideas are few, unclear or largely irrelevant
+Coherence and Cohesion:
+- 8-9: Sequences information and ideas logically; manages all aspects of cohesion and paragraphing skilfully
+- 7: Clear progression throughout; uses a range of cohesive devices with some under- or over-use
+- 6: Coherent arrangement with overall progression; cohesive devices used but sometimes faulty or mechanical
+- 5: Some organisation but lacks overall progression; inadequate, inaccurate or over-used linking
+- 4 and below: Information not arranged coherently; linking is basic, repetitive or absent
+Lexical Resource:
+- 8-9: Wide, fluent and flexible vocabulary with precise meaning; rare minor slips only
+- 7: Sufficient range for flexibility and precision; some less common items, occasional errors in choice or spelling
+- 6: Adequate range for the task; attempts less common vocabulary with some inaccuracy; errors do not impede meaning
+- 5: Limited range, minimally adequate; noticeable errors in spelling or word formation that may cause difficulty
+- 4 and below: Basic, repetitive vocabulary; frequent errors that strain or obscure meaning
+Grammatical Range and Accuracy:
+- 8-9: Wide range of structures; the majority of sentences are error-free with only rare non-systematic errors
+- 7: Variety of complex structures; frequent error-free sentences with good control of grammar and punctuation
+- 6: Mix of simple and complex forms; some errors in grammar and punctuation that rarely reduce communication
+- 5: Limited range of structures; complex sentences attempted but less accurate; frequent errors
+- 4 and below: Very limited range; errors predominate and punctuation is often faulty
+
+SPECIAL CONSIDERATIONS:
+- The user's message states whether the word count is within the task's limits
+- Penalties apply for significant under/over length
+- Task type specific requirements must be met
+
+{output_format}"""
+    
+    def _generate_assessment_prompt(self, submission: Submission) -> str:
+        """Generate the per-essay part of the prompt: task details and the response."""
+        
+        task = submission.task
+        task_type = "Task 1" if task.task_number == 1 else "Task 2"
+        module_type = task.get_module_type_display()
+        
+        if submission.word_count < task.word_limit_min:
+            word_count_status = "Under minimum"
+        elif submission.word_count > task.word_limit_max:
+            word_count_status = "Over maximum"
+        else:
+            word_count_status = "Within range"
+        
+        return f"""TASK INFORMATION:
+- Module: {module_type}
+- Task: {task_type}
+- Task Code: {task.task_code}
+- Title: {task.title}
+- Word Limit: {task.word_limit_min}-{task.word_limit_max} words
+- Actual Word Count: {submission.word_count} words ({word_count_status})
+
+TASK PROMPT:
+{task.prompt}
+
+{f"TASK INSTRUCTIONS: {task.instruction}" if task.instruction else ""}
+{self._text_metrics(submission)}
+STUDENT RESPONSE:
+{submission.content}"""
     
-    def _parse_claude_response(self, response_text: str) -> Dict:
-        """Parse Claude's JSON response into assessment data."""
+    def _text_metrics(self, submission: Submission) -> str:
+        """Locally measured text metrics for the prompt, when ASSESSMENT_PRESCORER_IN_PROMPT is on."""
+        if not self.prescorer_in_prompt:
+            return ""
+        features = prescorer.extract_features(submission.content, submission.task)
+        return f"""TEXT METRICS (measured automatically; use as evidence, not as a score):
+{prescorer.prompt_summary(features)}
+"""
+    
+    def _finish_response(self, submission: Submission, parser: AssessmentStreamParser, model: str,
+                         lane: str) -> Tuple[Dict, Optional['Usage']]:
+        """
+        Assessment data from a parsed Claude response.
+        
+        If the response was truncated or partly malformed, the missing
+        sections (and only those) are requested once more and merged in.
+        
+        Returns:
+            (assessment_data, usage of the salvage call or None)
+            
+        Raises:
+            IncompleteResponseError: if sections are still missing
+        """
+        self.parse_stats.record(self.output_mode, 'responses')
         try:
-            # Extract JSON from response (in case there's extra text)
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}') + 1
+            return self._parsed_result(submission, parser), None
+        except IncompleteResponseError as e:
+            if not self._salvageable(parser):
+                self._log_parse_failure(parser, e)
+                raise
+            
+            params = self._salvage_params(submission, parser, model)
+            with self.rate_limiter.limit(params, lane, self._max_wait(lane)) as reservation:
+                response = self.client.messages.create(**params)
+                reservation.usage = response.usage
             
-            if start_idx == -1 or end_idx == 0:
-                raise ValueError("No JSON found in response")
+            return self._merge_salvage(submission, parser, message_output(response)), response.usage
+    
+    async def _afinish_response(self, submission: Submission, parser: AssessmentStreamParser, model: str,
+                                lane: str) -> Tuple[Dict, Optional['Usage']]:
+        """Async version of _finish_response."""
+        await sync_to_async(self.parse_stats.record)(self.output_mode, 'responses')
+        try:
+            return self._parsed_result(submission, parser), None
+        except IncompleteResponseError as e:
+            if not self._salvageable(parser):
+                await sync_to_async(self._log_parse_failure)(parser, e)
+                raise
             
-            json_text = response_text[start_idx:end_idx]
-            data = json.loads(json_text)
+            params = self._salvage_params(submission, parser, model)
+            async with self.rate_limiter.alimit(params, lane, self._max_wait(lane)) as reservation:
+                response = await self.async_client.messages.create(**params)
+                reservation.usage = response.usage
             
-            # Convert scores to Decimal
-            return {
-                'overall_score': Decimal(str(data['overall_score'])),
-                'task_achievement': Decimal(str(data['task_achievement'])),
-                'coherence_cohesion': Decimal(str(data['coherence_cohesion'])),
-                'lexical_resource': Decimal(str(data['lexical_resource'])),
-                'grammar_accuracy': Decimal(str(data['grammar_accuracy'])),
-                'confidence': Decimal(str(data.get('confidence', 0.85))),
-                'feedback': data['feedback']
-            }
+            return (
+                await sync_to_async(self._merge_salvage)(submission, parser, message_output(response)),
+                response.usage
+            )
+    
+    def _parsed_result(self, submission: Submission, parser: AssessmentStreamParser) -> Dict:
+        """
+        parser.result() with feedback items checked against the Feedback model and the essay.
+        
+        In tool mode the result must match the record_assessment schema;
+        a band score off the 0.5 scale or an unknown feedback type is an
+        error rather than something to repair.
+        
+        Raises:
+            IncompleteResponseError: if sections are missing
+            ToolInputError: if a tool-mode result breaks the schema
+        """
+        assessment_data = parser.result()
+        if self.structured_output:
+            try:
+                validate_tool_input(ASSESSMENT_TOOL, assessment_data)
+            except ToolInputError as e:
+                self._log_parse_failure(parser, e)
+                raise
+        clean_feedback_items(assessment_data['feedback'], submission.content)
+        return assessment_data
+    
+    def _salvageable(self, parser: AssessmentStreamParser) -> bool:
+        """Whether enough of a response arrived for a partial re-request to beat a full retry."""
+        return self.salvage_enabled and parser.sections_done > 0
+    
+    def _salvage_params(self, submission: Submission, parser: AssessmentStreamParser, model: str) -> Dict:
+        """
+        Messages API call asking Claude for only the missing sections.
+        
+        The original request and Claude's partial answer are replayed (the
+        rubric hits the prompt cache), so the new output stays consistent
+        with what was already scored while costing only the missing tokens.
+        """
+        missing = parser.missing_sections()
+        score_keys = [section for section in missing if not section.startswith('feedback:')]
+        feedback_types = [section.split(':', 1)[1] for section in missing if section.startswith('feedback:')]
+        
+        fields = [f'"{key}": X.X' for key in score_keys]
+        if feedback_types:
+            items = ', '.join(
+                f'{{"type": "{feedback_type}", "title": "...", "content": "...", "severity": "..."}}'
+                for feedback_type in feedback_types
+            )
+            fields.append(f'"feedback": [{items}]')
+        
+        # Plain text: the partial answer is replayed as an assistant turn,
+        # which a forced tool call would not continue
+        params = self._build_message_params(
+            submission, model, min(self.max_tokens, 256 + 512 * len(feedback_types)), structured=False
+        )
+        params['messages'] += [
+            {"role": "assistant", "content": parser.text.strip() or "{"},
+            {"role": "user", "content": (
+                "Your response above was cut off or malformed. Do not repeat the sections you "
+                "already completed. Reply with only this JSON object, containing just the "
+                f"missing sections:\n\n{{{', '.join(fields)}}}"
+            )},
+        ]
+        return params
+    
+    def _merge_salvage(self, submission: Submission, parser: AssessmentStreamParser, response_text: str) -> Dict:
+        missing = parser.missing_sections()
+        filled = parser.merge(response_text)
+        logger.warning(
+            f"Salvaged assessment response for submission {submission.id}: "
+            f"re-requested {', '.join(missing)}; received {', '.join(filled) or 'nothing'}"
+        )
+        try:
+            assessment_data = self._parsed_result(submission, parser)
+        except IncompleteResponseError as e:
+            self._log_parse_failure(parser, e)
+            raise
+        self.parse_stats.record(self.output_mode, 'salvaged')
+        return assessment_data
+    
+    def _log_parse_failure(self, parser: AssessmentStreamParser, error: Exception):
+        self.parse_stats.record(self.output_mode, 'failed')
+        logger.error(f"Failed to parse Claude response: {error}")
+        logger.error(f"Response text: {parser.text}")
+    
+    def _split_by_criterion(self, submission: Submission, assessment: Assessment) -> bool:
+        """Whether to score ``submission`` with one call per criterion (see _assess_by_criterion)."""
+        if self._saved_criteria(assessment):
+            # A partial per-criterion result is finished the same way
+            return True
+        return (
+            self.criterion_split
+            and submission.task.task_number == 2
+            and submission.word_count >= self.criterion_split_min_words
+        )
+    
+    def _saved_criteria(self, assessment: Assessment) -> List[str]:
+        """Criteria already scored by an earlier, partially failed attempt."""
+        return [criterion for criterion, score in assessment.criterion_scores.items() if score is not None]
+    
+    def _assess_by_criterion(self, submission: Submission, assessment: Assessment, lane: str, start_time: float,
+                             timer: StageTimer, lease: Optional[AssessmentRequest] = None):
+        """
+        Score the four criteria with concurrent smaller calls and merge them.
+        
+        Used for long Task 2 essays when ASSESSMENT_CRITERION_SPLIT is on: the
+        wall-clock time is that of the slowest criterion instead of one long
+        response covering everything. If some criteria fail, the others are
+        saved with status 'retry' and PartialAssessmentError is raised; the
+        retry only requests the missing criteria.
+        """
+        saved = self._saved_criteria(assessment)
+        route = self.router.route(submission)
+        cache_model = f'{route.cache_model}+criteria'
+        # A resumed assessment only needs its missing criteria scored
+        assessment_data = None if saved else self.result_cache.get(submission, cache_model)
+        usage = None
+        
+        if assessment_data is None:
+            escalated = True
+            while escalated:
+                pending = [criterion for criterion in CRITERIA if criterion not in saved]
+                # One thread per criterion; the calls are I/O bound
+                with timer.generation(), ThreadPoolExecutor(max_workers=len(pending)) as executor:
+                    outcomes = list(executor.map(
+                        lambda criterion: self._assess_criterion(submission, criterion, route.model, lane),
+                        pending
+                    ))
+                
+                with timer.stage('parse'):
+                    assessment_data, call_usage = self._merge_criteria(
+                        submission, assessment, route, dict(zip(pending, outcomes)), lease
+                    )
+                usage = combine_usage(usage, call_usage)
+                escalated = not saved and route.escalate(assessment_data)
+            
+            assessment_data['route'] = route.label
+            if not saved:
+                self.result_cache.set(submission, cache_model, assessment_data)
+        
+        self._save_assessment_results(assessment, assessment_data, start_time, usage, timer, lease)
+    
+    async def _aassess_by_criterion(self, submission: Submission, assessment: Assessment, lane: str,
+                                    start_time: float, timer: StageTimer):
+        """Async version of _assess_by_criterion."""
+        saved = self._saved_criteria(assessment)
+        route = await sync_to_async(self.router.route)(submission)
+        cache_model = f'{route.cache_model}+criteria'
+        assessment_data = None
+        if not saved:
+            assessment_data = await sync_to_async(self.result_cache.get)(submission, cache_model)
+        usage = None
+        
+        if assessment_data is None:
+            escalated = True
+            while escalated:
+                pending = [criterion for criterion in CRITERIA if criterion not in saved]
+                with timer.generation():
+                    outcomes = await asyncio.gather(*(
+                        self._aassess_criterion(submission, criterion, route.model, lane) for criterion in pending
+                    ))
+                
+                with timer.stage('parse'):
+                    assessment_data, call_usage = await sync_to_async(self._merge_criteria)(
+                        submission, assessment, route, dict(zip(pending, outcomes))
+                    )
+                usage = combine_usage(usage, call_usage)
+                escalated = not saved and route.escalate(assessment_data)
+            
+            assessment_data['route'] = route.label
+            if not saved:
+                await sync_to_async(self.result_cache.set)(submission, cache_model, assessment_data)
+        
+        await sync_to_async(self._save_assessment_results)(assessment, assessment_data, start_time, usage, timer)
+    
+    def _assess_criterion(self, submission: Submission, criterion: str, model: str,
+                          lane: str) -> Tuple[object, Optional['Usage']]:
+        """
+        Score one criterion.
+        
+        Returns:
+            (criterion result or the exception that stopped it, usage or None)
+        """
+        params = self._build_criterion_params(submission, criterion, model)
+        try:
+            with self.rate_limiter.limit(params, lane, self._max_wait(lane)) as reservation:
+                response = self.client.messages.create(**params)
+                reservation.usage = response.usage
+        except Exception as e:
+            return e, None
+        
+        try:
+            return self._parse_criterion(submission, criterion, message_output(response)), response.usage
+        except (IncompleteResponseError, ToolInputError) as e:
+            return e, response.usage
+    
+    async def _aassess_criterion(self, submission: Submission, criterion: str, model: str,
+                                 lane: str) -> Tuple[object, Optional['Usage']]:
+        """Async version of _assess_criterion."""
+        params = self._build_criterion_params(submission, criterion, model)
+        try:
+            async with self.rate_limiter.alimit(params, lane, self._max_wait(lane)) as reservation:
+                response = await self.async_client.messages.create(**params)
+                reservation.usage = response.usage
+        except Exception as e:
+            return e, None
+        
+        try:
+            return self._parse_criterion(submission, criterion, message_output(response)), response.usage
+        except (IncompleteResponseError, ToolInputError) as e:
+            return e, response.usage
+    
+    def _build_criterion_params(self, submission: Submission, criterion: str, model: Optional[str] = None) -> Dict:
+        """
+        Messages API call scoring only ``criterion``.
+        
+        The tools, rubric and essay are sent exactly as for the other three
+        criteria and the criterion is named in a trailing text block, so the
+        four concurrent calls differ only after the cached rubric prefix.
+        """
+        params = self._build_message_params(submission, model, self.criterion_max_tokens)
+        params['messages'][0]['content'] = [
+            {"type": "text", "text": params['messages'][0]['content']},
+            {"type": "text", "text": self._generate_criterion_prompt(submission.task, criterion)},
+        ]
+        if self.structured_output:
+            params['tools'] = [CRITERION_TOOL]
+            params['tool_choice'] = CRITERION_TOOL_CHOICE
+        return params
+    
+    def _generate_criterion_prompt(self, task, criterion: str) -> str:
+        """Instruction restricting the assessment to one criterion."""
+        if criterion == 'task_achievement' and task.task_number == 2:
+            name = "Task Response"
+        else:
+            name = dict(Feedback.FEEDBACK_TYPE_CHOICES)[criterion]
+        
+        instruction = f"Assess ONLY the {name} criterion of this response; the other criteria are assessed separately."
+        if self.structured_output:
+            return (
+                f"{instruction}\n\nRecord your assessment by calling the tool provided, with the {name} band "
+                f"score, your confidence, one \"{criterion}\" feedback item and optionally \"inline\" items "
+                f"quoting passages relevant to {name}."
+            )
+        
+        return f"""{instruction}
+
+Provide your assessment in the following JSON format, with one "{criterion}" feedback item and optionally "inline" items quoting passages relevant to {name}:
+
+{{
+    "{criterion}": X.X,
+    "confidence": 0.XX,
+    "feedback": [
+        {{
+            "type": "{criterion}",
+            "title": "{name}",
+            "content": "Detailed analysis of {name} with band score justification",
+            "severity": "info"
+        }}
+    ]
+}}"""
+    
+    def _parse_criterion(self, submission: Submission, criterion: str, response_text: str) -> Dict:
+        """
+        The score, confidence and feedback of a single-criterion response.
+        
+        Raises:
+            IncompleteResponseError: if the band score is missing
+            ToolInputError: if a tool-mode response breaks the record_criterion_assessment schema
+        """
+        parser = AssessmentStreamParser()
+        parser.feed(response_text)
+        if criterion not in parser.scores:
+            raise IncompleteResponseError(f"Response is missing {criterion}", [criterion])
+        confidence = Decimal(str(parser.confidence if parser.confidence is not None else 0.85))
+        if self.structured_output:
+            validate_tool_input(
+                CRITERION_TOOL, {**parser.scores, 'confidence': confidence, 'feedback': parser.feedback}
+            )
+        
+        # Anything about another criterion is left to that criterion's call
+        feedback = [item for item in parser.feedback if item.get('type') in (criterion, 'inline')]
+        return {
+            'score': Decimal(str(parser.scores[criterion])),
+            'confidence': confidence,
+            'feedback': clean_feedback_items(feedback, submission.content),
+        }
+    
+    def _merge_criteria(self, submission: Submission, assessment: Assessment, route: Route,
+                        outcomes: Dict[str, Tuple[object, Optional['Usage']]],
+                        lease: Optional[AssessmentRequest] = None) -> Tuple[Dict, Optional['Usage']]:
+        """
+        Combine per-criterion results into assessment data.
+        
+        The overall band comes from Assessment.calculate_overall_score, over
+        these results and any criteria saved by an earlier attempt.
+        
+        Returns:
+            (assessment_data, combined usage of the calls)
             
-        except (json.JSONDecodeError, KeyError, ValueError) as e:
-            logger.error(f"Failed to parse Claude response: {e}")
-            logger.error(f"Response text: {response_text}")
-            raise ValueError(f"Invalid response format: {e}")
+        Raises:
+            PartialAssessmentError: if some criteria failed (the rest are saved)
+        """
+        usage = None
+        results, failed = {}, {}
+        for criterion, (outcome, call_usage) in outcomes.items():
+            usage = combine_usage(usage, call_usage)
+            if call_usage is not None:
+                self.parse_stats.record(self.output_mode, 'responses')
+            if isinstance(outcome, Exception):
+                if isinstance(outcome, (IncompleteResponseError, ToolInputError)):
+                    self.parse_stats.record(self.output_mode, 'failed')
+                failed[criterion] = outcome
+            else:
+                results[criterion] = outcome
+        
+        for criterion in outcomes:
+            # Failed criteria must not keep a score from before an escalation
+            setattr(assessment, f'{criterion}_score', results[criterion]['score'] if criterion in results else None)
+        confidences = [result['confidence'] for result in results.values()]
+        if assessment.ai_confidence_score is not None and len(results) < len(CRITERIA):
+            confidences.append(assessment.ai_confidence_score)
+        confidence = min(confidences) if confidences else None
+        feedback = [item for result in results.values() for item in result['feedback']]
+        
+        if failed:
+            if len(failed) == len(CRITERIA):
+                # Nothing to keep; retry as for a single call
+                raise next(iter(failed.values()))
+            if results:
+                self._save_partial_results(assessment, confidence, feedback, route.label, lease)
+            raise PartialAssessmentError(
+                f"Scoring failed for {', '.join(failed)}: {next(iter(failed.values()))}", failed
+            )
+        
+        overall = Decimal(str(assessment.calculate_overall_score()))
+        summary = ', '.join(
+            f"{dict(Feedback.FEEDBACK_TYPE_CHOICES)[criterion]} {score}"
+            for criterion, score in assessment.criterion_scores.items()
+        )
+        feedback.insert(0, {
+            'type': 'overall',
+            'title': 'Overall Assessment',
+            'content': f"Overall band {overall}: {summary}.",
+            'severity': 'info',
+        })
+        return {
+            'overall_score': overall,
+            **assessment.criterion_scores,
+            'confidence': confidence,
+            'feedback': feedback,
+        }, usage
     
-    def _create_feedback_items(self, assessment: Assessment, feedback_data: List[Dict]):
-        """Create Feedback objects from the assessment data."""
+    def _save_partial_results(self, assessment: Assessment, confidence: Optional[Decimal], feedback: List[Dict],
+                              route_label: str, lease: Optional[AssessmentRequest] = None):
+        """Store the criteria that were scored, leaving the assessment for a retry."""
+        assessment.ai_confidence_score = confidence
+        assessment.ai_model_used = route_label
+        assessment.status = 'retry'
         
-        for item in feedback_data:
-            feedback = Feedback.objects.create(
+        with transaction.atomic():
+            self._check_lease(lease)
+            assessment.save(update_fields=[
+                'task_achievement_score', 'coherence_cohesion_score', 'lexical_resource_score',
+                'grammar_accuracy_score', 'ai_confidence_score', 'ai_model_used', 'status', 'updated_at',
+            ])
+            Feedback.objects.bulk_create(self._build_feedback_items(assessment, feedback))
+    
+    def _build_feedback_items(self, assessment: Assessment, feedback_data: List[Dict]) -> List[Feedback]:
+        """Build unsaved Feedback objects from the assessment data, for bulk_create."""
+        return [
+            Feedback(
                 assessment=assessment,
                 feedback_type=item['type'],
                 severity=item.get('severity', 'info'),
@@ -286,66 +1262,306 @@ Provide only the JSON response with accurate band scores and detailed, construct
                 text_end_position=item.get('text_end_position'),
                 ai_confidence=Decimal(str(item.get('confidence', 0.85)))
             )
+            for item in feedback_data
+        ]
     
     def create_assessment_request(self, submission: Submission, priority: int = 0) -> AssessmentRequest:
-        """Create an assessment request for queue processing."""
+        """
+        Queue a submission for assessment, or return its active request.
         
-        # Check if already exists
-        existing_request = AssessmentRequest.objects.filter(
-            submission=submission,
-            status__in=['queued', 'processing']
-        ).first()
+        The unique_active_assessment_request constraint allows one queued,
+        processing or failed (retry pending) request per submission, so the
+        INSERT is attempted first and a conflict means another request, e.g.
+        from a double-click, already won: that one is returned instead. The
+        common case is a single round trip, and concurrent callers can never
+        queue the same essay twice.
+        """
+        attempts = 3
+        for attempt in range(attempts):
+            try:
+                with transaction.atomic():
+                    assessment_request = AssessmentRequest.objects.create(
+                        submission=submission,
+                        priority=priority,
+                        status='queued'
+                    )
+            except IntegrityError:
+                existing_request = AssessmentRequest.objects.filter(
+                    submission=submission,
+                    status__in=AssessmentRequest.ACTIVE_STATUSES
+                ).first()
+                if existing_request:
+                    return existing_request
+                if attempt == attempts - 1:
+                    raise
+                # The active request finished between the INSERT and the
+                # SELECT; try the INSERT again
+                continue
         
-        if existing_request:
-            return existing_request
+            # Wake idle queue daemons once the row is visible to them
+            transaction.on_commit(notify_queue)
         
-        return AssessmentRequest.objects.create(
-            submission=submission,
-            priority=priority,
-            status='queued'
+            return assessment_request
+    
+    def claim_queued_requests(self, limit: int, worker_id: Optional[str] = None,
+                              exclude_ids: Optional[List[int]] = None,
+                              lease_seconds: Optional[int] = None) -> List[AssessmentRequest]:
+        """
+        Atomically claim up to ``limit`` queued requests for a worker.
+        
+        Candidates are locked with ``SELECT ... FOR UPDATE SKIP LOCKED`` where the
+        database supports it, then flipped to processing in a single conditional
+        UPDATE that stamps the worker id and lease expiry. Only rows still queued
+        at UPDATE time are taken, so concurrent daemons never claim the same row.
+        
+        Args:
+            limit: Maximum number of requests to claim
+            worker_id: Identifier of the claiming worker (defaults to host:pid)
+            exclude_ids: Request IDs already being handled by this process
+            lease_seconds: Lease length (defaults to ASSESSMENT_LEASE_SECONDS)
+            
+        Returns:
+            List of claimed AssessmentRequest objects
+        """
+        worker_id = worker_id or get_worker_id()
+        now = timezone.now()
+        lease_expires_at = now + timedelta(seconds=lease_seconds or self.lease_seconds)
+        
+        # SQLite has no row locks; there the conditional UPDATE alone is the
+        # claim, and wrapping the read in a transaction only invites
+        # "database is locked" when the read lock is upgraded to a write lock.
+        skip_locked = connection.features.has_select_for_update_skip_locked
+        
+        with transaction.atomic() if skip_locked else nullcontext():
+            candidates = AssessmentRequest.objects.filter(
+                status='queued'
+            ).order_by('-priority', 'created_at')
+            
+            if exclude_ids:
+                candidates = candidates.exclude(id__in=exclude_ids)
+            
+            if skip_locked:
+                candidates = candidates.select_for_update(skip_locked=True)
+            
+            candidate_ids = list(candidates.values_list('id', flat=True)[:limit])
+            if not candidate_ids:
+                return []
+            
+            # The (worker_id, lease_expires_at) pair doubles as the lease token
+            AssessmentRequest.objects.filter(
+                id__in=candidate_ids,
+                status='queued'
+            ).update(
+                status='processing',
+                worker_id=worker_id,
+                lease_expires_at=lease_expires_at,
+                processing_started_at=now,
+                attempts=F('attempts') + 1,
+                updated_at=now
+            )
+        
+        return list(
+            AssessmentRequest.objects.filter(
+                id__in=candidate_ids,
+                worker_id=worker_id,
+                lease_expires_at=lease_expires_at
+            ).select_related('submission', 'submission__task').order_by(
+                '-priority', 'created_at'
+            )
+        )
+    
+    def reap_expired_leases(self) -> int:
+        """
+        Re-queue processing requests whose lease has expired.
+        
+        A worker that crashes or is killed mid-assessment leaves its claimed
+        rows in processing; once the lease lapses they go back on the queue,
+        unless they have used up their attempts (an essay that keeps killing
+        workers), in which case they are dead-lettered. Either way they leave
+        their Message Batch, whose late result is then ignored.
+        
+        Returns:
+            Number of requests re-queued
+        """
+        now = timezone.now()
+        expired = AssessmentRequest.objects.filter(
+            status='processing',
+            lease_expires_at__lt=now
+        )
+        
+        dead = expired.filter(attempts__gte=self.max_attempts).update(
+            status='dead_letter',
+            worker_id='',
+            lease_expires_at=None,
+            last_error_class='lease_expired',
+            batch=None,
+            updated_at=now
+        )
+        reaped = expired.update(
+            status='queued',
+            worker_id='',
+            lease_expires_at=None,
+            batch=None,
+            updated_at=now
+        )
+        
+        if reaped or dead:
+            logger.warning(
+                f"Expired leases: re-queued {reaped}, dead-lettered {dead} assessment requests"
+            )
+        
+        return reaped
+    
+    def requeue_due_retries(self) -> int:
+        """
+        Move failed requests whose ``retry_after`` has passed back to the queue.
+        
+        Returns:
+            Number of requests re-queued
+        """
+        now = timezone.now()
+        requeued = AssessmentRequest.objects.filter(
+            status='failed',
+            retry_after__lte=now
+        ).update(
+            status='queued',
+            retry_after=None,
+            updated_at=now
+        )
+        
+        if requeued:
+            logger.info(f"Re-queued {requeued} assessment requests for retry")
+        
+        return requeued
+    
+    def process_assessment_request(self, request: AssessmentRequest) -> bool:
+        """
+        Run the assessment for a claimed request and record the outcome.
+        
+        The outcome is only written while the worker still holds the lease; if
+        the lease was reaped in the meantime the request belongs to someone else.
+        
+        Args:
+            request: An AssessmentRequest claimed by claim_queued_requests
+            
+        Returns:
+            True if the assessment completed, False if it failed
+        """
+        try:
+            # Process the assessment
+            assessment = self.assess_submission(
+                request.submission, lane=QUEUE, queued_at=request.created_at, lease=request
+            )
+            self.complete_request(request, assessment)
+            return True
+            
+        except LeaseLost as e:
+            # Whoever holds the request now records its outcome
+            logger.warning(f"Abandoned assessment request {request.id}: {e}")
+            return False
+        
+        except Exception as e:
+            logger.error(f"Failed to process assessment request {request.id}: {e}")
+            self.fail_request(request, e)
+            return False
+    
+    def _leased(self, request: AssessmentRequest):
+        """Queryset matching ``request`` only while its worker still holds the lease."""
+        return AssessmentRequest.objects.filter(
+            id=request.id,
+            status='processing',
+            worker_id=request.worker_id
+        )
+    
+    def _check_lease(self, lease: Optional[AssessmentRequest]):
+        """
+        Raise LeaseLost unless the worker still holds ``lease``.
+        
+        Called first thing in the transaction that saves results. The check is
+        a conditional UPDATE, so on PostgreSQL the row stays locked (and the
+        lease reaper waits) until the results are committed.
+        """
+        if lease is None:
+            return
+        now = timezone.now()
+        if not self._leased(lease).filter(lease_expires_at__gt=now).update(updated_at=now):
+            raise LeaseLost(f"Lease lost for assessment request {lease.id}")
+    
+    def renew_leases(self, request_ids: List[int], worker_id: str, lease_seconds: Optional[int] = None) -> int:
+        """
+        Push back the lease expiry of requests a worker is still processing.
+        
+        Returns:
+            Number of leases renewed
+        """
+        if not request_ids:
+            return 0
+        now = timezone.now()
+        return AssessmentRequest.objects.filter(
+            id__in=request_ids,
+            status='processing',
+            worker_id=worker_id
+        ).update(
+            lease_expires_at=now + timedelta(seconds=lease_seconds or self.lease_seconds),
+            updated_at=now
+        )
+    
+    def complete_request(self, request: AssessmentRequest, assessment: Assessment):
+        """Mark a claimed request as completed with its assessment."""
+        updated = self._leased(request).update(
+            status='completed',
+            processing_completed_at=timezone.now(),
+            assessment=assessment,
+            lease_expires_at=None,
+            updated_at=timezone.now()
+        )
+        
+        if not updated:
+            logger.warning(f"Lease lost for assessment request {request.id} before completion")
+    
+    def fail_request(self, request: AssessmentRequest, error: Exception):
+        """Schedule a retry for a claimed request, or dead-letter it once attempts run out."""
+        error_class = classify_error(error)
+        attempts = request.attempts
+        
+        if error_class == 'client_error' or attempts >= self.max_attempts:
+            status = 'dead_letter'
+            retry_after = None
+            logger.error(
+                f"Assessment request {request.id} dead-lettered after {attempts} "
+                f"attempts ({error_class})"
+            )
+        else:
+            status = 'failed'
+            retry_after = timezone.now() + timedelta(
+                seconds=compute_retry_delay(error_class, attempts, error)
+            )
+        
+        self._leased(request).update(
+            status=status,
+            error_details=str(error),
+            last_error_class=error_class,
+            retry_after=retry_after,
+            lease_expires_at=None,
+            updated_at=timezone.now()
         )
     
     def process_assessment_queue(self, max_requests: int = 5) -> int:
-        """Process queued assessment requests."""
+        """Process queued assessment requests one at a time."""
         
         processed_count = 0
         
-        # Get queued requests ordered by priority and creation time
-        queued_requests = AssessmentRequest.objects.filter(
-            status='queued'
-        ).select_related('submission', 'submission__task').order_by(
-            '-priority', 'created_at'
-        )[:max_requests]
+        self.reap_expired_leases()
+        self.requeue_due_retries()
         
-        for request in queued_requests:
-            try:
-                # Update request status
-                request.status = 'processing'
-                request.processing_started_at = timezone.now()
-                request.save()
-                
-                # Process the assessment
-                assessment = self.assess_submission(request.submission)
-                
-                # Update request with results
-                request.status = 'completed'
-                request.processing_completed_at = timezone.now()
-                request.assessment = assessment
-                request.save()
-                
+        # Claim queued requests ordered by priority and creation time
+        for request in self.claim_queued_requests(max_requests):
+            if self.process_assessment_request(request):
                 processed_count += 1
-                
-            except Exception as e:
-                logger.error(f"Failed to process assessment request {request.id}: {e}")
-                
-                # Update request with error
-                request.status = 'failed'
-                request.error_details = str(e)
-                request.retry_after = timezone.now() + timedelta(minutes=30)
-                request.save()
         
         return processed_count
 
 
-# Service instance
-assessment_service = IELTSAssessmentService()
\ No newline at end of file
+# Service instance, created on first use so that importing this module (as
+# the URLconf does at startup) does not load the Anthropic SDK
+assessment_service = SimpleLazyObject(IELTSAssessmentService)
\ No newline at end of file
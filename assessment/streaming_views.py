@@ -3,19 +3,26 @@ Streaming assessment views for real-time Claude feedback.
 """
 
 import json
-import time
+import logging
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.http import StreamingHttpResponse, JsonResponse
-from django.shortcuts import get_object_or_404
+from django.shortcuts import aget_object_or_404, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import TemplateView
+from django.urls import reverse
 
 from practice.models import Submission
+from .metrics import metrics
 from .services import assessment_service
+from .prescorer import prescorer
 from .models import Assessment, AssessmentRequest
 
+logger = logging.getLogger(__name__)
+
 
 class StreamingAssessmentView(LoginRequiredMixin, TemplateView):
     """View for real-time streaming assessment."""
@@ -33,14 +40,63 @@ class StreamingAssessmentView(LoginRequiredMixin, TemplateView):
         )
         
         context['submission'] = submission
+        
+        # Point the browser at the ASGI endpoint when that deployment is enabled
+        stream_view = 'assessment:stream_async' if settings.ASSESSMENT_ASYNC_STREAMING else 'assessment:stream'
+        context['stream_url'] = reverse(stream_view, args=[submission.id])
         return context
 
 
+CRITERION_LABELS = {
+    'overall_score': 'Overall band',
+    'task_achievement': 'Task achievement',
+    'coherence_cohesion': 'Coherence and cohesion',
+    'lexical_resource': 'Lexical resource',
+    'grammar_accuracy': 'Grammatical range and accuracy',
+}
+
+
+def sse_event(data):
+    """Format a dict as a Server-Sent Events message."""
+    return f"data: {json.dumps(data)}\n\n"
+
+
+def provisional_scores(submission):
+    """
+    Instant local band estimate shown while Claude assesses.
+    
+    Returns the prescorer's bands plus its runtime, or None when the
+    prescorer is disabled or fails (it must never hold up the assessment).
+    """
+    if not getattr(settings, 'ASSESSMENT_PRESCORER_ENABLED', True):
+        return None
+    try:
+        result = prescorer.prescore(submission)
+    except Exception as e:
+        logger.error(f"Prescorer failed for submission {submission.id}: {e}")
+        return None
+    return {**result['bands'], 'elapsed_ms': result['elapsed_ms']}
+
+
+def progress_percentage(event):
+    """Map streamed section progress onto the 10-95% band of the progress bar."""
+    return 10 + int(85 * event['sections_done'] / event['sections_total'])
+
+
+def progress_message(event):
+    """Human-readable progress line for a streamed assessment event."""
+    if event['type'] == 'score':
+        label = CRITERION_LABELS.get(event['criterion'], event['criterion'])
+        return f"{label}: {event['score']}"
+    return f"Feedback ready: {event['title'] or event['feedback_type']}"
+
+
 @login_required
 def stream_assessment(request, submission_id):
     """Stream Claude assessment in real-time."""
     
     def generate_assessment_stream():
+        metrics.sse_opened()
         try:
             submission = get_object_or_404(
                 Submission,
@@ -50,68 +106,66 @@ def stream_assessment(request, submission_id):
             )
             
             # Send initial status
-            yield f"data: {json.dumps({'type': 'status', 'message': 'Starting AI assessment...'})}\n\n"
-            time.sleep(1)
+            yield sse_event({'type': 'status', 'message': 'Starting AI assessment...'})
             
             # Check if assessment already exists
             existing_assessment = Assessment.objects.filter(submission=submission).first()
             if existing_assessment and existing_assessment.status == 'completed':
-                yield f"data: {json.dumps({'type': 'complete', 'assessment_id': existing_assessment.id, 'redirect': f'/assessment/submission/{submission_id}/'})}\n\n"
+                yield sse_event({
+                    'type': 'complete',
+                    'assessment_id': existing_assessment.id,
+                    'redirect': f'/assessment/submission/{submission_id}/'
+                })
                 return
             
-            # Create assessment request if needed
-            yield f"data: {json.dumps({'type': 'status', 'message': 'Connecting to Claude AI...'})}\n\n"
-            time.sleep(1)
-            
-            # Start assessment process
-            yield f"data: {json.dumps({'type': 'status', 'message': 'Claude is analyzing your writing...'})}\n\n"
+            # Show a provisional estimate right away; Claude's scores replace it
+            provisional = provisional_scores(submission)
+            if provisional:
+                yield sse_event({'type': 'provisional', **provisional})
             
-            # Simulate progress updates (in real implementation, you'd hook into the actual assessment)
-            progress_messages = [
-                'Analyzing task achievement...',
-                'Evaluating coherence and cohesion...',
-                'Checking lexical resource...',
-                'Assessing grammatical accuracy...',
-                'Generating detailed feedback...',
-                'Finalizing assessment...'
-            ]
+            yield sse_event({'type': 'status', 'message': 'Claude is analyzing your writing...'})
             
-            for i, message in enumerate(progress_messages):
-                yield f"data: {json.dumps({'type': 'progress', 'message': message, 'percentage': (i + 1) * 15})}\n\n"
-                time.sleep(2)  # Simulate processing time
-            
-            # Process the actual assessment
-            assessment = assessment_service.assess_submission(submission)
+            # Relay progress as each section of Claude's response is completed
+            assessment = None
+            for event in assessment_service.stream_submission(submission):
+                if event['type'] == 'assessment':
+                    assessment = event['assessment']
+                    continue
+                
+                yield sse_event({
+                    'type': 'progress',
+                    'message': progress_message(event),
+                    'percentage': progress_percentage(event)
+                })
             
             # Send completion with scores
-            yield f"data: {json.dumps({
+            yield sse_event({
                 'type': 'scores',
                 'overall_score': float(assessment.overall_band_score),
                 'task_achievement': float(assessment.task_achievement_score),
                 'coherence_cohesion': float(assessment.coherence_cohesion_score),
                 'lexical_resource': float(assessment.lexical_resource_score),
                 'grammar_accuracy': float(assessment.grammar_accuracy_score)
-            })}\n\n"
-            
-            time.sleep(1)
+            })
             
             # Send final completion
-            yield f"data: {json.dumps({
+            yield sse_event({
                 'type': 'complete',
                 'message': 'Assessment completed successfully!',
                 'assessment_id': assessment.id,
                 'redirect': f'/assessment/submission/{submission_id}/'
-            })}\n\n"
+            })
             
         except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+            yield sse_event({'type': 'error', 'message': str(e)})
+        finally:
+            metrics.sse_closed()
     
     response = StreamingHttpResponse(
         generate_assessment_stream(),
         content_type='text/event-stream'
     )
     response['Cache-Control'] = 'no-cache'
-    response['Connection'] = 'keep-alive'
     return response
 
 
@@ -139,12 +193,153 @@ def quick_assess(request, submission_id):
             })
         
         # Process assessment
+        provisional = provisional_scores(submission)
         assessment = assessment_service.assess_submission(submission)
         
         return JsonResponse({
             'status': 'completed',
             'assessment_id': assessment.id,
             'overall_score': float(assessment.overall_band_score),
+            'provisional': provisional,
+            'processing_time': assessment.processing_time_seconds,
+            'redirect_url': f'/assessment/submission/{submission_id}/'
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'status': 'error',
+            'error': str(e)
+        }, status=500)
+
+
+@login_required
+def prescore(request, submission_id):
+    """
+    Provisional band estimate from the local prescorer.
+    
+    Answers in milliseconds, so clients of quick_assess can show it while
+    that request waits on Claude.
+    """
+    submission = get_object_or_404(
+        Submission.objects.select_related('task'),
+        id=submission_id,
+        user=request.user
+    )
+    
+    provisional = provisional_scores(submission)
+    if provisional is None:
+        return JsonResponse({'status': 'unavailable'}, status=503)
+    
+    return JsonResponse({'status': 'provisional', **provisional})
+
+
+# Async versions for the ASGI deployment. These await the Anthropic async
+# client, so an open SSE connection holds an event-loop task instead of a
+# whole WSGI worker.
+
+@login_required
+async def async_stream_assessment(request, submission_id):
+    """Stream Claude assessment in real-time (ASGI)."""
+    user = await request.auser()
+    
+    async def generate_assessment_stream():
+        metrics.sse_opened()
+        try:
+            submission = await aget_object_or_404(
+                Submission.objects.select_related('task'),
+                id=submission_id,
+                user=user,
+                status='submitted'
+            )
+            
+            yield sse_event({'type': 'status', 'message': 'Starting AI assessment...'})
+            
+            existing_assessment = await Assessment.objects.filter(submission=submission).afirst()
+            if existing_assessment and existing_assessment.status == 'completed':
+                yield sse_event({
+                    'type': 'complete',
+                    'assessment_id': existing_assessment.id,
+                    'redirect': f'/assessment/submission/{submission_id}/'
+                })
+                return
+            
+            provisional = provisional_scores(submission)
+            if provisional:
+                yield sse_event({'type': 'provisional', **provisional})
+            
+            yield sse_event({'type': 'status', 'message': 'Claude is analyzing your writing...'})
+            
+            assessment = None
+            async for event in assessment_service.astream_submission(submission):
+                if event['type'] == 'assessment':
+                    assessment = event['assessment']
+                    continue
+                
+                yield sse_event({
+                    'type': 'progress',
+                    'message': progress_message(event),
+                    'percentage': progress_percentage(event)
+                })
+            
+            yield sse_event({
+                'type': 'scores',
+                'overall_score': float(assessment.overall_band_score),
+                'task_achievement': float(assessment.task_achievement_score),
+                'coherence_cohesion': float(assessment.coherence_cohesion_score),
+                'lexical_resource': float(assessment.lexical_resource_score),
+                'grammar_accuracy': float(assessment.grammar_accuracy_score)
+            })
+            
+            yield sse_event({
+                'type': 'complete',
+                'message': 'Assessment completed successfully!',
+                'assessment_id': assessment.id,
+                'redirect': f'/assessment/submission/{submission_id}/'
+            })
+            
+        except Exception as e:
+            yield sse_event({'type': 'error', 'message': str(e)})
+        finally:
+            metrics.sse_closed()
+    
+    response = StreamingHttpResponse(
+        generate_assessment_stream(),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+@login_required
+async def async_quick_assess(request, submission_id):
+    """Quick non-streaming assessment endpoint (ASGI)."""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    
+    try:
+        submission = await aget_object_or_404(
+            Submission.objects.select_related('task'),
+            id=submission_id,
+            user=await request.auser(),
+            status='submitted'
+        )
+        
+        existing_assessment = await Assessment.objects.filter(submission=submission).afirst()
+        if existing_assessment and existing_assessment.status == 'completed':
+            return JsonResponse({
+                'status': 'already_completed',
+                'assessment_id': existing_assessment.id,
+                'redirect_url': f'/assessment/submission/{submission_id}/'
+            })
+        
+        provisional = provisional_scores(submission)
+        assessment = await assessment_service.aassess_submission(submission)
+        
+        return JsonResponse({
+            'status': 'completed',
+            'assessment_id': assessment.id,
+            'overall_score': float(assessment.overall_band_score),
+            'provisional': provisional,
             'processing_time': assessment.processing_time_seconds,
             'redirect_url': f'/assessment/submission/{submission_id}/'
         })
@@ -153,4 +348,4 @@ def quick_assess(request, submission_id):
         return JsonResponse({
             'status': 'error',
             'error': str(e)
-        }, status=500)
\ No newline at end of file
+        }, status=500)
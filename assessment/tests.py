@@ -1,3 +1,417 @@
-from django.test import TestCase
+import os
+import json
+import shutil
+import subprocess
+import tempfile
+import threading
+from collections import defaultdict
+from datetime import timedelta
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from practice.models import PracticeTask, Submission, Topic
+from .batches import AssessmentBatchProcessor
+from .counters import SharedCounters
+from .models import Assessment, AssessmentRequest
+from .parsing import AssessmentStreamParser
+from .prescorer import DEFAULT_MODEL, PreScorer
+from .ratelimit import RateLimitTimeout, TokenBucketLimiter
+from .schema import ToolInputError
+from .services import IELTSAssessmentService
+from .workers import AssessmentWorkerPool
+
+ESSAY = (
+    'Some people believe that universities should focus on practical skills. '
+    'Others argue that academic knowledge matters more for society in the long run. '
+) * 20
+
+
+def make_submissions(count, username='student'):
+    """Submitted Task 2 essays of one user, ready to be queued."""
+    user = get_user_model().objects.create(username=username)
+    topic, _ = Topic.objects.get_or_create(name='Education', slug='education')
+    task, _ = PracticeTask.objects.get_or_create(
+        task_code='AC_T2_TEST',
+        defaults={
+            'title': 'Universities', 'module_type': 'academic', 'task_number': 2,
+            'instruction': 'Write at least 250 words.', 'prompt': 'Discuss both views.',
+            'topic': topic, 'word_limit_min': 250, 'word_limit_max': 350,
+        }
+    )
+    return [
+        Submission.objects.create(
+            user=user, task=task, content=f'Essay {i}. {ESSAY}',
+            word_count=len(ESSAY.split()) + 2, status='submitted'
+        )
+        for i in range(count)
+    ]
+
+
+class PreScorerSpellingTests(SimpleTestCase):
+
+    CLEAN = (
+        "Proponents of large construction projects argue that new motorways stimulate growth, "
+        "whereas critics emphasise the emissions of carbon dioxide. The government's decision to "
+        "prioritise renewable energy in city centres has benefited neighbourhoods. It's clear that "
+        "London and Manchester have recognised the consequences of urbanisation."
+    )
+    
+    def test_correct_british_and_american_spellings_are_known(self):
+        features = PreScorer().extract_features(self.CLEAN)
+        self.assertEqual(features['misspelled'], [])
+        self.assertEqual(features['spelling_error_rate'], 0.0)
+    
+    def test_misspellings_are_counted_and_cost_lexical_band(self):
+        scorer = PreScorer()
+        misspelt = self.CLEAN.replace('government', 'goverment').replace('consequences', 'consequenses')
+        features = scorer.extract_features(misspelt)
+        self.assertEqual(features['misspelled'], ['consequenses', "goverment's"])
+        self.assertGreater(features['spelling_error_rate'], 0.0)
+        self.assertIn('Words not in dictionary', scorer.prompt_summary(features))
+        self.assertLess(
+            scorer.design_vector(features)['spelling'] * DEFAULT_MODEL['lexical_resource']['spelling'], 0
+        )
+    
+    def test_fitted_model_keeps_spelling_weights(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'prescorer_model.json')
+        with open(path, 'w', encoding='utf-8') as model_file:
+            json.dump({'weights': DEFAULT_MODEL}, model_file)
+        
+        with override_settings(ASSESSMENT_PRESCORER_MODEL=path):
+            model = PreScorer().model
+        self.assertEqual(model['lexical_resource']['spelling'], DEFAULT_MODEL['lexical_resource']['spelling'])
+
+
+class TokenBucketLimiterTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.limiter = TokenBucketLimiter(os.path.join(directory, 'ratelimit.json'), rpm=0, itpm=0, otpm=8000)
+    
+    def call(self, output_tokens, max_tokens=4000):
+        reservation = self.limiter.acquire(100, max_tokens, timeout=0)
+        reservation.usage = SimpleNamespace(input_tokens=100, output_tokens=output_tokens)
+        self.limiter.settle(reservation)
+        return reservation
+    
+    def test_output_is_reserved_at_the_recent_mean_not_max_tokens(self):
+        # Nothing known yet about calls with this max_tokens
+        self.assertEqual(self.call(1500).output_tokens, 4000)
+        
+        # 1500 used, reserved with a 25% margin: four calls fit in 8000 OTPM where max_tokens allowed two
+        held = [self.limiter.acquire(100, 4000, timeout=0) for _ in range(3)]
+        self.assertEqual([reservation.output_tokens for reservation in held], [1875] * 3)
+        with self.assertRaises(RateLimitTimeout):
+            self.limiter.acquire(100, 4000, timeout=0)
+    
+    def test_settle_charges_output_beyond_the_estimate(self):
+        self.call(1500)
+        level = self.limiter.stats()['buckets']['otpm']['available']
+        
+        reservation = self.call(3000)
+        self.assertEqual(reservation.output_tokens, 1875)
+        self.assertAlmostEqual(self.limiter.stats()['buckets']['otpm']['available'], level - 3000, delta=5)
+        self.assertEqual(self.limiter.stats()['output_estimates'], {'4000': 1800.0})
+
+
+class SharedCountersTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.counters = SharedCounters(os.path.join(directory, 'counters.json'), flush_interval=3600)
+    
+    def test_increments_reach_the_file_on_flush(self):
+        self.counters.incr_many({'requests': 1, 'sum_ms': 40})
+        self.counters.incr('requests')
+        self.assertFalse(os.path.exists(self.counters.path))
+        
+        self.counters.flush()
+        self.assertEqual(SharedCounters(self.counters.path).values(), {'requests': 2, 'sum_ms': 40})
+    
+    def test_gauge_ignores_processes_that_died(self):
+        process = subprocess.Popen(['true'])
+        process.wait()
+        dead_pid = process.pid
+        with self.counters._state() as state:
+            state[f'sse@{dead_pid}'] = 3
+        self.assertEqual(self.counters.gauge('sse'), 0)
+        
+        # A previous process with this PID left a value behind
+        with self.counters._state() as state:
+            state[f'sse@{os.getpid()}'] = 5
+        self.counters.adjust_gauge('sse', 1)
+        self.counters.adjust_gauge('sse', 1)
+        self.counters.adjust_gauge('sse', -1)
+        values = self.counters.values()
+        self.assertEqual(self.counters.gauge('sse', values), 1)
+        self.assertNotIn(f'sse@{dead_pid}', values)
+
+
+class StructuredOutputTests(TestCase):
+    """The record_assessment tool mode: prompts and schema checks."""
+    
+    FEEDBACK = [
+        {'type': feedback_type, 'title': 'Title', 'content': 'Content', 'severity': 'info'}
+        for feedback_type in ('overall', 'task_achievement', 'coherence_cohesion', 'lexical_resource',
+                              'grammar_accuracy', 'suggestion')
+    ]
+    
+    def setUp(self):
+        with override_settings(ASSESSMENT_SCORING_BACKEND='local', ASSESSMENT_STRUCTURED_OUTPUT=True):
+            self.service = IELTSAssessmentService()
+        self.submission, = make_submissions(1)
+    
+    def parse(self, **tool_input):
+        parser = AssessmentStreamParser()
+        parser.feed(json.dumps({
+            'overall_score': 6.5, 'task_achievement': 6.5, 'coherence_cohesion': 7.0, 'lexical_resource': 6.0,
+            'grammar_accuracy': 6.5, 'confidence': 0.8, 'feedback': self.FEEDBACK, **tool_input
+        }))
+        return self.service._parsed_result(self.submission, parser)
+    
+    def test_tool_mode_prompts_do_not_ask_for_json(self):
+        params = self.service._build_message_params(self.submission)
+        self.assertEqual(params['tools'][0]['name'], 'record_assessment')
+        self.assertNotIn('JSON', params['system'][0]['text'])
+        
+        criterion_params = self.service._build_criterion_params(self.submission, 'lexical_resource')
+        self.assertEqual(criterion_params['system'], params['system'])
+        self.assertNotIn('JSON', criterion_params['messages'][0]['content'][1]['text'])
+        
+        salvage_params = self.service._build_message_params(self.submission, structured=False)
+        self.assertNotIn('tools', salvage_params)
+        self.assertIn('Provide only the JSON response', salvage_params['system'][0]['text'])
+    
+    def test_valid_tool_input_is_accepted(self):
+        assessment_data = self.parse()
+        self.assertEqual(str(assessment_data['overall_score']), '6.5')
+        self.assertEqual(len(assessment_data['feedback']), 6)
+    
+    def test_tool_input_breaking_the_schema_is_rejected(self):
+        with self.assertRaises(ToolInputError) as raised:
+            self.parse(overall_score=6.3, lexical_resource=10)
+        self.assertEqual(len(raised.exception.errors), 2)
+        
+        with self.assertRaises(ToolInputError):
+            self.parse(feedback=[{**self.FEEDBACK[0], 'severity': 'fatal'}])
+        with self.assertRaises(ToolInputError):
+            self.service._parse_criterion(
+                self.submission, 'grammar_accuracy',
+                json.dumps({'grammar_accuracy': 9.5, 'confidence': 0.8, 'feedback': self.FEEDBACK[4:5]})
+            )
+
+
+class BatchProcessorTests(TestCase):
+    """Message Batches mode against the local scoring engine's offline batches."""
+    
+    def setUp(self):
+        self.batch_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.batch_dir, ignore_errors=True)
+    
+    def make_processor(self, **options):
+        local_options = {'batch_dir': self.batch_dir, 'batch_duration': 0, 'seed': 1, **options}
+        with override_settings(ASSESSMENT_SCORING_BACKEND='local', ASSESSMENT_LOCAL_BACKEND=local_options):
+            service = IELTSAssessmentService()
+        return AssessmentBatchProcessor(service)
+    
+    def queue(self, processor, count):
+        return [processor.service.create_assessment_request(submission) for submission in make_submissions(count)]
+    
+    def test_submit_and_collect_succeeded_results(self):
+        processor = self.make_processor()
+        requests = self.queue(processor, 3)
+        
+        record = processor.submit()
+        self.assertEqual(record.request_count, 3)
+        self.assertEqual(
+            set(AssessmentRequest.objects.filter(batch=record).values_list('id', flat=True)),
+            {request.id for request in requests}
+        )
+        
+        self.assertEqual(processor.collect(), 3)
+        record.refresh_from_db()
+        self.assertEqual(record.status, 'collected')
+        self.assertEqual(record.succeeded_count, 3)
+        for request in requests:
+            request.refresh_from_db()
+            self.assertEqual(request.status, 'completed')
+            self.assertEqual(request.assessment.status, 'completed')
+            self.assertIsNotNone(request.assessment.overall_band_score)
+            self.assertEqual(request.assessment.ai_model_used, f'{processor.service.model} (batch)')
+            self.assertTrue(request.assessment.feedback_items.exists())
+            self.assertEqual(request.submission.status, 'assessed')
+    
+    def test_errored_result_is_retried(self):
+        processor = self.make_processor(rate_limit_rate=1.0)
+        request, = self.queue(processor, 1)
+        
+        processor.submit()
+        self.assertEqual(processor.collect(), 0)
+        
+        request.refresh_from_db()
+        self.assertEqual(request.status, 'failed')
+        self.assertEqual(request.last_error_class, 'rate_limit')
+        self.assertIsNotNone(request.retry_after)
+    
+    @override_settings(ASSESSMENT_MAX_ATTEMPTS=1)
+    def test_errored_result_is_dead_lettered_after_last_attempt(self):
+        processor = self.make_processor(rate_limit_rate=1.0)
+        request, = self.queue(processor, 1)
+        
+        processor.submit()
+        processor.collect()
+        
+        request.refresh_from_db()
+        self.assertEqual(request.status, 'dead_letter')
+        self.assertIsNone(request.retry_after)
+    
+    def test_collect_leaves_in_progress_batch_alone(self):
+        processor = self.make_processor(batch_duration=3600)
+        request, = self.queue(processor, 1)
+        
+        record = processor.submit()
+        self.assertEqual(processor.collect(), 0)
+        
+        record.refresh_from_db()
+        request.refresh_from_db()
+        self.assertEqual(record.status, 'in_progress')
+        self.assertIsNone(record.collected_at)
+        self.assertEqual(request.status, 'processing')
+        self.assertEqual(request.batch, record)
+    
+    def test_batch_lease_outlives_interactive_reaper(self):
+        processor = self.make_processor(batch_duration=3600)
+        request, = self.queue(processor, 1)
+        
+        processor.submit()
+        processor.service.reap_expired_leases()
+        
+        request.refresh_from_db()
+        self.assertEqual(request.status, 'processing')
+        self.assertGreater(request.lease_expires_at, timezone.now() + timedelta(hours=24))
+    
+    def test_lease_expiring_before_collection_drops_the_batch_result(self):
+        processor = self.make_processor()
+        request, = self.queue(processor, 1)
+        record = processor.submit()
+        
+        # The lease runs out inside the batch window: the request is re-queued
+        # and taken by an interactive worker before the batch is collected
+        AssessmentRequest.objects.filter(id=request.id).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        processor.service.reap_expired_leases()
+        request.refresh_from_db()
+        self.assertEqual(request.status, 'queued')
+        self.assertIsNone(request.batch)
+        
+        claimed, = processor.service.claim_queued_requests(1, worker_id='interactive-worker')
+        self.assertEqual(processor.collect(), 0)
+        
+        claimed.refresh_from_db()
+        self.assertEqual(claimed.status, 'processing')
+        self.assertEqual(claimed.worker_id, 'interactive-worker')
+        self.assertFalse(Assessment.objects.filter(submission=claimed.submission, status='completed').exists())
+        record.refresh_from_db()
+        self.assertEqual(record.status, 'collected')
+
+
+class QueueConcurrencyTests(TransactionTestCase):
+    """
+    Many threads, released together by a barrier, queue the same essays (as
+    double-clicks and the submit and detail views racing each other do) while
+    claiming the queue like daemons. Runs on real transactions, so the
+    unique_active_assessment_request constraint and the conditional UPDATE
+    claim are what keep the rows straight.
+    """
+    
+    threads = 8
+    submissions = 10
+    rounds = 3
+    
+    def test_concurrent_requests_and_claims(self):
+        service = IELTSAssessmentService()
+        submissions = make_submissions(self.submissions)
+        
+        for round_number in range(self.rounds):
+            barrier = threading.Barrier(self.threads)
+            lock = threading.Lock()
+            returned = defaultdict(set)
+            claims = defaultdict(list)
+            errors = []
+            
+            def racer(offset):
+                try:
+                    barrier.wait()
+                    # Threads walk the submissions from different starting points
+                    for i in range(self.submissions):
+                        submission = submissions[(i + offset) % self.submissions]
+                        request = service.create_assessment_request(submission)
+                        claimed = service.claim_queued_requests(2, worker_id=f'worker-{offset}')
+                        with lock:
+                            returned[submission.id].add(request.id)
+                            for claimed_request in claimed:
+                                claims[claimed_request.id].append(offset)
+                except Exception as e:
+                    with lock:
+                        errors.append(repr(e))
+                finally:
+                    close_old_connections()
+            
+            threads = [threading.Thread(target=racer, args=(n,)) for n in range(self.threads)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            
+            self.assertEqual(errors, [], f'round {round_number}')
+            for submission in submissions:
+                active = AssessmentRequest.objects.filter(
+                    submission=submission, status__in=AssessmentRequest.ACTIVE_STATUSES
+                )
+                self.assertEqual(active.count(), 1, f'round {round_number}, submission {submission.id}')
+                self.assertEqual(returned[submission.id], {active.get().id})
+            
+            double_claims = {request_id: workers for request_id, workers in claims.items() if len(workers) > 1}
+            self.assertEqual(double_claims, {}, f'round {round_number}')
+            for request in AssessmentRequest.objects.filter(id__in=claims):
+                self.assertEqual(request.status, 'processing')
+                self.assertEqual(request.attempts, 1)
+                self.assertEqual(request.worker_id, f'worker-{claims[request.id][0]}')
+            
+            # Finish this round's requests so the next round queues new ones
+            AssessmentRequest.objects.filter(
+                status__in=AssessmentRequest.ACTIVE_STATUSES
+            ).update(status='completed')
+        
+        self.assertEqual(AssessmentRequest.objects.count(), self.rounds * self.submissions)
+
+
+class WorkerPoolTests(TransactionTestCase):
+
+    @override_settings(
+        ASSESSMENT_SCORING_BACKEND='local', ASSESSMENT_LOCAL_BACKEND={'latency': 0.9, 'seed': 1},
+        ASSESSMENT_LEASE_SECONDS=0.6
+    )
+    def test_heartbeat_keeps_leases_of_assessments_longer_than_the_lease(self):
+        service = IELTSAssessmentService()
+        requests = [service.create_assessment_request(submission) for submission in make_submissions(8)]
+        
+        # The heartbeat renews every 0.2s while the pool claims and reaps around it
+        pool = AssessmentWorkerPool(service, concurrency=4)
+        try:
+            self.assertEqual(pool.run_once(len(requests)), len(requests))
+        finally:
+            pool.shutdown()
+        
+        self.assertEqual(
+            AssessmentRequest.objects.filter(id__in=[request.id for request in requests], status='completed').count(),
+            len(requests)
+        )
+        self.assertEqual(sum(stats['failed'] for stats in pool.throughput_report().values()), 0)
@@ -0,0 +1,151 @@
+"""
+Per-stage latency instrumentation for assessments.
+
+StageTimer collects monotonic durations for each stage of one assessment:
+
+- ``queue_wait``: from AssessmentRequest.created_at until scoring starts
+- ``prompt_build``: building the Messages API parameters
+- ``time_to_first_token``: from sending the first call until the first
+  streamed token (streaming paths only: a non-streamed response arrives all
+  at once, so queued assessments have none)
+- ``generation``: the rest of the Claude calls, escalations included
+- ``parse``: parsing the response, including any salvage re-request
+- ``persist``: saving scores and feedback
+
+They are stored on the Assessment in milliseconds (``<stage>_ms``) along
+with the input and output token counts. ``latency_report()`` aggregates
+them into p50/p95/p99 for the admin latency view and the
+``assessment_latency`` management command, over all assessments or only
+the streamed or queued ones.
+"""
+
+import math
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from django.utils import timezone
+
+STAGES = ('queue_wait', 'prompt_build', 'time_to_first_token', 'generation', 'parse', 'persist')
+STAGE_FIELDS = [f'{stage}_ms' for stage in STAGES]
+TOKEN_FIELDS = ['input_tokens', 'output_tokens', 'cache_creation_input_tokens', 'cache_read_input_tokens']
+PERCENTILES = (50, 95, 99)
+
+# Assessments a latency report covers: queued ones were scored by the queue
+# daemon or batch mode, streamed ones by the streaming views
+REPORT_PATHS = ('all', 'streamed', 'queued')
+
+
+class StageTimer:
+    """Durations of the stages of one assessment; see the module docstring."""
+    
+    def __init__(self, queued_at: Optional[datetime] = None):
+        self.durations = {}
+        if queued_at is not None:
+            self.durations['queue_wait'] = max(0.0, (timezone.now() - queued_at).total_seconds())
+        self._first_token_at = None
+    
+    def add(self, stage: str, seconds: float):
+        self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+    
+    @contextmanager
+    def stage(self, stage: str):
+        """Add the time spent in the block to ``stage``."""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(stage, time.monotonic() - started)
+    
+    @contextmanager
+    def generation(self):
+        """
+        Time a Claude call.
+        
+        If ``first_token()`` is called inside the block, the wait until then
+        is recorded as time to first token (for the first call only, which
+        is what the student waited for) and the remainder as generation.
+        """
+        started = time.monotonic()
+        self._first_token_at = None
+        try:
+            yield
+        finally:
+            ended = time.monotonic()
+            if self._first_token_at is not None and 'time_to_first_token' not in self.durations:
+                self.add('time_to_first_token', self._first_token_at - started)
+                self.add('generation', ended - self._first_token_at)
+            else:
+                self.add('generation', ended - started)
+    
+    def first_token(self):
+        """Mark the arrival of a streamed token in the current generation() block."""
+        if self._first_token_at is None:
+            self._first_token_at = time.monotonic()
+    
+    def milliseconds(self, stage: str) -> Optional[int]:
+        seconds = self.durations.get(stage)
+        return None if seconds is None else int(round(seconds * 1000))
+    
+    def as_fields(self) -> Dict[str, Optional[int]]:
+        """Assessment field values for every stage except persist (timed while saving)."""
+        return {f'{stage}_ms': self.milliseconds(stage) for stage in STAGES if stage != 'persist'}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    rank = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+def latency_report(queryset, limit: int = 10000, path: str = 'all') -> Dict[str, Dict]:
+    """
+    p50/p95/p99, mean and count of each stage and token field.
+    
+    Aggregated in Python over the ``limit`` most recent completed
+    assessments of ``queryset``, as SQLite has no percentile function.
+    ``total_ms`` is the sum of the recorded stages of each assessment.
+    
+    Args:
+        queryset: Assessments to report on
+        limit: Most recent assessments to aggregate
+        path: One of REPORT_PATHS; the queued report has no time to first token
+    
+    Returns:
+        {field: {'count', 'mean', 'p50', 'p95', 'p99'}} for fields with data
+    """
+    stage_fields = STAGE_FIELDS
+    if path == 'streamed':
+        queryset = queryset.filter(time_to_first_token_ms__isnull=False)
+    elif path == 'queued':
+        queryset = queryset.filter(queue_wait_ms__isnull=False)
+        stage_fields = [field for field in STAGE_FIELDS if field != 'time_to_first_token_ms']
+    fields = stage_fields + TOKEN_FIELDS
+    
+    rows = list(
+        queryset.filter(status='completed')
+        .order_by('-completed_at')
+        .values_list(*fields)[:limit]
+    )
+    
+    columns = {field: [] for field in ['total_ms'] + fields}
+    for row in rows:
+        stages = [value for value in row[:len(stage_fields)] if value is not None]
+        if stages:
+            columns['total_ms'].append(sum(stages))
+        for field, value in zip(fields, row):
+            if value is not None:
+                columns[field].append(value)
+    
+    report = {}
+    for field, values in columns.items():
+        if not values:
+            continue
+        values.sort()
+        report[field] = {
+            'count': len(values),
+            'mean': round(sum(values) / len(values), 1),
+            **{f'p{pct}': percentile(values, pct) for pct in PERCENTILES},
+        }
+    return report
@@ -18,6 +18,11 @@ urlpatterns = [
     path('streaming/<int:submission_id>/', streaming_views.StreamingAssessmentView.as_view(), name='streaming'),
     path('stream/<int:submission_id>/', streaming_views.stream_assessment, name='stream'),
     path('quick/<int:submission_id>/', streaming_views.quick_assess, name='quick'),
+    path('prescore/<int:submission_id>/', streaming_views.prescore, name='prescore'),
+    
+    # Async streaming assessment (served by the ASGI workers)
+    path('stream-async/<int:submission_id>/', streaming_views.async_stream_assessment, name='stream_async'),
+    path('quick-async/<int:submission_id>/', streaming_views.async_quick_assess, name='quick_async'),
     
     # AJAX endpoints
     path('request/<int:submission_id>/', views.request_assessment, name='request'),
@@ -2,14 +2,18 @@
 Assessment views for displaying AI feedback and results.
 """
 
+import hmac
+
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import DetailView, ListView
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse
 from django.utils import timezone
 
 from practice.models import Submission
+from .metrics import metrics
 from .models import Assessment, Feedback, AssessmentRequest
 from .services import assessment_service
 
@@ -248,3 +252,19 @@ def assessment_status(request, submission_id):
         return JsonResponse({
             'error': str(e)
         }, status=500)
+
+
+def metrics_view(request):
+    """Prometheus metrics, protected by a METRICS_AUTH_TOKEN bearer token."""
+    if not getattr(settings, 'ASSESSMENT_METRICS_ENABLED', True):
+        raise Http404
+    
+    token = getattr(settings, 'METRICS_AUTH_TOKEN', '')
+    if not token:
+        # Queue depths and error rates are not public; set a token to scrape
+        return HttpResponse('Metrics need METRICS_AUTH_TOKEN to be set', status=403, content_type='text/plain')
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not hmac.compare_digest(supplied.encode(), token.encode()):
+        return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,153 @@
+"""
+Event-driven wakeup for the assessment queue daemon.
+
+On PostgreSQL, enqueueing sends ``NOTIFY assessment_queue`` and daemons on any
+host ``LISTEN`` for it. On SQLite, each daemon binds a Unix datagram socket in
+``ASSESSMENT_QUEUE_SOCKET_DIR`` and enqueueing sends a byte to every socket
+there. Either way a missed wakeup only costs one poll interval, because the
+daemon still falls back to polling with backoff.
+"""
+
+import os
+import glob
+import select
+import socket
+import logging
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'assessment_queue'
+
+
+def _socket_dir() -> str:
+    return str(getattr(settings, 'ASSESSMENT_QUEUE_SOCKET_DIR', settings.BASE_DIR / 'run'))
+
+
+def notify_queue():
+    """
+    Wake idle queue daemons. Never raises.
+    
+    Call this after the enqueueing transaction commits, e.g. via
+    ``transaction.on_commit(notify_queue)``.
+    """
+    try:
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'NOTIFY {CHANNEL}')
+        else:
+            _notify_sockets()
+    except Exception as e:
+        logger.warning(f"Failed to notify assessment queue: {e}")
+
+
+def _notify_sockets():
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    try:
+        for path in glob.glob(os.path.join(_socket_dir(), 'worker-*.sock')):
+            try:
+                sock.sendto(b'1', path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Left behind by a daemon that did not shut down cleanly
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            except BlockingIOError:
+                # The daemon's buffer already holds an unread wakeup
+                pass
+    finally:
+        sock.close()
+
+
+class QueueListener:
+    """
+    Blocks a queue daemon until new work is announced, a timeout passes or
+    ``poke()`` is called (from a finishing worker thread or a signal handler).
+    """
+    
+    def __init__(self):
+        self._pg_connection = None
+        self._socket = None
+        self._socket_path = None
+        self._wake_read, self._wake_write = os.pipe()
+        os.set_blocking(self._wake_read, False)
+        os.set_blocking(self._wake_write, False)
+    
+    def start(self):
+        """Subscribe to queue notifications."""
+        if connection.vendor == 'postgresql':
+            # A dedicated connection so LISTEN survives Django's connection recycling
+            self._pg_connection = connection.get_new_connection(connection.get_connection_params())
+            self._pg_connection.autocommit = True
+            with self._pg_connection.cursor() as cursor:
+                cursor.execute(f'LISTEN {CHANNEL}')
+        else:
+            socket_dir = _socket_dir()
+            os.makedirs(socket_dir, exist_ok=True)
+            self._socket_path = os.path.join(socket_dir, f'worker-{os.getpid()}.sock')
+            if os.path.exists(self._socket_path):
+                os.unlink(self._socket_path)
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._socket.bind(self._socket_path)
+            self._socket.setblocking(False)
+    
+    def wait(self, timeout: float) -> bool:
+        """
+        Wait up to ``timeout`` seconds for a wakeup.
+        
+        Returns:
+            True if woken by a notification or poke, False on timeout
+        """
+        readers = [self._wake_read]
+        if self._pg_connection is not None:
+            readers.append(self._pg_connection)
+        if self._socket is not None:
+            readers.append(self._socket)
+        
+        readable, _, _ = select.select(readers, [], [], timeout)
+        self._drain()
+        return bool(readable)
+    
+    def poke(self):
+        """Interrupt a pending wait(). Safe to call from threads and signal handlers."""
+        try:
+            os.write(self._wake_write, b'1')
+        except OSError:
+            # Pipe full (a wakeup is already pending) or listener closed
+            pass
+    
+    def close(self):
+        if self._pg_connection is not None:
+            self._pg_connection.close()
+            self._pg_connection = None
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+            try:
+                os.unlink(self._socket_path)
+            except OSError:
+                pass
+        os.close(self._wake_read)
+        os.close(self._wake_write)
+    
+    def _drain(self):
+        try:
+            while os.read(self._wake_read, 512):
+                pass
+        except BlockingIOError:
+            pass
+        
+        if self._pg_connection is not None:
+            self._pg_connection.poll()
+            self._pg_connection.notifies.clear()
+        
+        if self._socket is not None:
+            try:
+                while self._socket.recv(512):
+                    pass
+            except BlockingIOError:
+                pass
@@ -0,0 +1,231 @@
+"""
+Concurrent worker pool for processing the assessment queue.
+"""
+
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Optional
+
+from django.db import close_old_connections
+
+from .services import get_worker_id
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerStats:
+    """Throughput counters for a single worker thread."""
+    
+    def __init__(self):
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+    
+    def record(self, succeeded: bool, duration: float):
+        if succeeded:
+            self.processed += 1
+        else:
+            self.failed += 1
+        self.busy_seconds += duration
+    
+    def per_minute(self, elapsed_seconds: float) -> float:
+        """Completed assessments per minute over the given wall-clock period."""
+        if elapsed_seconds <= 0:
+            return 0.0
+        return self.processed * 60 / elapsed_seconds
+
+
+class AssessmentWorkerPool:
+    """
+    Runs several assessments at once on a thread pool.
+    
+    Each Claude round trip is dominated by network wait, so threads give
+    near-linear throughput up to the concurrency limit. Requests are claimed
+    from the queue on the calling thread under this process's worker id and
+    handed to the pool. A heartbeat thread renews the leases of in-flight
+    requests every third of the lease, so a slow assessment (a long
+    rate-limit wait, retries, an escalation) is not reaped and scored twice.
+    """
+    
+    def __init__(self, service, concurrency: int = 4):
+        self.service = service
+        self.concurrency = max(1, concurrency)
+        self.worker_id = get_worker_id()
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.concurrency,
+            thread_name_prefix='assessment-worker'
+        )
+        self.stats: Dict[str, WorkerStats] = {}
+        self.on_done: Optional[Callable[[], None]] = None
+        self.started_at = time.monotonic()
+        # Future -> request id; the heartbeat thread reads it while the
+        # calling thread adds and removes entries, so both hold the lock
+        self._in_flight = {}
+        self._in_flight_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._closed = threading.Event()
+        self._heartbeat = threading.Thread(
+            target=self._renew_leases,
+            name='assessment-lease-heartbeat',
+            daemon=True
+        )
+        self._heartbeat.start()
+    
+    @property
+    def stopping(self) -> bool:
+        return self._stopping.is_set()
+    
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+    
+    def stop(self):
+        """Stop claiming new work; in-flight assessments are allowed to finish."""
+        self._stopping.set()
+    
+    def idle(self, timeout: float):
+        """Sleep for ``timeout`` seconds, returning early if the pool is stopped."""
+        self._stopping.wait(timeout)
+    
+    def fill(self) -> int:
+        """
+        Claim queued requests for every idle worker slot.
+        
+        Returns:
+            Number of requests submitted to the pool
+        """
+        if self.stopping:
+            return 0
+        
+        free_slots = self.concurrency - len(self._in_flight)
+        if free_slots <= 0:
+            return 0
+        
+        return self._claim(free_slots)
+    
+    def reap(self, timeout: Optional[float] = None) -> int:
+        """
+        Wait up to ``timeout`` seconds for in-flight work and collect finished futures.
+        
+        Returns:
+            Number of requests that completed successfully
+        """
+        if not self._in_flight:
+            return 0
+        
+        with self._in_flight_lock:
+            futures = list(self._in_flight)
+        done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+        completed = 0
+        for future in done:
+            with self._in_flight_lock:
+                self._in_flight.pop(future)
+            if future.result():
+                completed += 1
+        return completed
+    
+    def run_once(self, max_requests: int) -> int:
+        """Process up to ``max_requests`` queued requests and wait for them to finish."""
+        processed = 0
+        remaining = max_requests
+        self.service.reap_expired_leases()
+        self.service.requeue_due_retries()
+        
+        while not self.stopping:
+            if remaining > 0:
+                free_slots = min(remaining, self.concurrency - len(self._in_flight))
+                if free_slots > 0:
+                    remaining -= self._claim(free_slots)
+            
+            if not self._in_flight:
+                break
+            
+            processed += self.reap()
+        
+        processed += self.drain()
+        return processed
+    
+    def drain(self) -> int:
+        """Block until every in-flight assessment has finished."""
+        processed = 0
+        while self._in_flight:
+            processed += self.reap()
+        return processed
+    
+    def shutdown(self):
+        """Stop claiming, finish in-flight work and release the threads."""
+        self.stop()
+        self.drain()
+        self.executor.shutdown(wait=True)
+        self._closed.set()
+        self._heartbeat.join()
+    
+    def throughput_report(self) -> Dict[str, Dict]:
+        """Per-worker throughput since the pool started."""
+        elapsed = time.monotonic() - self.started_at
+        with self._stats_lock:
+            return {
+                name: {
+                    'processed': stats.processed,
+                    'failed': stats.failed,
+                    'busy_seconds': round(stats.busy_seconds, 1),
+                    'per_minute': round(stats.per_minute(elapsed), 2),
+                }
+                for name, stats in sorted(self.stats.items())
+            }
+    
+    def _claim(self, limit: int) -> int:
+        claimed = self.service.claim_queued_requests(
+            limit,
+            worker_id=self.worker_id,
+            exclude_ids=self._in_flight_ids()
+        )
+        for request in claimed:
+            future = self.executor.submit(self._run, request)
+            with self._in_flight_lock:
+                self._in_flight[future] = request.id
+        return len(claimed)
+    
+    def _in_flight_ids(self) -> List[int]:
+        """Snapshot of the in-flight request ids, safe to take from any thread."""
+        with self._in_flight_lock:
+            return list(self._in_flight.values())
+    
+    def _renew_leases(self):
+        """Heartbeat thread body: keep the leases of in-flight requests from expiring."""
+        interval = self.service.lease_seconds / 3
+        while not self._closed.wait(interval):
+            try:
+                self.service.renew_leases(self._in_flight_ids(), self.worker_id)
+            except Exception as e:
+                logger.warning(f"Failed to renew assessment request leases: {e}")
+            finally:
+                close_old_connections()
+    
+    def _run(self, request) -> bool:
+        """Worker thread body: process one request with its own DB connection."""
+        worker_name = threading.current_thread().name
+        start = time.monotonic()
+        succeeded = False
+        
+        close_old_connections()
+        try:
+            succeeded = self.service.process_assessment_request(request)
+        except Exception as e:
+            logger.error(f"Worker {worker_name} crashed on request {request.id}: {e}")
+        finally:
+            close_old_connections()
+        
+        with self._stats_lock:
+            self.stats.setdefault(worker_name, WorkerStats()).record(
+                succeeded, time.monotonic() - start
+            )
+        
+        # Let the dispatcher refill the freed slot straight away
+        if self.on_done is not None:
+            self.on_done()
+        
+        return succeeded
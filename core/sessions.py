@@ -0,0 +1,50 @@
+"""
+Database session backend that keeps SESSION_SAVE_EVERY_REQUEST cheap.
+
+With SESSION_SAVE_EVERY_REQUEST every response re-saves the session just to
+push its expiry forward, which on SQLite is a write per request. This store
+saves changed sessions as usual, but an unchanged session only has its
+expiry refreshed: at most once per EXPIRY_REFRESH_INTERVAL, and through the
+write queue so concurrent touches share one transaction.
+"""
+
+from datetime import timedelta
+
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+
+from .writes import retry_on_locked, write_queue
+
+# Expiry refreshes closer together than this are skipped
+EXPIRY_REFRESH_INTERVAL = timedelta(seconds=60)
+
+
+class SessionStore(DBStore):
+    
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._stored_expiry = None
+    
+    def _get_session_from_db(self):
+        session = super()._get_session_from_db()
+        self._stored_expiry = session.expire_date if session else None
+        return session
+    
+    def save(self, must_create=False):
+        if not must_create:
+            # Loads the session (and its stored expiry) if nothing has read it yet
+            self._get_session()
+        
+        if must_create or self.modified or self.session_key is None or self._stored_expiry is None:
+            retry_on_locked(super().save)(must_create)
+            return
+        
+        expire_date = self.get_expiry_date()
+        if expire_date - self._stored_expiry < EXPIRY_REFRESH_INTERVAL:
+            return
+        
+        model, session_key = self.model, self.session_key
+        write_queue.submit(
+            lambda: model.objects.filter(session_key=session_key).update(expire_date=expire_date),
+            key=('session', session_key)
+        )
+        self._stored_expiry = expire_date
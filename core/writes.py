@@ -0,0 +1,217 @@
+"""
+Write-behind queue and lock retries for the SQLite deployment.
+
+SQLite allows one writer at a time, so every session touch queues for the
+same lock as autosaves, assessment and queue updates. ``write_queue``
+funnels those high-frequency writes through one writer thread per process,
+which commits them in batches: one write transaction (and one lock
+acquisition) per batch instead of per request. Keyed writes coalesce, so
+ten expiry refreshes of one session within a flush interval cost a single
+UPDATE.
+
+Queued writes are acknowledged before they are committed. Only use the
+queue for writes where losing the last ``flush_interval`` on a crash is
+acceptable (a session expiry refresh, not a usage record or anything
+billed), and call ``write_queue.flush()`` before reading back a row that
+may have a pending write; everything else runs inline under
+``retry_on_locked``. With ``DATABASE_WRITE_QUEUE['enabled']`` off (the
+default, and the right choice on PostgreSQL) queued writes run inline too.
+"""
+
+import os
+import time
+import atexit
+import random
+import logging
+import threading
+from functools import wraps
+from typing import Callable, Dict, Hashable, List, Optional
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+WRITE_QUEUE_DEFAULTS = {
+    'enabled': False,
+    'flush_interval': 0.25,
+    'max_batch': 500,
+}
+
+LOCKED_RETRY_DEFAULTS = {
+    'attempts': 5,
+    'base_delay': 0.05,
+    'max_delay': 2.0,
+}
+
+# Longest a process waits at exit for its pending writes
+EXIT_FLUSH_TIMEOUT = 10
+
+
+def is_database_locked(error: Exception) -> bool:
+    """Whether ``error`` is SQLite giving up on its busy timeout."""
+    return isinstance(error, OperationalError) and 'locked' in str(error)
+
+
+def retry_on_locked(func: Callable) -> Callable:
+    """
+    Retry ``func`` with exponential backoff and jitter on "database is locked".
+    
+    The busy timeout already waits for the lock, but a transaction that read
+    before writing gets SQLITE_BUSY at once if another writer committed in
+    between, and a busy writer can outlast the timeout. Inside an outer
+    transaction the error is re-raised, since only the outermost block can
+    start over.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        options = {**LOCKED_RETRY_DEFAULTS, **getattr(settings, 'DATABASE_LOCKED_RETRY', {})}
+        for attempt in range(options['attempts']):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as e:
+                if (
+                    not is_database_locked(e)
+                    or connection.in_atomic_block
+                    or attempt == options['attempts'] - 1
+                ):
+                    raise
+                delay = min(options['max_delay'], options['base_delay'] * 2 ** attempt)
+                delay *= random.uniform(0.5, 1.0)
+                logger.warning(f"Database locked in {func.__name__}, retrying in {delay:.2f}s")
+                time.sleep(delay)
+    
+    return wrapper
+
+
+class WriteQueue:
+    """
+    Single writer thread per process that commits queued writes in batches.
+    
+    ``submit()`` takes a callable that performs the write; one submitted
+    under a ``key`` replaces any pending write with the same key. The
+    thread starts on first use and is restarted in a forked child.
+    """
+    
+    def __init__(self):
+        self._pid = None
+        self._start_lock = threading.Lock()
+    
+    @property
+    def options(self) -> Dict:
+        return {**WRITE_QUEUE_DEFAULTS, **getattr(settings, 'DATABASE_WRITE_QUEUE', {})}
+    
+    @property
+    def enabled(self) -> bool:
+        return self.options['enabled']
+    
+    def submit(self, write: Callable[[], None], key: Optional[Hashable] = None):
+        """
+        Queue ``write`` to run on the writer thread, or run it now if the queue is disabled.
+        
+        Args:
+            write: Callable performing the write; it runs inside the batch transaction
+            key: Coalescing key; a later write with the same key replaces this one
+        """
+        if not self.enabled:
+            retry_on_locked(write)()
+            return
+        
+        with self._ensure_started():
+            self._sequence += 1
+            self._pending[key if key is not None else ('write', self._sequence)] = write
+            self._condition.notify_all()
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until every write queued so far is committed.
+        
+        Returns:
+            False if ``timeout`` passed first
+        """
+        if not self.enabled or self._pid != os.getpid():
+            return True
+        
+        with self._condition:
+            target = self._sequence
+            if self._written >= target:
+                return True
+            self._flush_requested = True
+            self._condition.notify_all()
+            return self._condition.wait_for(lambda: self._written >= target, timeout)
+    
+    @property
+    def pending(self) -> int:
+        if self._pid != os.getpid():
+            return 0
+        with self._condition:
+            return len(self._pending)
+    
+    def _ensure_started(self) -> threading.Condition:
+        """Start the writer thread if this process has none; returns the queue's condition."""
+        if self._pid != os.getpid():
+            with self._start_lock:
+                if self._pid != os.getpid():
+                    self._condition = threading.Condition()
+                    self._pending: Dict[Hashable, Callable] = {}
+                    self._sequence = 0
+                    self._written = 0
+                    self._flush_requested = False
+                    self._thread = threading.Thread(target=self._run, name='write-queue', daemon=True)
+                    self._thread.start()
+                    self._pid = os.getpid()
+        return self._condition
+    
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending)
+                
+                # Let the batch fill for one flush interval unless someone is waiting on it
+                deadline = time.monotonic() + self.options['flush_interval']
+                while not self._flush_requested:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or len(self._pending) >= self.options['max_batch']:
+                        break
+                    self._condition.wait(remaining)
+                
+                writes, self._pending = list(self._pending.values()), {}
+                sequence = self._sequence
+                self._flush_requested = False
+            
+            close_old_connections()
+            try:
+                self._commit(writes)
+            finally:
+                with self._condition:
+                    self._written = sequence
+                    self._condition.notify_all()
+    
+    def _commit(self, writes: List[Callable]):
+        try:
+            retry_on_locked(self._commit_batch)(writes)
+            return
+        except Exception as e:
+            logger.error(f"Write batch of {len(writes)} failed, retrying one by one: {e}")
+        
+        # A failing write must not take the rest of its batch down with it
+        for write in writes:
+            try:
+                retry_on_locked(transaction.atomic()(write))()
+            except Exception as e:
+                logger.error(f"Queued write {getattr(write, '__qualname__', write)!r} failed: {e}")
+    
+    @staticmethod
+    def _commit_batch(writes: List[Callable]):
+        with transaction.atomic():
+            for write in writes:
+                write()
+
+
+write_queue = WriteQueue()
+
+
+@atexit.register
+def _flush_at_exit():
+    if not write_queue.flush(timeout=EXIT_FLUSH_TIMEOUT):
+        logger.error(f"Exited with {write_queue.pending} queued writes not committed")
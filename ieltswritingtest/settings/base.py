@@ -4,7 +4,7 @@ Base settings for IELTS Writing Test project.
 
 import os
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
@@ -39,6 +39,7 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'assessment.middleware.RequestMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -116,6 +117,114 @@ CLAUDE_MODEL = config('CLAUDE_MODEL', default='claude-3-5-sonnet-20241022')
 CLAUDE_MAX_TOKENS = config('CLAUDE_MAX_TOKENS', default=4000, cast=int)
 CLAUDE_TEMPERATURE = config('CLAUDE_TEMPERATURE', default=0.3, cast=float)
 
+# Tiered routing: score with CLAUDE_FAST_MODEL first and escalate to
+# CLAUDE_MODEL on low confidence, criteria more than a band apart, or a
+# premium plan (see assessment/routing.py)
+ASSESSMENT_ROUTING_ENABLED = config('ASSESSMENT_ROUTING_ENABLED', default=True, cast=bool)
+CLAUDE_FAST_MODEL = config('CLAUDE_FAST_MODEL', default='claude-3-5-haiku-20241022')
+CLAUDE_FAST_MAX_TOKENS = config('CLAUDE_FAST_MAX_TOKENS', default=2500, cast=int)
+ASSESSMENT_ESCALATION_CONFIDENCE = config('ASSESSMENT_ESCALATION_CONFIDENCE', default=0.75, cast=float)
+ASSESSMENT_ESCALATION_SPREAD = config('ASSESSMENT_ESCALATION_SPREAD', default=1.0, cast=float)
+ASSESSMENT_PREMIUM_PLAN_TYPES = config('ASSESSMENT_PREMIUM_PLAN_TYPES', default='premium,pro', cast=Csv())
+
+# Scoring backend: 'anthropic', or 'local' for the offline engine used in load
+# tests (see assessment/backends.py), or a dotted path to a ScoringBackend
+ASSESSMENT_SCORING_BACKEND = config('ASSESSMENT_SCORING_BACKEND', default='anthropic')
+ASSESSMENT_LOCAL_BACKEND = {
+    'latency': config('ASSESSMENT_LOCAL_LATENCY', default=0.0, cast=float),
+    'latency_jitter': config('ASSESSMENT_LOCAL_LATENCY_JITTER', default=0.0, cast=float),
+    'rate_limit_rate': config('ASSESSMENT_LOCAL_RATE_LIMIT_RATE', default=0.0, cast=float),
+    'timeout_rate': config('ASSESSMENT_LOCAL_TIMEOUT_RATE', default=0.0, cast=float),
+    'malformed_rate': config('ASSESSMENT_LOCAL_MALFORMED_RATE', default=0.0, cast=float),
+    'batch_duration': config('ASSESSMENT_LOCAL_BATCH_DURATION', default=5.0, cast=float),
+}
+
+# Assessment Queue Configuration
+ASSESSMENT_LEASE_SECONDS = config('ASSESSMENT_LEASE_SECONDS', default=600, cast=int)
+ASSESSMENT_MAX_ATTEMPTS = config('ASSESSMENT_MAX_ATTEMPTS', default=5, cast=int)
+ASSESSMENT_QUEUE_SOCKET_DIR = config('ASSESSMENT_QUEUE_SOCKET_DIR', default=str(BASE_DIR / 'run'))
+
+# Message Batches mode (process_assessments --batch), always with CLAUDE_MODEL
+# (no fast-model routing); the lease must outlive a batch, which Anthropic
+# expires after 24 hours
+ASSESSMENT_BATCH_SIZE = config('ASSESSMENT_BATCH_SIZE', default=500, cast=int)
+ASSESSMENT_BATCH_LEASE_SECONDS = config('ASSESSMENT_BATCH_LEASE_SECONDS', default=25 * 60 * 60, cast=int)
+
+# Anthropic org rate limits shared by the web app and queue daemons on this host
+# (0 disables a bucket); interactive calls give up after ANTHROPIC_RATE_LIMIT_MAX_WAIT,
+# queued ones after ANTHROPIC_RATE_LIMIT_QUEUE_MAX_WAIT (capped at half the lease)
+# and are retried with backoff. Off by default: when enabling it, set the three
+# limits to the account's usage tier (Anthropic console, Limits page), as the
+# defaults below are only an example of a low tier
+ANTHROPIC_RATE_LIMIT_ENABLED = config('ANTHROPIC_RATE_LIMIT_ENABLED', default=False, cast=bool)
+ANTHROPIC_RPM_LIMIT = config('ANTHROPIC_RPM_LIMIT', default=50, cast=int)
+ANTHROPIC_ITPM_LIMIT = config('ANTHROPIC_ITPM_LIMIT', default=30000, cast=int)
+ANTHROPIC_OTPM_LIMIT = config('ANTHROPIC_OTPM_LIMIT', default=8000, cast=int)
+ANTHROPIC_RATE_LIMIT_QUEUE_RESERVE = config('ANTHROPIC_RATE_LIMIT_QUEUE_RESERVE', default=0.2, cast=float)
+ANTHROPIC_RATE_LIMIT_MAX_WAIT = config('ANTHROPIC_RATE_LIMIT_MAX_WAIT', default=30, cast=int)
+ANTHROPIC_RATE_LIMIT_QUEUE_MAX_WAIT = config('ANTHROPIC_RATE_LIMIT_QUEUE_MAX_WAIT', default=120, cast=int)
+ANTHROPIC_RATE_LIMIT_FILE = config('ANTHROPIC_RATE_LIMIT_FILE', default=str(BASE_DIR / 'run' / 'anthropic-ratelimit.json'))
+
+# Anthropic HTTP connection pool, one per process (built after any fork).
+# Read timeouts: non-streamed calls wait for the whole generation, streamed
+# calls only between events; HTTP/2 is used when the h2 package is installed
+ANTHROPIC_HTTP_CLIENT = {
+    'max_connections': config('ANTHROPIC_HTTP_MAX_CONNECTIONS', default=20, cast=int),
+    'max_keepalive_connections': config('ANTHROPIC_HTTP_MAX_KEEPALIVE', default=10, cast=int),
+    'keepalive_expiry': config('ANTHROPIC_HTTP_KEEPALIVE_EXPIRY', default=30.0, cast=float),
+    'connect_timeout': config('ANTHROPIC_HTTP_CONNECT_TIMEOUT', default=5.0, cast=float),
+    'read_timeout': config('ANTHROPIC_HTTP_READ_TIMEOUT', default=300.0, cast=float),
+    'stream_read_timeout': config('ANTHROPIC_HTTP_STREAM_READ_TIMEOUT', default=60.0, cast=float),
+    'write_timeout': config('ANTHROPIC_HTTP_WRITE_TIMEOUT', default=30.0, cast=float),
+    'pool_timeout': config('ANTHROPIC_HTTP_POOL_TIMEOUT', default=30.0, cast=float),
+    'http2': config('ANTHROPIC_HTTP2', default=True, cast=bool),
+}
+
+# Re-request only the missing sections of a truncated or malformed response
+ASSESSMENT_SALVAGE_ENABLED = config('ASSESSMENT_SALVAGE_ENABLED', default=True, cast=bool)
+
+# Have Claude return the assessment through a record_assessment tool call
+# (JSON validated against assessment/schema.py) instead of JSON in prose
+ASSESSMENT_STRUCTURED_OUTPUT = config('ASSESSMENT_STRUCTURED_OUTPUT', default=True, cast=bool)
+
+# Score long Task 2 essays with four concurrent per-criterion calls instead
+# of one long response; criteria that fail are retried on their own
+ASSESSMENT_CRITERION_SPLIT = config('ASSESSMENT_CRITERION_SPLIT', default=False, cast=bool)
+ASSESSMENT_CRITERION_SPLIT_MIN_WORDS = config('ASSESSMENT_CRITERION_SPLIT_MIN_WORDS', default=300, cast=int)
+CLAUDE_CRITERION_MAX_TOKENS = config('CLAUDE_CRITERION_MAX_TOKENS', default=1200, cast=int)
+
+# Reuse parsed results for identical essays on the same task. The
+# 'assessments' cache is file-based in ASSESSMENT_CACHE_DIR, so every web
+# worker and queue daemon on the host shares its hits (not across hosts)
+ASSESSMENT_CACHE_ENABLED = config('ASSESSMENT_CACHE_ENABLED', default=True, cast=bool)
+ASSESSMENT_CACHE_ALIAS = 'assessments'
+ASSESSMENT_CACHE_DIR = config('ASSESSMENT_CACHE_DIR', default=str(BASE_DIR / 'run' / 'assessment-cache'))
+ASSESSMENT_CACHE_TTL = config('ASSESSMENT_CACHE_TTL', default=60 * 60 * 24 * 30, cast=int)
+ASSESSMENT_CACHE_MAX_ENTRIES = config('ASSESSMENT_CACHE_MAX_ENTRIES', default=5000, cast=int)
+
+# Local prescorer: instant provisional bands in the streaming views, optionally
+# its text metrics in Claude's prompt, and a refitted model from fit_prescorer
+ASSESSMENT_PRESCORER_ENABLED = config('ASSESSMENT_PRESCORER_ENABLED', default=True, cast=bool)
+ASSESSMENT_PRESCORER_IN_PROMPT = config('ASSESSMENT_PRESCORER_IN_PROMPT', default=False, cast=bool)
+ASSESSMENT_PRESCORER_MODEL = config('ASSESSMENT_PRESCORER_MODEL', default=str(BASE_DIR / 'assessment' / 'data' / 'prescorer_model.json'))
+
+# Serve streaming assessments from the async (ASGI) views
+ASSESSMENT_ASYNC_STREAMING = config('ASSESSMENT_ASYNC_STREAMING', default=False, cast=bool)
+
+# Prometheus metrics at /metrics (see assessment/metrics.py); queue and
+# throughput figures are cached for ASSESSMENT_METRICS_CACHE_SECONDS, and
+# counters are summed over every process on the host in ASSESSMENT_METRICS_FILE,
+# to which each process flushes its in-memory counts every
+# ASSESSMENT_METRICS_FLUSH_SECONDS.
+# Scrapes must send METRICS_AUTH_TOKEN as a bearer token; with no token set
+# /metrics refuses every scrape
+ASSESSMENT_METRICS_ENABLED = config('ASSESSMENT_METRICS_ENABLED', default=True, cast=bool)
+ASSESSMENT_METRICS_CACHE_SECONDS = config('ASSESSMENT_METRICS_CACHE_SECONDS', default=15, cast=int)
+ASSESSMENT_METRICS_RATE_WINDOW = config('ASSESSMENT_METRICS_RATE_WINDOW', default=300, cast=int)
+ASSESSMENT_METRICS_FILE = config('ASSESSMENT_METRICS_FILE', default=str(BASE_DIR / 'run' / 'assessment-metrics.json'))
+ASSESSMENT_METRICS_FLUSH_SECONDS = config('ASSESSMENT_METRICS_FLUSH_SECONDS', default=5, cast=float)
+METRICS_AUTH_TOKEN = config('METRICS_AUTH_TOKEN', default='')
+
 # Stripe Configuration
 # Temporary fix: Load directly from .env file if decouple fails
 def get_stripe_config():
@@ -156,6 +265,21 @@ EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 SESSION_COOKIE_AGE = 3600 * 24 * 7  # 1 week
 SESSION_SAVE_EVERY_REQUEST = True
 
+# Single-writer batching of session expiry refreshes for SQLite; off means
+# they run inline. Usage records and other writes always run inline
+DATABASE_WRITE_QUEUE = {
+    'enabled': config('DATABASE_WRITE_QUEUE_ENABLED', default=False, cast=bool),
+    'flush_interval': config('DATABASE_WRITE_QUEUE_FLUSH_INTERVAL', default=0.25, cast=float),
+    'max_batch': config('DATABASE_WRITE_QUEUE_MAX_BATCH', default=500, cast=int),
+}
+
+# Backoff for writes that fail with SQLite's "database is locked"
+DATABASE_LOCKED_RETRY = {
+    'attempts': config('DATABASE_LOCKED_RETRY_ATTEMPTS', default=5, cast=int),
+    'base_delay': config('DATABASE_LOCKED_RETRY_BASE_DELAY', default=0.05, cast=float),
+    'max_delay': config('DATABASE_LOCKED_RETRY_MAX_DELAY', default=2.0, cast=float),
+}
+
 # Login/Logout URLs
 LOGIN_URL = '/accounts/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
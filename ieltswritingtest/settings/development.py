@@ -45,7 +45,17 @@ CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'unique-snowflake',
-    }
+    },
+    # Content-hash assessment results, shared by every process on the host
+    # (a random third is culled past MAX_ENTRIES)
+    'assessments': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': ASSESSMENT_CACHE_DIR,
+        'TIMEOUT': ASSESSMENT_CACHE_TTL,
+        'OPTIONS': {
+            'MAX_ENTRIES': ASSESSMENT_CACHE_MAX_ENTRIES,
+        },
+    },
 }
 
 # Email backend for development (console)
@@ -14,17 +14,64 @@ ALLOWED_HOSTS = [
     'www.ieltswritingtest.com',
 ]
 
-# Database - SQLite for production (simple deployment)
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-        'OPTIONS': {
-            'timeout': 30,
-            'init_command': 'PRAGMA foreign_keys=ON; PRAGMA journal_mode=WAL;',
-        },
+# Database - SQLite (simple deployment) or PostgreSQL (DATABASE_ENGINE=postgresql).
+# SQLite serializes every write (autosave, sessions, assessments, queue
+# updates) behind one lock; PostgreSQL takes concurrent writers and lets
+# queue workers claim requests with SELECT ... FOR UPDATE SKIP LOCKED.
+# Move existing data across with scripts/migrate_sqlite_to_postgres.sh.
+DATABASE_ENGINE = config('DATABASE_ENGINE', default='sqlite')
+
+if DATABASE_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME', default='ieltswritingtest'),
+            'USER': config('DB_USER', default='postgres'),
+            'PASSWORD': config('DB_PASSWORD', default=''),
+            'HOST': config('DB_HOST', default='localhost'),
+            'PORT': config('DB_PORT', default='5432'),
+            # Persistent connections, checked before reuse so a restarted
+            # server or dropped connection fails over cleanly. Set
+            # DB_CONN_MAX_AGE=0 for ASGI workers, which cannot share them.
+            'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=600, cast=int),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': config('DB_CONNECT_TIMEOUT', default=5, cast=int),
+                'sslmode': config('DB_SSLMODE', default='prefer'),
+                'application_name': 'ieltswritingtest',
+            },
+        }
     }
-}
+else:
+    # Run on every new connection. synchronous=NORMAL is durable in WAL mode
+    # except for the last commits before a power loss; a negative cache_size
+    # is in KiB.
+    SQLITE_PRAGMAS = {
+        'foreign_keys': 'ON',
+        'journal_mode': 'WAL',
+        'synchronous': config('SQLITE_SYNCHRONOUS', default='NORMAL'),
+        'mmap_size': config('SQLITE_MMAP_SIZE', default=256 * 1024 * 1024, cast=int),
+        'cache_size': config('SQLITE_CACHE_SIZE', default=-64000, cast=int),
+        'temp_store': 'MEMORY',
+    }
+    
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                'timeout': 30,
+                'init_command': ' '.join(f'PRAGMA {name}={value};' for name, value in SQLITE_PRAGMAS.items()),
+                # Take the write lock at BEGIN, so a transaction that reads
+                # first waits for the busy timeout instead of failing with
+                # "database is locked" when it upgrades to a writer
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
+    
+    # One writer thread per process batches session touches; usage records stay inline
+    DATABASE_WRITE_QUEUE['enabled'] = config('DATABASE_WRITE_QUEUE_ENABLED', default=True, cast=bool)
 
 # Static files (CSS, JavaScript, Images)
 STATIC_ROOT = BASE_DIR / 'staticfiles'
@@ -58,11 +105,22 @@ CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'ieltswritingtest-cache',
-    }
+    },
+    # Content-hash assessment results, shared by every process on the host
+    # (a random third is culled past MAX_ENTRIES)
+    'assessments': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': ASSESSMENT_CACHE_DIR,
+        'TIMEOUT': ASSESSMENT_CACHE_TTL,
+        'OPTIONS': {
+            'MAX_ENTRIES': ASSESSMENT_CACHE_MAX_ENTRIES,
+        },
+    },
 }
 
-# Session configuration - Database sessions
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# Session configuration - Database sessions; core.sessions throttles and
+# batches the expiry refreshes of SESSION_SAVE_EVERY_REQUEST
+SESSION_ENGINE = 'core.sessions'
 
 # Email configuration for production
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -2,13 +2,26 @@
 Testing settings for IELTS Writing Test project.
 """
 
+import os
+import tempfile
+
 from .base import *
 
-# Use in-memory database for testing
+TEST_DATABASE = os.path.join(tempfile.gettempdir(), 'ieltswritingtest-test.sqlite3')
+
+# A database file rather than :memory:, whose shared cache fails
+# concurrent threads with "database table is locked" where a file waits
+# on the busy timeout; the queue concurrency tests rely on it
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': ':memory:',
+        'NAME': TEST_DATABASE,
+        'OPTIONS': {
+            'timeout': 30,
+        },
+        'TEST': {
+            'NAME': TEST_DATABASE,
+        },
     }
 }
 
@@ -34,9 +47,18 @@ EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
-    }
+    },
+    'assessments': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
 }
 
+# Tests must not share rate limit state with a running dev server
+ANTHROPIC_RATE_LIMIT_ENABLED = False
+
+# ...or add to its metrics counters
+ASSESSMENT_METRICS_FILE = str(BASE_DIR / 'run' / 'test-assessment-metrics.json')
+
 # Disable logging during tests
 LOGGING = {
     'version': 1,
@@ -5,6 +5,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from assessment.views import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -14,6 +15,7 @@ urlpatterns = [
     path('assessment/', include('assessment.urls')),
     path('progress/', include('progress.urls')),
     path('subscriptions/', include('subscriptions.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 # Serve media files in development
@@ -0,0 +1,163 @@
+"""
+Versioned draft autosaves.
+
+Every 30 seconds, and only if the text changed, the writing interface
+autosaves a compact patch against the version of the draft it last saved,
+instead of the whole essay. ``save_draft`` applies the
+patch to the draft row, keeps the word count up to date from the changed
+words only, and writes it back with an UPDATE guarded by
+``content_version``, so every server process sees the same version and an
+older text never replaces a newer one. ``start_draft`` gets or creates a
+user's single draft of a task (the unique_user_task_draft constraint stops
+two concurrent first autosaves from creating two).
+"""
+
+import json
+from typing import List, Optional, Tuple
+
+from django.utils import timezone
+
+from core.writes import retry_on_locked
+from .models import Submission
+
+
+class StaleDraft(Exception):
+    """The autosave was made against an older version of the draft."""
+    
+    def __init__(self, version: int):
+        super().__init__(f"Draft is at version {version}")
+        self.version = version
+
+
+class InvalidPatch(ValueError):
+    """The patch is malformed or does not fit the draft's text."""
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+def parse_patch(raw: str) -> List[Tuple[int, int, str]]:
+    """
+    Parse a JSON patch: a list of ``[start, end, text]`` splices.
+    
+    Each splice replaces ``start:end`` (in characters) of the text left by
+    the previous one with ``text``.
+    """
+    try:
+        splices = json.loads(raw)
+    except ValueError:
+        raise InvalidPatch("Patch is not valid JSON")
+    
+    if not isinstance(splices, list):
+        raise InvalidPatch("Patch must be a list of splices")
+    for splice in splices:
+        if (
+            not isinstance(splice, list) or len(splice) != 3
+            or not all(isinstance(value, int) and not isinstance(value, bool) for value in splice[:2])
+            or not isinstance(splice[2], str)
+        ):
+            raise InvalidPatch(f"Invalid splice {splice!r}")
+    return [tuple(splice) for splice in splices]
+
+
+def apply_patch(content: str, word_count: int, splices: List[Tuple[int, int, str]]) -> Tuple[str, int]:
+    """
+    Apply splices to ``content``, adjusting ``word_count`` incrementally.
+    
+    Only the words a splice touches are recounted: the span is widened to
+    the whitespace on either side, and the words in it before and after the
+    edit are counted.
+    
+    Returns:
+        Tuple of (new content, new word count)
+    """
+    for start, end, text in splices:
+        if not 0 <= start <= end <= len(content):
+            raise InvalidPatch(f"Splice {start}:{end} is outside the draft ({len(content)} characters)")
+        
+        left = start
+        while left > 0 and not content[left - 1].isspace():
+            left -= 1
+        right = end
+        while right < len(content) and not content[right].isspace():
+            right += 1
+        
+        word_count += (
+            count_words(content[left:start] + text + content[end:right])
+            - count_words(content[left:right])
+        )
+        content = content[:start] + text + content[end:]
+    
+    return content, word_count
+
+
+def start_draft(user, task) -> Submission:
+    """The user's draft of ``task``, created empty if there is none."""
+    submission, _ = Submission.objects.get_or_create(
+        user=user,
+        task=task,
+        status='draft',
+        defaults={'content': ''}
+    )
+    return submission
+
+
+def save_draft(
+    submission_id: int,
+    user_id: int,
+    base_version: Optional[int],
+    splices: Optional[List[Tuple[int, int, str]]] = None,
+    content: Optional[str] = None
+) -> Tuple[int, int]:
+    """
+    Apply one autosave of a draft owned by ``user_id``.
+    
+    Args:
+        submission_id: The draft
+        user_id: The autosaving user
+        base_version: Version the client's patch or text is based on;
+            None overwrites with ``content`` unconditionally
+        splices: Patch against ``base_version``
+        content: Full text, used when there is no patch
+    
+    Returns:
+        Tuple of (new version, word count)
+    
+    Raises:
+        Submission.DoesNotExist: No such draft of this user
+        StaleDraft: ``base_version`` is not the draft's current version
+        InvalidPatch: The patch does not fit the draft
+    """
+    while True:
+        draft = Submission.objects.only('id', 'content', 'word_count', 'content_version').get(
+            id=submission_id,
+            user_id=user_id,
+            status='draft'
+        )
+        
+        if splices is not None:
+            if base_version != draft.content_version:
+                raise StaleDraft(draft.content_version)
+            new_content, word_count = apply_patch(draft.content, draft.word_count, splices)
+        else:
+            if base_version is not None and base_version < draft.content_version:
+                raise StaleDraft(draft.content_version)
+            new_content, word_count = content, count_words(content)
+        
+        version = max(draft.content_version, base_version or 0) + 1
+        updated = retry_on_locked(
+            Submission.objects.filter(
+                id=submission_id,
+                status='draft',
+                content_version=draft.content_version
+            ).update
+        )(
+            content=new_content,
+            word_count=word_count,
+            content_version=version,
+            updated_at=timezone.now()
+        )
+        if updated:
+            return version, word_count
+        # Another autosave of this draft won the race; check again against its version
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('practice', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(condition=models.Q(('status__in', ['submitted', 'assessed'])), fields=['user', '-submitted_at'], name='submission_user_submitted_idx'),
+        ),
+    ]
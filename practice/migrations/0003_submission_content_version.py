@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('practice', '0002_submission_user_submitted_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='content_version',
+            field=models.PositiveIntegerField(default=0, help_text='Incremented by every autosave; autosave patches apply to a given version'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.3 on 2026-10-18 16:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def abandon_duplicate_drafts(apps, schema_editor):
+    """
+    Keep the latest draft per user and task as the draft so the unique
+    constraint can be created; older ones are kept, marked abandoned.
+    """
+    Submission = apps.get_model('practice', 'Submission')
+    
+    seen = set()
+    duplicates = []
+    for submission_id, user_id, task_id in Submission.objects.filter(status='draft').order_by(
+        'user_id', 'task_id', '-updated_at', '-id'
+    ).values_list('id', 'user_id', 'task_id'):
+        if (user_id, task_id) in seen:
+            duplicates.append(submission_id)
+        seen.add((user_id, task_id))
+    
+    Submission.objects.filter(id__in=duplicates).update(status='abandoned')
+
+
+def restore_abandoned_drafts(apps, schema_editor):
+    """Turn abandoned drafts back into drafts (the constraint is already gone)."""
+    Submission = apps.get_model('practice', 'Submission')
+    Submission.objects.filter(status='abandoned').update(status='draft')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('practice', '0003_submission_content_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='submission',
+            name='status',
+            field=models.CharField(choices=[('draft', 'Draft'), ('submitted', 'Submitted'), ('assessed', 'Assessed'), ('abandoned', 'Abandoned draft')], default='draft', max_length=20),
+        ),
+        migrations.RunPython(abandon_duplicate_drafts, restore_abandoned_drafts),
+        migrations.AddConstraint(
+            model_name='submission',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'draft')), fields=('user', 'task'), name='unique_user_task_draft'),
+        ),
+    ]
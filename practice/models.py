@@ -128,6 +128,8 @@ class Submission(BaseModel):
         ('draft', 'Draft'),
         ('submitted', 'Submitted'),
         ('assessed', 'Assessed'),
+        # An older duplicate draft, set aside when drafts became one per task
+        ('abandoned', 'Abandoned draft'),
     ]
     
     # References
@@ -147,6 +149,10 @@ class Submission(BaseModel):
         help_text="The user's written response"
     )
     word_count = models.PositiveIntegerField(default=0)
+    content_version = models.PositiveIntegerField(
+        default=0,
+        help_text="Incremented by every autosave; autosave patches apply to a given version"
+    )
     
     # Session information
     time_spent_seconds = models.PositiveIntegerField(
@@ -184,4 +190,18 @@ class Submission(BaseModel):
             models.Index(fields=['user', 'status']),
             models.Index(fields=['task']),
             models.Index(fields=['submitted_at']),
+            # A user's submitted work, newest first (drafts are excluded)
+            models.Index(
+                fields=['user', '-submitted_at'],
+                condition=models.Q(status__in=['submitted', 'assessed']),
+                name='submission_user_submitted_idx',
+            ),
+        ]
+        constraints = [
+            # Autosave and the writing form work on a user's single draft of a task
+            models.UniqueConstraint(
+                fields=['user', 'task'],
+                condition=models.Q(status='draft'),
+                name='unique_user_task_draft',
+            ),
         ]
@@ -11,6 +11,7 @@ from django.utils import timezone
 from django.db.models import Q
 import json
 
+from .drafts import InvalidPatch, StaleDraft, parse_patch, save_draft, start_draft
 from .models import Topic, PracticeTask, Submission
 from .forms import SubmissionForm
 
@@ -130,11 +131,9 @@ class StartPracticeView(LoginRequiredMixin, CreateView):
         return context
     
     def form_valid(self, form):
-        task = self.get_task()
-        submission = form.save(commit=False)
-        submission.user = self.request.user
-        submission.task = task
-        submission.save()
+        submission = start_draft(self.request.user, self.get_task())
+        # The form carries the final text, so it replaces whatever was autosaved
+        save_draft(submission.id, self.request.user.id, None, content=form.cleaned_data['content'])
         
         messages.success(self.request, 'Your practice session has been saved!')
         return redirect('practice:submit', submission_id=submission.id)
@@ -156,7 +155,8 @@ class SubmitPracticeView(LoginRequiredMixin, DetailView):
         if submission.status == 'draft':
             submission.status = 'submitted'
             submission.submitted_at = timezone.now()
-            submission.save()
+            # Leaves the content to the last autosave, should one land in between
+            submission.save(update_fields=['status', 'submitted_at', 'updated_at'])
             
             # Automatically create assessment request
             try:
@@ -187,7 +187,7 @@ class PracticeHistoryView(LoginRequiredMixin, ListView):
     def get_queryset(self):
         return Submission.objects.filter(
             user=self.request.user
-        ).select_related('task', 'task__topic').order_by('-created_at')
+        ).exclude(status='abandoned').select_related('task', 'task__topic').order_by('-created_at')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -205,28 +205,53 @@ class PracticeHistoryView(LoginRequiredMixin, ListView):
 
 # AJAX views for auto-save functionality
 def autosave_submission(request):
-    """Auto-save submission content via AJAX."""
+    """
+    Auto-save a draft via AJAX.
+    
+    Expects ``submission_id`` (or ``task_id`` to start a draft), ``base_version``
+    (the version the client last saved) and either ``patch``, a JSON list of
+    ``[start, end, text]`` splices against that version, or the full
+    ``content``. Answers with the new version and word count, or with 409 and
+    the current version if ``base_version`` is stale; the client then
+    resends its full text.
+    """
     if request.method == 'POST' and request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        if not request.user.is_authenticated:
+            return JsonResponse({'success': False, 'message': 'Login required'}, status=403)
+        
         submission_id = request.POST.get('submission_id')
         content = request.POST.get('content', '')
-        word_count = len(content.strip().split()) if content.strip() else 0
         
         try:
-            submission = Submission.objects.get(
-                id=submission_id,
-                user=request.user,
-                status='draft'
+            base_version = request.POST.get('base_version')
+            base_version = int(base_version) if base_version not in (None, '') else None
+            splices = parse_patch(request.POST['patch']) if 'patch' in request.POST else None
+            
+            if not submission_id:
+                task = get_object_or_404(PracticeTask, pk=request.POST.get('task_id'), is_active=True)
+                submission_id = start_draft(request.user, task).id
+            
+            version, word_count = save_draft(
+                int(submission_id), request.user.id, base_version, splices=splices, content=content
             )
-            submission.content = content
-            submission.word_count = word_count
-            submission.save()
             
             return JsonResponse({
                 'success': True,
+                'submission_id': int(submission_id),
+                'version': version,
                 'word_count': word_count,
                 'message': 'Draft saved'
             })
-        except Submission.DoesNotExist:
+        except StaleDraft as e:
+            return JsonResponse({
+                'success': False,
+                'stale': True,
+                'version': e.version,
+                'message': 'Draft has changed since this version'
+            }, status=409)
+        except InvalidPatch as e:
+            return JsonResponse({'success': False, 'message': str(e)}, status=400)
+        except (Submission.DoesNotExist, ValueError):
             return JsonResponse({'success': False, 'message': 'Submission not found'})
     
     return JsonResponse({'success': False, 'message': 'Invalid request'})
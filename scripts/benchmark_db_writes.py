@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+"""
+Write concurrency benchmark: SQLite (WAL) vs PostgreSQL.
+
+Simulates the production write mix from many threads at once for a fixed
+duration: draft autosaves, session saves, assessment requests being
+queued, and queue workers claiming and completing them. Reports
+operations per second, per-operation latency percentiles and errors
+(SQLite's "database is locked" once the busy timeout runs out).
+
+SQLite runs on a scratch file. PostgreSQL uses the DB_* settings of the
+production profile (DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT) and
+creates and drops a ``test_<DB_NAME>`` database for the run.
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+import tempfile
+import threading
+from collections import defaultdict
+
+# Add the project root to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+# Relative frequency of each simulated operation
+OPERATION_WEIGHTS = {
+    'autosave': 6,
+    'session': 3,
+    'enqueue': 1,
+    'claim': 1,
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--engine', choices=['sqlite', 'postgresql'], default='sqlite')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds to run the load')
+    parser.add_argument('--users', type=int, default=200, help='Simulated students, each with a draft')
+    return parser.parse_args()
+
+
+def database_settings(engine, scratch):
+    if engine == 'postgresql':
+        from decouple import config
+        return {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME', default='ieltswritingtest'),
+            'USER': config('DB_USER', default='postgres'),
+            'PASSWORD': config('DB_PASSWORD', default=''),
+            'HOST': config('DB_HOST', default='localhost'),
+            'PORT': config('DB_PORT', default='5432'),
+            'CONN_MAX_AGE': 600,
+            'CONN_HEALTH_CHECKS': True,
+        }
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(scratch, 'writes.sqlite3'),
+        'OPTIONS': {
+            'timeout': 30,
+            'init_command': 'PRAGMA foreign_keys=ON; PRAGMA journal_mode=WAL;',
+        },
+    }
+
+
+def percentile(sorted_values, pct):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+def main():
+    args = parse_args()
+    
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ieltswritingtest.settings.development')
+    
+    import django
+    from django.conf import settings
+    
+    with tempfile.TemporaryDirectory() as scratch:
+        settings.DATABASES['default'] = database_settings(args.engine, scratch)
+        settings.ASSESSMENT_QUEUE_SOCKET_DIR = os.path.join(scratch, 'run')
+        django.setup()
+        logging.disable(logging.CRITICAL)
+        
+        from django.db import close_old_connections, connection
+        from django.contrib.auth import get_user_model
+        from django.contrib.sessions.backends.db import SessionStore
+        from django.utils import timezone
+        from assessment.models import AssessmentRequest
+        from assessment.services import IELTSAssessmentService
+        from practice.models import PracticeTask, Submission, Topic
+        
+        print(f"🔧 Creating scratch {args.engine} database...")
+        if args.engine == 'postgresql':
+            connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        else:
+            from django.core.management import call_command
+            call_command('migrate', verbosity=0)
+        
+        try:
+            topic = Topic.objects.create(name='Benchmark')
+            task = PracticeTask.objects.create(
+                task_code='WRITES2', title='Benchmark task', module_type='academic', task_number=2,
+                prompt='Discuss both views and give your opinion.', topic=topic,
+                word_limit_min=250, word_limit_max=350,
+            )
+            User = get_user_model()
+            drafts = []
+            for i in range(args.users):
+                user = User.objects.create(username=f'writer-{i}')
+                drafts.append(Submission.objects.create(user=user, task=task, content='', status='draft'))
+            service = IELTSAssessmentService()
+            
+            deadline = time.monotonic() + args.duration
+            latencies = defaultdict(list)
+            errors = defaultdict(int)
+            lock = threading.Lock()
+            operations = list(OPERATION_WEIGHTS)
+            weights = list(OPERATION_WEIGHTS.values())
+            
+            def autosave(rng):
+                draft = rng.choice(drafts)
+                content = 'Some people believe that ' * rng.randint(20, 80)
+                Submission.objects.filter(pk=draft.pk).update(
+                    content=content, word_count=len(content.split()), updated_at=timezone.now()
+                )
+            
+            def session(rng):
+                store = SessionStore()
+                store['last_submission'] = rng.choice(drafts).pk
+                store.save()
+            
+            def enqueue(rng):
+                submission = Submission.objects.create(
+                    user_id=rng.choice(drafts).user_id, task=task, content='Essay.',
+                    status='submitted', submitted_at=timezone.now()
+                )
+                service.create_assessment_request(submission)
+            
+            def claim(rng):
+                for request in service.claim_queued_requests(1, worker_id=threading.current_thread().name):
+                    AssessmentRequest.objects.filter(pk=request.pk).update(
+                        status='completed', processing_completed_at=timezone.now()
+                    )
+            
+            handlers = {'autosave': autosave, 'session': session, 'enqueue': enqueue, 'claim': claim}
+            
+            def worker(seed):
+                rng = random.Random(seed)
+                close_old_connections()
+                try:
+                    while time.monotonic() < deadline:
+                        operation = rng.choices(operations, weights)[0]
+                        start = time.perf_counter()
+                        try:
+                            handlers[operation](rng)
+                        except Exception as e:
+                            with lock:
+                                errors[f'{operation}: {type(e).__name__}: {str(e)[:60]}'] += 1
+                            continue
+                        elapsed = time.perf_counter() - start
+                        with lock:
+                            latencies[operation].append(elapsed)
+                finally:
+                    connection.close()
+            
+            print(f"🏋️  {args.threads} threads for {args.duration:.0f}s...")
+            threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.threads)]
+            start = time.monotonic()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.monotonic() - start
+            
+            total = sum(len(values) for values in latencies.values())
+            print(f"📊 {args.engine}, {args.threads} threads: {total / elapsed:.0f} writes/s ({total} in {elapsed:.1f}s)")
+            for operation in operations:
+                values = sorted(latencies[operation])
+                if not values:
+                    continue
+                print(
+                    f"   {operation:<9} {len(values):>7} ops   p50 {percentile(values, 50) * 1000:7.1f}ms   "
+                    f"p95 {percentile(values, 95) * 1000:7.1f}ms   p99 {percentile(values, 99) * 1000:7.1f}ms"
+                )
+            for error, count in sorted(errors.items()):
+                print(f"   ❌ {count} x {error}")
+        finally:
+            if args.engine == 'postgresql':
+                close_old_connections()
+                connection.creation.destroy_test_db(settings.DATABASES['default']['NAME'], verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+"""
+Microbenchmark of the Anthropic HTTP client configuration.
+
+Starts a local stand-in for the Messages API (HTTP/1.1 keep-alive,
+optionally TLS with a throwaway self-signed certificate) and sends the
+same sequence of assessment calls through three client setups:
+
+- ``no-keepalive``: a new connection for every call
+- ``sdk-defaults``: ``anthropic.Anthropic()`` as the service used to build
+  it (keep-alive connections expire after 5 seconds idle)
+- ``tuned``: AnthropicBackend's client with the ANTHROPIC_HTTP_CLIENT pool
+
+It reports the connections each setup opened and the per-call latency, so
+the connection and TLS setup saved per assessment can be read off
+directly. Use ``--gap`` to leave idle time between calls, as there is
+between assessments in production. Nothing is sent to Anthropic.
+"""
+
+import os
+import sys
+import ssl
+import json
+import time
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the project root to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+RESPONSE = {
+    'id': 'msg_local',
+    'type': 'message',
+    'role': 'assistant',
+    'model': 'claude-3-5-sonnet-20241022',
+    'content': [{'type': 'text', 'text': '{"overall_score": 6.5}'}],
+    'stop_reason': 'end_turn',
+    'stop_sequence': None,
+    'usage': {'input_tokens': 1200, 'output_tokens': 400},
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds the stand-in server takes per call')
+    parser.add_argument('--gap', type=float, default=0.0, help='Idle seconds between calls')
+    parser.add_argument('--tls', action='store_true', help='Serve HTTPS with a self-signed certificate')
+    return parser.parse_args()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+    
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        body = json.dumps(RESPONSE).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(latency, certificate=None):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = 0
+    server.latency = latency
+    if certificate:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*certificate)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_certificate(directory):
+    cert, key = os.path.join(directory, 'cert.pem'), os.path.join(directory, 'key.pem')
+    subprocess.run(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+         '-subj', '/CN=localhost', '-addext', 'subjectAltName=IP:127.0.0.1',
+         '-keyout', key, '-out', cert],
+        check=True, capture_output=True
+    )
+    return cert, key
+
+
+def run(client, server, args):
+    """Send ``args.calls`` calls; returns (per-call seconds, connections opened)."""
+    connections_before = server.connections
+    timings = []
+    for _ in range(args.calls):
+        start = time.perf_counter()
+        client.messages.create(
+            model=RESPONSE['model'], max_tokens=1000,
+            messages=[{'role': 'user', 'content': 'Assess this essay. ' * 200}]
+        )
+        timings.append(time.perf_counter() - start)
+        if args.gap:
+            time.sleep(args.gap)
+    client.close()
+    return sorted(timings), server.connections - connections_before
+
+
+def main():
+    args = parse_args()
+    
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ieltswritingtest.settings.development')
+    
+    import django
+    django.setup()
+    logging.disable(logging.CRITICAL)
+    
+    import httpx
+    import anthropic
+    from assessment.backends import AnthropicBackend
+    
+    with tempfile.TemporaryDirectory() as scratch:
+        certificate = make_certificate(scratch) if args.tls else None
+        server = start_server(args.latency, certificate)
+        scheme = 'https' if args.tls else 'http'
+        base_url = f'{scheme}://127.0.0.1:{server.server_address[1]}'
+        verify = certificate[0] if certificate else True
+        
+        backend = AnthropicBackend()
+        setups = {
+            'no-keepalive': lambda: anthropic.Anthropic(
+                api_key='local', base_url=base_url, timeout=backend.timeout(),
+                http_client=anthropic.DefaultHttpxClient(
+                    verify=verify, limits=httpx.Limits(max_keepalive_connections=0)
+                )
+            ),
+            'sdk-defaults': lambda: anthropic.Anthropic(
+                api_key='local', base_url=base_url,
+                http_client=anthropic.DefaultHttpxClient(verify=verify)
+            ),
+            'tuned': lambda: anthropic.Anthropic(
+                api_key='local', base_url=base_url, timeout=backend.timeout(),
+                http_client=anthropic.DefaultHttpxClient(verify=verify, **backend.http_client_options())
+            ),
+        }
+        
+        print(
+            f"🔌 {args.calls} calls per setup over {scheme.upper()}, {args.latency}s server latency, "
+            f"{args.gap}s between calls (HTTP/2 {'on' if backend.http2 else 'off: h2 not installed'})"
+        )
+        results = {}
+        for name, build in setups.items():
+            timings, connections = run(build(), server, args)
+            mean = sum(timings) / len(timings)
+            results[name] = mean
+            print(
+                f"   {name:<13} {connections:>5} connections   mean {mean * 1000:7.2f}ms   "
+                f"p50 {timings[len(timings) // 2] * 1000:7.2f}ms   p95 {timings[int(len(timings) * 0.95)] * 1000:7.2f}ms"
+            )
+        
+        saved = results['no-keepalive'] - results['tuned']
+        print(f"📊 Connection{' and TLS' if args.tls else ''} setup saved per call by the tuned pool: {saved * 1000:.2f}ms")
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
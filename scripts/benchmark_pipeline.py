@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+"""
+Offline load test of the assessment queue pipeline.
+
+Queues N submissions in a scratch SQLite (WAL) database and drains them
+with the AssessmentWorkerPool against the local scoring engine
+(ASSESSMENT_SCORING_BACKEND=local). Nothing is sent to Anthropic. Reports
+throughput and the outcome of every request, including failures caused by
+the injected 429s, timeouts and malformed JSON.
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+from collections import Counter
+
+# Add the project root to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--essays', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds per local engine response')
+    parser.add_argument('--latency-jitter', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Fraction of calls answered with a 429')
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help='Fraction of calls that time out')
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help='Fraction of responses with invalid JSON')
+    parser.add_argument('--text-output', action='store_true',
+                        help='Ask for JSON text instead of a record_assessment tool call')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    
+    # Configure the local engine before settings are loaded
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ieltswritingtest.settings.development')
+    os.environ['ASSESSMENT_SCORING_BACKEND'] = 'local'
+    os.environ['ASSESSMENT_LOCAL_LATENCY'] = str(args.latency)
+    os.environ['ASSESSMENT_LOCAL_LATENCY_JITTER'] = str(args.latency_jitter)
+    os.environ['ASSESSMENT_LOCAL_RATE_LIMIT_RATE'] = str(args.rate_limit_rate)
+    os.environ['ASSESSMENT_LOCAL_TIMEOUT_RATE'] = str(args.timeout_rate)
+    os.environ['ASSESSMENT_LOCAL_MALFORMED_RATE'] = str(args.malformed_rate)
+    os.environ['ASSESSMENT_STRUCTURED_OUTPUT'] = str(not args.text_output)
+    
+    import django
+    from django.conf import settings
+    
+    with tempfile.TemporaryDirectory() as scratch:
+        settings.DATABASES['default'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(scratch, 'pipeline.sqlite3'),
+            'OPTIONS': {
+                'timeout': 30,
+                'init_command': 'PRAGMA foreign_keys=ON; PRAGMA journal_mode=WAL;',
+            },
+        }
+        settings.ASSESSMENT_QUEUE_SOCKET_DIR = os.path.join(scratch, 'run')
+        django.setup()
+        
+        # Per-assessment logs would dominate the timings
+        logging.disable(logging.CRITICAL)
+        
+        from django.core.management import call_command
+        from django.contrib.auth import get_user_model
+        from assessment.models import AssessmentRequest
+        from assessment.services import IELTSAssessmentService
+        from assessment.workers import AssessmentWorkerPool
+        from practice.models import PracticeTask, Submission, Topic
+        
+        print("🔧 Migrating scratch database...")
+        call_command('migrate', verbosity=0)
+        
+        user = get_user_model().objects.create(username='pipeline-benchmark')
+        topic = Topic.objects.create(name='Benchmark')
+        task = PracticeTask.objects.create(
+            task_code='BENCH2', title='Benchmark task', module_type='academic', task_number=2,
+            prompt='Discuss both views and give your opinion.', topic=topic,
+            word_limit_min=250, word_limit_max=350,
+        )
+        service = IELTSAssessmentService()
+        
+        print(f"📝 Queueing {args.essays} essays...")
+        for i in range(args.essays):
+            # Distinct essays, so the result cache does not short-circuit scoring
+            submission = Submission.objects.create(
+                user=user, task=task, content=f'Essay {i}. ' + 'Benchmark essay text. ' * (50 + i % 200),
+                word_count=150 + i % 200, status='submitted'
+            )
+            service.create_assessment_request(submission)
+        
+        pool = AssessmentWorkerPool(service, concurrency=args.workers)
+        start = time.monotonic()
+        try:
+            pool.run_once(args.essays)
+        finally:
+            pool.shutdown()
+        elapsed = time.monotonic() - start
+        
+        outcomes = Counter(
+            (status, error_class or '-')
+            for status, error_class in AssessmentRequest.objects.values_list('status', 'last_error_class')
+        )
+        completed = sum(count for (status, _), count in outcomes.items() if status == 'completed')
+        
+        print(f"📊 {args.essays} essays, {args.workers} workers, {args.latency}s engine latency")
+        print(f"   Wall clock: {elapsed:.1f}s")
+        print(f"   Throughput: {completed * 60 / elapsed:.0f} completed assessments/min")
+        for (status, error_class), count in sorted(outcomes.items()):
+            print(f"   {status:<12} {error_class:<12} {count}")
+        for mode, metrics in service.parse_stats.stats().items():
+            print(
+                f"   Parsing ({mode}): {metrics['responses']} responses, {metrics['salvaged']} salvaged, "
+                f"{metrics['failed']} failed"
+            )
+
+
+if __name__ == '__main__':
+    main()
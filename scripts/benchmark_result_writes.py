@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+"""
+Benchmark for the assessment result write path.
+
+Saves N assessments (with a realistic number of feedback items) into a
+scratch SQLite database in WAL mode, like production, once with the old
+write path (full-row saves, one INSERT per feedback item) and once with
+IELTSAssessmentService's current path (update_fields saves, bulk_create).
+Reports per-assessment statement count, total DB time, and how long the
+database holds the SQLite write lock in transactions.
+
+No Claude calls are made; parsed assessment data is generated locally.
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+from decimal import Decimal
+
+# Add the project root to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ieltswritingtest.settings.development')
+os.environ.setdefault('ANTHROPIC_API_KEY', 'benchmark')
+
+import django
+from django.conf import settings
+
+
+def configure_scratch_database(path):
+    """Point the default database at a scratch SQLite file before first use."""
+    settings.DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'OPTIONS': {
+            'timeout': 30,
+            'init_command': 'PRAGMA foreign_keys=ON; PRAGMA journal_mode=WAL;',
+        },
+    }
+
+
+class QueryTimer:
+    """execute_wrapper that counts statements and sums their duration."""
+    
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+    
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.statements += 1
+
+
+class LockTimer:
+    """
+    Times outermost transaction.atomic() blocks.
+    
+    Every transaction here writes, so on SQLite each one holds the database
+    write lock from its first write until commit.
+    """
+    
+    def __init__(self):
+        self.holds = []
+        self._started = None
+    
+    def install(self):
+        from django.db import connection, transaction
+        
+        original_enter = transaction.Atomic.__enter__
+        original_exit = transaction.Atomic.__exit__
+        timer = self
+        
+        def enter(atomic):
+            if not connection.in_atomic_block:
+                timer._started = time.perf_counter()
+            return original_enter(atomic)
+        
+        def exit_(atomic, exc_type, exc_value, traceback):
+            result = original_exit(atomic, exc_type, exc_value, traceback)
+            if not connection.in_atomic_block and timer._started is not None:
+                timer.holds.append(time.perf_counter() - timer._started)
+                timer._started = None
+            return result
+        
+        transaction.Atomic.__enter__ = enter
+        transaction.Atomic.__exit__ = exit_
+
+
+def make_assessment_data(feedback_items):
+    feedback = [
+        {
+            'type': 'overall' if i == 0 else 'suggestion',
+            'severity': 'info',
+            'title': f'Feedback point {i}',
+            'content': 'Detailed feedback explanation. ' * 8,
+            'suggestion': 'Try linking your paragraphs with clearer topic sentences.',
+        }
+        for i in range(feedback_items)
+    ]
+    return {
+        'overall_score': Decimal('6.5'),
+        'task_achievement': Decimal('6.0'),
+        'coherence_cohesion': Decimal('7.0'),
+        'lexical_resource': Decimal('6.5'),
+        'grammar_accuracy': Decimal('6.0'),
+        'confidence': Decimal('0.85'),
+        'feedback': feedback,
+    }
+
+
+def legacy_write(service, submission, data):
+    """The result write path before update_fields and bulk_create."""
+    from django.db import transaction
+    from django.utils import timezone
+    from assessment.models import Assessment, Feedback
+    
+    assessment, created = Assessment.objects.get_or_create(
+        submission=submission,
+        defaults={'status': 'processing', 'started_at': timezone.now(), 'ai_model_used': service.model}
+    )
+    assessment.status = 'processing'
+    assessment.started_at = timezone.now()
+    assessment.save()
+    
+    with transaction.atomic():
+        assessment.overall_band_score = data['overall_score']
+        assessment.task_achievement_score = data['task_achievement']
+        assessment.coherence_cohesion_score = data['coherence_cohesion']
+        assessment.lexical_resource_score = data['lexical_resource']
+        assessment.grammar_accuracy_score = data['grammar_accuracy']
+        assessment.ai_confidence_score = data['confidence']
+        assessment.processing_time_seconds = 0
+        assessment.status = 'completed'
+        assessment.completed_at = timezone.now()
+        assessment.save()
+        
+        for item in data['feedback']:
+            Feedback.objects.create(
+                assessment=assessment,
+                feedback_type=item['type'],
+                severity=item['severity'],
+                title=item['title'],
+                content=item['content'],
+                suggestion=item['suggestion'],
+                ai_confidence=Decimal('0.85')
+            )
+        
+        submission.status = 'assessed'
+        submission.save()
+
+
+def current_write(service, submission, data):
+    assessment, _ = service._begin_assessment(submission)
+    service._save_assessment_results(assessment, data, time.time())
+
+
+def make_submissions(count):
+    from django.contrib.auth import get_user_model
+    from practice.models import PracticeTask, Submission, Topic
+    
+    user, _ = get_user_model().objects.get_or_create(username='benchmark-writer')
+    topic, _ = Topic.objects.get_or_create(name='Benchmark')
+    task, _ = PracticeTask.objects.get_or_create(
+        task_code='BENCH1',
+        defaults={
+            'title': 'Benchmark task', 'module_type': 'academic', 'task_number': 2,
+            'prompt': 'Discuss both views and give your opinion.', 'topic': topic,
+            'word_limit_min': 250, 'word_limit_max': 350,
+        }
+    )
+    return [
+        Submission.objects.create(
+            user=user, task=task, content='Benchmark essay text. ' * 60,
+            word_count=240, status='submitted'
+        )
+        for _ in range(count)
+    ]
+
+
+def run(label, write, service, count, data, locks):
+    from django.db import connection
+    
+    submissions = make_submissions(count)
+    queries = QueryTimer()
+    locks.holds = []
+    
+    start = time.perf_counter()
+    with connection.execute_wrapper(queries):
+        for submission in submissions:
+            write(service, submission, data)
+    elapsed = time.perf_counter() - start
+    
+    holds_ms = sorted(hold * 1000 for hold in locks.holds)
+    held_ms = sum(holds_ms) / count
+    p95 = holds_ms[int(0.95 * (len(holds_ms) - 1))]
+    print(f"📊 {label}")
+    print(f"   Statements per assessment: {queries.statements / count:.1f}")
+    print(f"   DB time per assessment: {queries.seconds * 1000 / count:.2f}ms "
+          f"(wall clock {elapsed * 1000 / count:.2f}ms)")
+    print(f"   Write lock held per assessment: {held_ms:.2f}ms "
+          f"(transaction p95 {p95:.2f}ms, longest {holds_ms[-1]:.2f}ms)")
+    return held_ms, queries.seconds / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--assessments', type=int, default=200)
+    parser.add_argument('--feedback-items', type=int, default=7)
+    args = parser.parse_args()
+    
+    # Per-assessment INFO logs would dominate the timings
+    logging.disable(logging.INFO)
+    
+    with tempfile.TemporaryDirectory() as scratch:
+        configure_scratch_database(os.path.join(scratch, 'benchmark.sqlite3'))
+        django.setup()
+        
+        from django.core.management import call_command
+        from assessment.services import IELTSAssessmentService
+        
+        print("🔧 Migrating scratch database...")
+        call_command('migrate', verbosity=0)
+        
+        service = IELTSAssessmentService()
+        data = make_assessment_data(args.feedback_items)
+        locks = LockTimer()
+        locks.install()
+        
+        legacy_hold, legacy_db = run('Legacy write path', legacy_write, service, args.assessments, data, locks)
+        current_hold, current_db = run('Current write path', current_write, service, args.assessments, data, locks)
+        
+        print(f"✅ Write lock held {legacy_hold / current_hold:.1f}x shorter, "
+              f"DB time per assessment {legacy_db / current_db:.1f}x lower")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+"""
+SQLite write-contention benchmark: concurrent autosavers plus a queue daemon.
+
+Each autosaver is a logged-in student posting draft autosaves through the
+real view and middleware stack (so SESSION_SAVE_EVERY_REQUEST touches the
+session too), as the writing interface does: a patch against the last saved
+version, or the full text after a 409. Meanwhile an in-process
+``process_assessments --daemon`` scores a backlog with the local engine and
+writes results to the same database. Nothing is sent to Anthropic.
+
+Two SQLite profiles are compared, each on its own scratch database:
+
+- ``baseline``: WAL only, every autosave and session touch written inline
+- ``tuned``: the production profile (synchronous=NORMAL, mmap, cache and
+  temp_store pragmas, IMMEDIATE transactions), the core.writes write queue
+  and the core.sessions store
+
+Reports autosave latency, lock errors, daemon throughput and whether every
+draft ends up with its last autosave. Everything shares one process (and
+GIL), so compare daemon throughput at similar autosave rates; with a very
+short ``--think`` the faster profile simply runs more autosaves.
+"""
+
+import io
+import os
+import json
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import Counter
+
+# Add the project root to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+PROFILES = ('baseline', 'tuned')
+
+TUNED_PRAGMAS = (
+    'PRAGMA foreign_keys=ON; PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; '
+    'PRAGMA mmap_size=268435456; PRAGMA cache_size=-64000; PRAGMA temp_store=MEMORY;'
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profile', choices=PROFILES + ('both',), default='both')
+    parser.add_argument('--autosavers', type=int, default=32, help='Concurrent students autosaving')
+    parser.add_argument('--think', type=float, default=0.3, help='Seconds each student waits between autosaves')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--workers', type=int, default=4, help='Queue daemon worker threads')
+    parser.add_argument('--backlog', type=int, default=500, help='Essays queued for the daemon')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds per local engine response')
+    return parser.parse_args()
+
+
+def run_both(args):
+    """Run each profile in its own process; connections and settings cannot be swapped in place."""
+    for profile in PROFILES:
+        subprocess.run([
+            sys.executable, os.path.abspath(__file__), '--profile', profile,
+            '--autosavers', str(args.autosavers), '--think', str(args.think),
+            '--duration', str(args.duration), '--workers', str(args.workers),
+            '--backlog', str(args.backlog), '--latency', str(args.latency),
+        ], check=True)
+
+
+def percentile(sorted_values, pct):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+def main():
+    args = parse_args()
+    if args.profile == 'both':
+        run_both(args)
+        return
+    tuned = args.profile == 'tuned'
+    
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ieltswritingtest.settings.development')
+    os.environ['ASSESSMENT_SCORING_BACKEND'] = 'local'
+    os.environ['ASSESSMENT_LOCAL_LATENCY'] = str(args.latency)
+    
+    import django
+    from django.conf import settings
+    
+    with tempfile.TemporaryDirectory() as scratch:
+        options = {'timeout': 30, 'init_command': 'PRAGMA foreign_keys=ON; PRAGMA journal_mode=WAL;'}
+        if tuned:
+            options.update(init_command=TUNED_PRAGMAS, transaction_mode='IMMEDIATE')
+        settings.DATABASES['default'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(scratch, 'contention.sqlite3'),
+            'OPTIONS': options,
+        }
+        settings.ASSESSMENT_QUEUE_SOCKET_DIR = os.path.join(scratch, 'run')
+        settings.SESSION_ENGINE = 'core.sessions' if tuned else 'django.contrib.sessions.backends.db'
+        settings.DATABASE_WRITE_QUEUE = {**settings.DATABASE_WRITE_QUEUE, 'enabled': tuned}
+        settings.ALLOWED_HOSTS = ['testserver']
+        django.setup()
+        logging.disable(logging.CRITICAL)
+        
+        from django.core.management import call_command
+        from django.contrib.auth import get_user_model
+        from django.db import close_old_connections
+        from django.test import Client
+        from django.urls import reverse
+        from assessment.management.commands.process_assessments import Command
+        from assessment.models import AssessmentRequest
+        from assessment.services import assessment_service
+        from assessment.workers import AssessmentWorkerPool
+        from core.writes import write_queue
+        from practice.models import PracticeTask, Submission, Topic
+        
+        print(f"🔧 [{args.profile}] Migrating scratch database...")
+        call_command('migrate', verbosity=0)
+        
+        User = get_user_model()
+        topic = Topic.objects.create(name='Benchmark')
+        task = PracticeTask.objects.create(
+            task_code='CONTEND2', title='Benchmark task', module_type='academic', task_number=2,
+            prompt='Discuss both views and give your opinion.', topic=topic,
+            word_limit_min=250, word_limit_max=350,
+        )
+        students = []
+        for i in range(args.autosavers):
+            user = User.objects.create(username=f'student-{i}')
+            client = Client()
+            client.force_login(user)
+            draft = Submission.objects.create(user=user, task=task, content='', status='draft')
+            students.append((client, draft))
+        
+        writer = User.objects.create(username='backlog')
+        for i in range(args.backlog):
+            submission = Submission.objects.create(
+                user=writer, task=task, content=f'Essay {i}. ' + 'Benchmark essay text. ' * (50 + i % 200),
+                word_count=150 + i % 200, status='submitted'
+            )
+            assessment_service.create_assessment_request(submission)
+        
+        # The queue daemon, as process_assessments --daemon runs it
+        command = Command(stdout=io.StringIO(), stderr=io.StringIO())
+        pool = AssessmentWorkerPool(assessment_service, concurrency=args.workers)
+        daemon = threading.Thread(target=command._run_daemon, args=(pool, 1), daemon=True)
+        
+        url = reverse('practice:autosave')
+        deadline = time.monotonic() + args.duration
+        latencies = []
+        errors = Counter()
+        last_saved = {}
+        lock = threading.Lock()
+        
+        def autosaver(client, draft):
+            close_old_connections()
+            version, saved_text, content = 0, None, ''
+            try:
+                while time.monotonic() < deadline:
+                    content += 'Some people believe that '
+                    data = {'submission_id': draft.id, 'base_version': version}
+                    if saved_text is None:
+                        data['content'] = content
+                    else:
+                        data['patch'] = json.dumps([[len(saved_text), len(saved_text), content[len(saved_text):]]])
+                    start = time.perf_counter()
+                    try:
+                        response = client.post(url, data, headers={'X-Requested-With': 'XMLHttpRequest'})
+                        result = response.json()
+                    except Exception as e:
+                        with lock:
+                            errors[f'{type(e).__name__}: {str(e)[:60]}'] += 1
+                        continue
+                    elapsed = time.perf_counter() - start
+                    with lock:
+                        if result['success']:
+                            latencies.append(elapsed)
+                            last_saved[draft.id] = content
+                        else:
+                            errors[f'HTTP {response.status_code}'] += 1
+                    if result['success']:
+                        version, saved_text = result['version'], content
+                    else:
+                        # Resend the full text, as the writing interface does after a 409
+                        version, saved_text = max(version, result.get('version', 0)), None
+                    time.sleep(args.think)
+            finally:
+                close_old_connections()
+        
+        threads = [threading.Thread(target=autosaver, args=student) for student in students]
+        completed_before = AssessmentRequest.objects.filter(status='completed').count()
+        
+        print(
+            f"🏋️  [{args.profile}] {args.autosavers} autosavers and a {args.workers}-worker daemon "
+            f"for {args.duration:.0f}s..."
+        )
+        start = time.monotonic()
+        daemon.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - start
+        
+        pool.stop()
+        if command._listener is not None:
+            command._listener.poke()
+        daemon.join()
+        pool.shutdown()
+        write_queue.flush()
+        
+        completed = AssessmentRequest.objects.filter(status='completed').count() - completed_before
+        stale = sum(
+            1 for draft_id, content in last_saved.items()
+            if Submission.objects.get(id=draft_id).content != content
+        )
+        
+        latencies.sort()
+        print(f"📊 [{args.profile}] {len(latencies)} autosaves in {elapsed:.1f}s ({len(latencies) / elapsed:.0f}/s)")
+        if latencies:
+            print(
+                f"   Autosave latency: p50 {percentile(latencies, 50) * 1000:.1f}ms   "
+                f"p95 {percentile(latencies, 95) * 1000:.1f}ms   p99 {percentile(latencies, 99) * 1000:.1f}ms   "
+                f"max {latencies[-1] * 1000:.1f}ms"
+            )
+        print(f"   Daemon: {completed} assessments completed ({completed * 60 / elapsed:.0f}/min)")
+        print(f"   Drafts not holding their last autosave: {stale}")
+        for error, count in errors.most_common():
+            print(f"   ❌ {count} x {error}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""
+Load benchmark for streaming assessment (SSE) endpoints.
+
+Opens N concurrent SSE connections and reports how many were served, time to
+first byte and total stream duration. Run it once against the WSGI endpoint
+(/assessment/stream/<id>/) and once against the ASGI endpoint
+(/assessment/stream-async/<id>/) to compare concurrent-stream capacity.
+
+Each connection needs a submitted, not yet assessed submission owned by the
+logged-in user, so pass as many submission IDs as --concurrency (or point the
+server at a stub scoring backend so repeated runs cost nothing).
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def open_stream(client, url, results):
+    """Consume one SSE stream, recording time to first byte and duration."""
+    start = time.monotonic()
+    first_byte = None
+    try:
+        async with client.stream('GET', url) as response:
+            if response.status_code != 200:
+                results['errors'].append(f'HTTP {response.status_code}')
+                return
+            async for line in response.aiter_lines():
+                if first_byte is None:
+                    first_byte = time.monotonic() - start
+                if '"type": "error"' in line:
+                    results['errors'].append(line)
+                    return
+                if '"type": "complete"' in line:
+                    break
+        results['ttfb'].append(first_byte)
+        results['duration'].append(time.monotonic() - start)
+    except httpx.HTTPError as e:
+        results['errors'].append(f'{type(e).__name__}: {e}')
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+async def run(args):
+    results = {'ttfb': [], 'duration': [], 'errors': []}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=0)
+    timeout = httpx.Timeout(args.timeout, connect=10.0)
+
+    async with httpx.AsyncClient(
+        base_url=args.base_url,
+        cookies={'sessionid': args.session},
+        limits=limits,
+        timeout=timeout,
+    ) as client:
+        urls = [
+            args.path.format(submission_id=args.submission_ids[i % len(args.submission_ids)])
+            for i in range(args.concurrency)
+        ]
+        start = time.monotonic()
+        await asyncio.gather(*(open_stream(client, url, results) for url in urls))
+        wall_clock = time.monotonic() - start
+
+    print(f"📊 {args.base_url}{args.path} x {args.concurrency} concurrent streams")
+    print(f"   Completed: {len(results['duration'])}, errors: {len(results['errors'])}")
+    print(f"   Wall clock: {wall_clock:.2f}s")
+    if results['ttfb']:
+        print(f"   Time to first byte p50/p95: "
+              f"{statistics.median(results['ttfb']):.2f}s / {percentile(results['ttfb'], 95):.2f}s")
+        print(f"   Stream duration p50/p95: "
+              f"{statistics.median(results['duration']):.2f}s / {percentile(results['duration'], 95):.2f}s")
+    for error in results['errors'][:5]:
+        print(f"   ❌ {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://localhost:8000')
+    parser.add_argument('--path', default='/assessment/stream-async/{submission_id}/',
+                        help='Endpoint path; {submission_id} is substituted')
+    parser.add_argument('--submission-ids', type=int, nargs='+', required=True)
+    parser.add_argument('--session', required=True, help='sessionid cookie of the submissions\' owner')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--timeout', type=float, default=300.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""
+Import-time benchmark and cold start budget check.
+
+Runs ``python -X importtime manage.py check`` (what every gunicorn worker
+boot and management command pays for before doing any work), then reports
+the total import time and the slowest top-level imports. Exits non-zero if
+an SDK that should load lazily (anthropic, stripe, httpx, pydantic) was
+imported, or if the total exceeds ``--budget-ms``, so it can run in CI to
+keep cold start down.
+"""
+
+import os
+import re
+import sys
+import argparse
+import subprocess
+
+# Add the project root to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+# SDKs only loaded when an assessment or payment actually needs them
+LAZY_MODULES = ('anthropic', 'stripe', 'httpx', 'pydantic')
+
+IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget-ms', type=float, default=800, help='Maximum total import time')
+    parser.add_argument('--runs', type=int, default=3, help='Take the fastest of this many runs')
+    parser.add_argument('--top', type=int, default=15, help='Number of slowest imports to list')
+    return parser.parse_args()
+
+
+def measure():
+    """One ``manage.py check`` run: {top-level module: cumulative microseconds}, all modules imported."""
+    env = {**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'}
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'ieltswritingtest.settings.development')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', 'manage.py', 'check'],
+        cwd=project_root, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.exit(f"❌ manage.py check failed:\n{result.stdout}{result.stderr}")
+    
+    top_level, imported = {}, set()
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, module = int(match.group(2)), match.group(3), match.group(4)
+        imported.add(module)
+        if not indent:
+            top_level[module] = top_level.get(module, 0) + cumulative
+    return top_level, imported
+
+
+def main():
+    args = parse_args()
+    
+    print(f"⏱️  Measuring imports of manage.py check ({args.runs} runs)...")
+    runs = [measure() for _ in range(args.runs)]
+    top_level, imported = min(runs, key=lambda run: sum(run[0].values()))
+    total_ms = sum(top_level.values()) / 1000
+    
+    print(f"📊 Total import time: {total_ms:.0f}ms (budget {args.budget_ms:.0f}ms)")
+    for module, micros in sorted(top_level.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"   {micros / 1000:8.1f}ms  {module}")
+    
+    eager = [module for module in LAZY_MODULES if module in imported]
+    failed = False
+    if eager:
+        print(f"❌ Imported at startup, should be deferred: {', '.join(eager)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"❌ Import time {total_ms:.0f}ms is over the {args.budget_ms:.0f}ms budget")
+        failed = True
+    
+    if failed:
+        sys.exit(1)
+    print("✅ Within the import budget")
+
+
+if __name__ == '__main__':
+    main()
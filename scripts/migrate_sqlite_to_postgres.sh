@@ -0,0 +1,101 @@
+#!/bin/bash
+
+# IELTS Writing Test Platform - SQLite to PostgreSQL Migration Script
+# Copies all data from the production SQLite database into PostgreSQL.
+# Stop the web and queue processes first so nothing is written mid-copy.
+#
+# Usage: DB_NAME=... DB_USER=... DB_PASSWORD=... DB_HOST=... ./scripts/migrate_sqlite_to_postgres.sh
+# then set DATABASE_ENGINE=postgresql in the production environment.
+
+set -e  # Exit on any error
+
+# Colors for output
+RED='\033[0;31m'
+GREEN='\033[0;32m'
+YELLOW='\033[1;33m'
+BLUE='\033[0;34m'
+NC='\033[0m' # No Color
+
+# Function to print colored output
+print_status() {
+    echo -e "${BLUE}[INFO]${NC} $1"
+}
+
+print_success() {
+    echo -e "${GREEN}[SUCCESS]${NC} $1"
+}
+
+print_warning() {
+    echo -e "${YELLOW}[WARNING]${NC} $1"
+}
+
+print_error() {
+    echo -e "${RED}[ERROR]${NC} $1"
+}
+
+# Get the directory where this script is located
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+PROJECT_DIR="$(dirname "$SCRIPT_DIR")"
+DUMP_FILE="${DUMP_FILE:-$PROJECT_DIR/sqlite-dump.json}"
+
+cd "$PROJECT_DIR"
+
+# Activate virtual environment if not already activated
+if [[ "$VIRTUAL_ENV" == "" ]]; then
+    if [ -d "venv" ]; then
+        print_status "Activating virtual environment..."
+        source venv/bin/activate
+    else
+        print_error "Virtual environment not found! Run setup_dev.sh first."
+        exit 1
+    fi
+fi
+
+export DJANGO_SETTINGS_MODULE="ieltswritingtest.settings.production"
+
+if [ ! -f "db.sqlite3" ]; then
+    print_error "No db.sqlite3 found in $PROJECT_DIR"
+    exit 1
+fi
+
+# Bring the SQLite schema up to date so both sides dump and load the same models
+print_status "Migrating the SQLite database to the current schema..."
+DATABASE_ENGINE=sqlite python manage.py migrate --noinput
+
+print_status "Dumping SQLite data to $DUMP_FILE..."
+DATABASE_ENGINE=sqlite python manage.py dumpdata \
+    --natural-foreign --natural-primary \
+    --exclude contenttypes --exclude auth.permission \
+    --exclude admin.logentry --exclude sessions.session \
+    --indent 0 --output "$DUMP_FILE"
+print_success "SQLite data dumped"
+
+print_status "Creating the PostgreSQL schema..."
+DATABASE_ENGINE=postgresql python manage.py migrate --noinput
+
+# The target must be empty, or loaddata would merge into existing rows
+ROWS=$(DATABASE_ENGINE=postgresql python manage.py shell -c \
+    "from practice.models import Submission; print(Submission.objects.count())")
+if [ "$ROWS" != "0" ]; then
+    print_error "PostgreSQL database already has $ROWS submissions; refusing to load into it"
+    exit 1
+fi
+
+# loaddata also resets the primary key sequences to the highest loaded id
+print_status "Loading data into PostgreSQL..."
+DATABASE_ENGINE=postgresql python manage.py loaddata "$DUMP_FILE"
+print_success "Data loaded"
+
+print_status "Running system check..."
+DATABASE_ENGINE=postgresql python manage.py check --deploy
+print_success "System check passed"
+
+echo ""
+print_success "🎉 Migration to PostgreSQL complete!"
+echo ""
+print_status "Next steps:"
+echo "  1. Set DATABASE_ENGINE=postgresql (and DB_*) in the production environment"
+echo "  2. Restart the web and queue processes"
+echo "  3. Keep db.sqlite3 and $DUMP_FILE until the new database is verified"
+print_warning "Sessions were not copied; users will need to log in again."
+echo ""
@@ -66,6 +66,10 @@ fi
 print_status "Running system check..."
 python manage.py check --settings=ieltswritingtest.settings.testing
 
+# Keep cold start down: no eager SDK imports and total import time in budget
+print_status "Checking import-time budget..."
+python scripts/check_import_budget.py
+
 # Run the tests
 print_status "Starting test execution..."
 python manage.py test $TESTS \
@@ -7,7 +7,6 @@ from django.contrib.auth import get_user_model
 from django.utils import timezone
 from decimal import Decimal
 from datetime import timedelta
-import stripe
 from django.conf import settings
 
 from core.models import BaseModel
@@ -218,8 +217,10 @@ class UserSubscription(BaseModel):
         
         # Cancel in Stripe if exists
         if self.stripe_subscription_id:
+            from .services import get_stripe
+            
+            stripe = get_stripe()
             try:
-                stripe.api_key = settings.STRIPE_SECRET_KEY
                 stripe.Subscription.modify(
                     self.stripe_subscription_id,
                     cancel_at_period_end=True
@@ -2,26 +2,39 @@
 Stripe payment processing service.
 """
 
-import stripe
 from django.conf import settings
 from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
 from datetime import timedelta
 from decimal import Decimal
 import logging
 
+from core.writes import retry_on_locked
 from .models import SubscriptionPlan, UserSubscription, PaymentHistory, UsageRecord
 
 logger = logging.getLogger(__name__)
 
-# Configure Stripe
-stripe.api_key = settings.STRIPE_SECRET_KEY
+def get_stripe():
+    """
+    The configured Stripe SDK.
+    
+    Importing stripe takes about a second, so it is deferred until a
+    payment operation actually needs it instead of slowing every worker
+    boot and management command.
+    """
+    import stripe
+    
+    if stripe.api_key != settings.STRIPE_SECRET_KEY:
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+    return stripe
 
 
 class StripeService:
     """Service for handling Stripe payment operations."""
     
-    def __init__(self):
-        self.stripe = stripe
+    @property
+    def stripe(self):
+        return get_stripe()
     
     def create_customer(self, user):
         """Create a Stripe customer for a user."""
@@ -35,7 +48,7 @@ class StripeService:
                 }
             )
             return customer
-        except stripe.error.StripeError as e:
+        except self.stripe.error.StripeError as e:
             logger.error(f"Failed to create Stripe customer for user {user.id}: {e}")
             raise
     
@@ -69,7 +82,7 @@ class StripeService:
                 }
             )
             return checkout_session
-        except stripe.error.StripeError as e:
+        except self.stripe.error.StripeError as e:
             logger.error(f"Failed to create checkout session for user {user.id}, plan {plan.id}: {e}")
             raise
     
@@ -82,7 +95,7 @@ class StripeService:
                 try:
                     customer = self.stripe.Customer.retrieve(subscription.stripe_customer_id)
                     return customer
-                except stripe.error.InvalidRequestError:
+                except self.stripe.error.InvalidRequestError:
                     # Customer doesn't exist, create new one
                     pass
             
@@ -94,7 +107,7 @@ class StripeService:
             # Create new customer
             return self.create_customer(user)
             
-        except stripe.error.StripeError as e:
+        except self.stripe.error.StripeError as e:
             logger.error(f"Failed to get or create customer for user {user.id}: {e}")
             raise
     
@@ -211,7 +224,7 @@ class StripeService:
                 return True
             return False
             
-        except stripe.error.StripeError as e:
+        except self.stripe.error.StripeError as e:
             logger.error(f"Failed to cancel subscription {subscription.id}: {e}")
             raise
     
@@ -228,7 +241,7 @@ class StripeService:
             )
             return session
             
-        except stripe.error.StripeError as e:
+        except self.stripe.error.StripeError as e:
             logger.error(f"Failed to create billing portal session for user {user.id}: {e}")
             raise
     
@@ -286,7 +299,7 @@ class StripeService:
             subscription.save()
             return subscription
             
-        except stripe.error.StripeError as e:
+        except self.stripe.error.StripeError as e:
             logger.error(f"Failed to sync subscription {subscription.id}: {e}")
             return subscription
 
@@ -320,8 +333,10 @@ class UsageService:
         success = subscription.use_assessment_credit()
         
         if success:
-            # Track usage
-            UsageRecord.objects.create(
+            # Track usage inline like the credit above: a billing record
+            # must not sit in the write-behind queue, which loses its
+            # pending writes if the process dies
+            retry_on_locked(UsageRecord.objects.create)(
                 user=user,
                 subscription=subscription,
                 usage_type='assessment',
@@ -368,5 +383,6 @@ class UsageService:
 
 
 # Service instances
-stripe_service = StripeService()
+# Created on first use, see get_stripe()
+stripe_service = SimpleLazyObject(StripeService)
 usage_service = UsageService()
\ No newline at end of file
@@ -1,3 +1,32 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import SubscriptionPlan, UsageRecord, UserSubscription
+from .services import UsageService
+
+
+class UsageServiceTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username='subscriber')
+        plan = SubscriptionPlan.objects.create(
+            name='Monthly', slug='monthly', plan_type='basic', billing_period='monthly',
+            price=Decimal('9.99'), assessment_credits=10
+        )
+        now = timezone.now()
+        UserSubscription.objects.create(
+            user=self.user, plan=plan, current_period_start=now,
+            current_period_end=now + timedelta(days=30), assessment_credits_remaining=2
+        )
+    
+    @override_settings(DATABASE_WRITE_QUEUE={'enabled': True})
+    def test_usage_record_is_written_inline_with_the_write_queue_enabled(self):
+        used, _ = UsageService.use_assessment_credit(self.user)
+        
+        self.assertTrue(used)
+        self.assertEqual(UsageRecord.objects.filter(user=self.user, usage_type='assessment').count(), 1)
+        self.assertEqual(UserSubscription.objects.get(user=self.user).assessment_credits_remaining, 1)
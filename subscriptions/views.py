@@ -14,12 +14,11 @@ from django.views.decorators.http import require_POST
 from django.utils.decorators import method_decorator
 from django.utils import timezone
 from django.conf import settings
-import stripe
 import json
 import logging
 
 from .models import SubscriptionPlan, UserSubscription, PaymentHistory
-from .services import stripe_service, usage_service
+from .services import get_stripe, stripe_service, usage_service
 
 logger = logging.getLogger(__name__)
 
@@ -195,6 +194,7 @@ def stripe_webhook(request):
     payload = request.body
     sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
     endpoint_secret = settings.STRIPE_WEBHOOK_SECRET
+    stripe = get_stripe()
     
     try:
         event = stripe.Webhook.construct_event(
@@ -243,7 +243,7 @@ def handle_checkout_completed(session):
     """Handle successful checkout completion."""
     if session.mode == 'subscription':
         subscription_id = session.subscription
-        stripe_subscription = stripe.Subscription.retrieve(subscription_id)
+        stripe_subscription = get_stripe().Subscription.retrieve(subscription_id)
         stripe_service.handle_successful_payment(stripe_subscription)
 
 
@@ -251,7 +251,7 @@ def handle_payment_succeeded(invoice):
     """Handle successful invoice payment."""
     if invoice.subscription:
         subscription_id = invoice.subscription
-        stripe_subscription = stripe.Subscription.retrieve(subscription_id)
+        stripe_subscription = get_stripe().Subscription.retrieve(subscription_id)
         
         # Update subscription if needed
         try: